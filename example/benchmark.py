@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+"""
+Benchmarks lazydrf class generation and endpoint throughput against an in-memory SQLite database
+using the example project, and emits the results as JSON.
+
+Usage: python benchmark.py [--rows 1000,100000] [--iterations 50] [--output results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import time
+from itertools import count
+
+
+## Set up Django with the example project on an in-memory database:
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "example.settings")
+
+from django.conf import settings  # noqa: E402
+
+settings.DATABASES["default"]["NAME"] = ":memory:"
+settings.DEBUG = False
+settings.ALLOWED_HOSTS = ["*"]
+
+import django  # noqa: E402
+
+django.setup()
+
+import rest_framework  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import models  # noqa: E402
+from rest_framework.routers import DefaultRouter  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from lazydrf.models import LDRF  # noqa: E402
+from lazydrf.tests import TestSubclass  # noqa: E402
+from sample.models import Record  # noqa: E402
+
+
+#: Defines a counter for unique names of generated models.
+SEQUENCE = count()
+
+#: Defines the list request parameters benchmarked.
+LIST_QUERIES = [
+    ("plain", ""),
+    ("filter_exact", "?value=value7"),
+    ("filter_startswith", "?key__startswith=key0001"),
+    ("filter_icontains", "?value__icontains=alue7"),
+    ("search", "?search=value7"),
+    ("search_prefix", "?search=val"),
+    ("order_key_desc", "?ordering=-key"),
+    ("order_value", "?ordering=value"),
+    ("filter_search_order", "?value=value7&search=key00&ordering=-key"),
+]
+
+
+def measure(function, iterations):
+    """
+    Calls the function repeatedly and returns the timing statistics.
+
+    :param function: The function to call.
+    :param iterations: The number of calls.
+    :return: A dictionary of the timing statistics in seconds.
+    """
+    ## Time each call:
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    ## Done, return the statistics:
+    total = sum(timings)
+    return {
+        "iterations": iterations,
+        "total": total,
+        "mean": total / iterations,
+        "median": statistics.median(timings),
+        "min": min(timings),
+        "max": max(timings),
+        "per_second": iterations / total if total else None,
+    }
+
+
+def declare_models(number, depth):
+    """
+    Declares abstract lazydrf models of the inheritance depth on top of the test models.
+
+    :param number: The number of models.
+    :param depth: The inheritance depth on top of `TestSubclass`.
+    :return: The list of leaf models.
+    """
+    ## Declare the leaf models:
+    leaves = []
+    for _ in range(number):
+        parent = TestSubclass
+        for _ in range(depth):
+            name = "Bench{}".format(next(SEQUENCE))
+            parent = LDRF(name, (parent,), {
+                "__module__": __name__,
+                "{}_field".format(name.lower()): models.CharField(max_length=8),
+                "Meta": type("Meta", (), {"app_label": "lazydrf", "abstract": True}),
+                "APIFields": type("APIFields", (), {
+                    "editable": ["{}_field".format(name.lower())],
+                    "ordering": ["value"],
+                }),
+                "APIFiltering": type("APIFiltering", (), {"value": ["exact"]}),
+            })
+        leaves.append(parent)
+
+    ## Done, return the leaf models:
+    return leaves
+
+
+def declare_concrete_models(number):
+    """
+    Declares concrete lazydrf models like the sample record model.
+
+    :param number: The number of models.
+    :return: The list of models.
+    """
+    return [
+        LDRF("BenchRecord{}".format(next(SEQUENCE)), (models.Model,), {
+            "__module__": __name__,
+            "key": models.CharField(max_length=16, unique=True),
+            "value": models.CharField(max_length=64, db_index=True),
+            "Meta": type("Meta", (), {"app_label": "sample"}),
+            "APIFields": type("APIFields", (), {
+                "editable": ["key", "value"],
+                "ordering": ["key"],
+                "searching": ["key", "^value"],
+            }),
+            "APIFiltering": type("APIFiltering", (), {
+                "key": ["exact", "startswith"],
+                "value": ["exact", "icontains"],
+            }),
+        })
+        for _ in range(number)
+    ]
+
+
+def bench_generation(results, numbers, depths):
+    """
+    Benchmarks declaring and building lazydrf models by number of models and inheritance depth.
+    """
+    for number in numbers:
+        for depth in depths:
+            ## Declare the models:
+            start = time.perf_counter()
+            leaves = declare_models(number, depth)
+            declared = time.perf_counter() - start
+
+            ## Build the artifacts of the models:
+            start = time.perf_counter()
+            for model in leaves:
+                model.LDRFMeta.build()
+            built = time.perf_counter() - start
+
+            ## Add the result:
+            results.append({
+                "name": "generation",
+                "params": {"models": number, "depth": depth},
+                "declare": declared,
+                "build": built,
+                "per_model": (declared + built) / number,
+            })
+
+
+def bench_register(results, numbers):
+    """
+    Benchmarks registering concrete lazydrf models, cold (building the artifacts) and warm.
+    """
+    for number in numbers:
+        ## Declare the models:
+        declared = declare_concrete_models(number)
+
+        ## Register cold:
+        start = time.perf_counter()
+        router = DefaultRouter()
+        for model in declared:
+            model.LDRFMeta.register(router)
+        router.urls
+        cold = time.perf_counter() - start
+
+        ## Register warm:
+        def register():
+            router = DefaultRouter()
+            for model in declared:
+                model.LDRFMeta.register(router)
+            router.urls
+
+        ## Add the result:
+        warm = measure(register, 10)
+        results.append({"name": "register", "params": {"models": number}, "cold": cold, "warm": warm})
+
+
+def bench_endpoints(results, rows, iterations):
+    """
+    Benchmarks the list, retrieve and write endpoints of the sample record model for the number of rows.
+    """
+    ## Reset the records:
+    Record.objects.all().delete()
+    Record.objects.bulk_create(
+        [Record(key="key{:07d}".format(index), value="value{}".format(index % 100)) for index in range(rows)],
+        batch_size=500,
+    )
+
+    ## Get the client and a record:
+    client = APIClient()
+    record = Record.objects.order_by("key")[rows // 2]
+
+    ## Benchmark lists:
+    for name, query in LIST_QUERIES:
+        stats = measure(lambda: _check(client.get("/records/{}".format(query))), iterations)
+        results.append({"name": "list", "params": {"rows": rows, "query": name}, "stats": stats})
+
+    ## Benchmark retrieve:
+    stats = measure(lambda: _check(client.get("/records/{}/".format(record.pk))), iterations)
+    results.append({"name": "retrieve", "params": {"rows": rows}, "stats": stats})
+
+    ## Benchmark single creates:
+    stats = measure(lambda: _check(client.post(
+        "/records/", {"key": "new{}".format(next(SEQUENCE)), "value": "new"}, format="json",
+    )), iterations)
+    results.append({"name": "create", "params": {"rows": rows}, "stats": stats})
+
+    ## Benchmark bulk creates:
+    def create_bulk():
+        items = [{"key": "bulk{}".format(next(SEQUENCE)), "value": "bulk"} for _ in range(100)]
+        _check(client.post("/records/", items, format="json"))
+    stats = measure(create_bulk, max(iterations // 10, 1))
+    results.append({"name": "create_bulk", "params": {"rows": rows, "batch": 100}, "stats": stats})
+
+    ## Benchmark updates:
+    stats = measure(lambda: _check(client.patch(
+        "/records/{}/".format(record.pk), {"value": "updated"}, format="json",
+    )), iterations)
+    results.append({"name": "update", "params": {"rows": rows}, "stats": stats})
+
+
+def _check(response):
+    """
+    Checks that the response is successful.
+    """
+    if response.status_code >= 400:
+        raise RuntimeError("Unexpected response {}: {}".format(response.status_code, response.content[:200]))
+
+
+def main():
+    """
+    Runs the benchmarks and emits the results as JSON.
+    """
+    ## Parse the arguments:
+    parser = argparse.ArgumentParser(description="Benchmarks lazydrf.")
+    parser.add_argument("--rows", default="1000,100000", help="Comma separated numbers of rows.")
+    parser.add_argument("--models", default="10,100", help="Comma separated numbers of generated models.")
+    parser.add_argument("--depths", default="1,4", help="Comma separated inheritance depths of generated models.")
+    parser.add_argument("--iterations", type=int, default=50, help="Number of requests per benchmark.")
+    parser.add_argument("--output", default=None, help="File to write the results to, standard output if none.")
+    args = parser.parse_args()
+
+    ## Create the database:
+    call_command("migrate", verbosity=0)
+
+    ## Run the benchmarks:
+    results = []
+    bench_generation(results, [int(n) for n in args.models.split(",")], [int(d) for d in args.depths.split(",")])
+    bench_register(results, [int(n) for n in args.models.split(",")])
+    for rows in [int(n) for n in args.rows.split(",")]:
+        bench_endpoints(results, rows, args.iterations)
+
+    ## Build the report:
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "djangorestframework": rest_framework.VERSION,
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+    ## Emit the report:
+    if args.output:
+        with open(args.output, "w") as stream:
+            json.dump(report, stream, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
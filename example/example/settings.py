@@ -39,6 +39,8 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'django_filters',
+    'lazydrf',
+    'lazydrf.changefeed',
     'sample',
 ]
 
@@ -84,6 +86,9 @@ DATABASES = {
     }
 }
 
+# The tables of the lazydrf test models are created by the test cases.
+TEST_NON_SERIALIZED_APPS = ['lazydrf']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/1.9/ref/settings/#auth-password-validators
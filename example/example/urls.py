@@ -2,6 +2,7 @@ from django.conf.urls import url, include
 from django.contrib import admin
 from rest_framework import routers
 
+from lazydrf.batch import register_batch
 from lazydrf.utils import register_app
 
 
@@ -11,6 +12,9 @@ Router = routers.DefaultRouter()
 ## Register model endpoints for the sample Django application:
 register_app("sample", Router)
 
+## Register the batch endpoint:
+register_batch(Router)
+
 #: Defines the URL patterns:
 urlpatterns = [
     url(r'^admin/', admin.site.urls),
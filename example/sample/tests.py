@@ -1,3 +1,31 @@
-from django.test import TestCase
+import json
+import os
+import subprocess
+import sys
 
-# Create your tests here.
+from django.conf import settings
+from django.test import SimpleTestCase
+
+
+class BenchmarkTestCase(SimpleTestCase):
+    """
+    Tests running the benchmark suite with the smallest parameters.
+    """
+
+    def test_emits_results(self):
+        ## Run the benchmark in its own process, as it sets up Django on its own:
+        output = subprocess.check_output([
+            sys.executable, os.path.join(settings.BASE_DIR, "benchmark.py"),
+            "--rows", "10", "--models", "1", "--depths", "1", "--iterations", "1",
+        ], universal_newlines=True)
+
+        ## Check the report:
+        report = json.loads(output)
+        self.assertEqual(
+            sorted(report["environment"]), ["django", "djangorestframework", "platform", "python", "sqlite"],
+        )
+        self.assertEqual(
+            sorted(set(result["name"] for result in report["results"])),
+            ["create", "create_bulk", "generation", "list", "register", "retrieve", "update"],
+        )
+        self.assertEqual(len([result for result in report["results"] if result["name"] == "list"]), 9)
@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class LazydrfConfig(AppConfig):
     name = "lazydrf"
     verbose_name = "Django-Rest-Framework extension for lazy people"
+
+    def ready(self):
+        ## Install full-text search indexes after migrations:
+        from lazydrf.search import install_search_indexes
+        post_migrate.connect(install_search_indexes, dispatch_uid="lazydrf.search.install_search_indexes")
+
+        ## Maintain the generation counters of the models the caches and validators of the viewsets are keyed by:
+        from lazydrf.caching import track_generations
+        from lazydrf.registry import registry
+        for model in registry.get_models():
+            if model.LDRFMeta.track_generations:
+                track_generations(model)
@@ -0,0 +1,328 @@
+import copy
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.urlresolvers import NoReverseMatch, get_script_prefix, reverse
+from django.http import QueryDict
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import NotAuthenticated, PermissionDenied, ValidationError
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.viewsets import ViewSet
+
+from lazydrf.registry import registry
+
+
+#: Defines the request headers which are not passed on to sub-requests.
+BATCH_DROPPED_HEADERS = ["CONTENT_LENGTH", "CONTENT_TYPE", "HTTP_IF_NONE_MATCH", "HTTP_IF_MODIFIED_SINCE",
+                         "HTTP_IF_MATCH", "HTTP_IF_UNMODIFIED_SINCE"]
+
+
+class BatchViewSet(ViewSet):
+    """
+    Defines a viewset which executes a list of read sub-requests against the lazydrf endpoints in-process
+    and responds with all results at once.
+
+    Sub-requests are dictionaries of the endpoint URI, the action, the primary key(s) to retrieve and
+    the request parameters, such as `{"uri": "records", "action": "retrieve", "pks": [1, 2]}`. Retrieves
+    of the same endpoint with the same parameters are coalesced into a single query. Each sub-request
+    is authenticated, authorized and throttled by its endpoint.
+    """
+
+    #: Sub-requests are authorized by their endpoints.
+    permission_classes = (AllowAny,)
+
+    #: Defines the maximum number of sub-requests per batch.
+    batch_max_size = 50
+
+    def create(self, request):
+        """
+        Executes the sub-requests and responds with a list of their statuses and data, in order.
+        """
+        ## Get the sub-requests:
+        items = self.get_batch_items(request)
+
+        ## Declare the results:
+        results = [None] * len(items)
+
+        ## Group the retrieves by endpoint and parameters, execute the rest:
+        retrieves = OrderedDict()
+        for index, item in enumerate(items):
+            if item["action"] == "retrieve":
+                key = (item["uri"], json.dumps(item["params"], sort_keys=True))
+                retrieves.setdefault(key, []).append(index)
+            else:
+                results[index] = self.execute(request, item)
+
+        ## Execute the grouped retrieves:
+        for indices in retrieves.values():
+            for index, result in zip(indices, self.execute_retrieves(request, [items[index] for index in indices])):
+                results[index] = result
+
+        ## Done, return the results:
+        return Response(results)
+
+    def get_batch_items(self, request):
+        """
+        Returns the validated sub-requests of the request.
+
+        :param request: The request.
+        :return: A list of sub-request dictionaries with the "uri", "action", "pks" and "params".
+        """
+        ## Check the payload:
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({"non_field_errors": [_("Expected a list of sub-requests.")]})
+        if len(items) > self.batch_max_size:
+            raise ValidationError({"non_field_errors": [
+                _("Expected at most {} sub-requests.").format(self.batch_max_size),
+            ]})
+
+        ## Validate and normalize the sub-requests:
+        errors = [self.validate_batch_item(item) for item in items]
+        if any(errors):
+            raise ValidationError(errors)
+
+        ## Done, return the sub-requests:
+        return [{
+            "uri": item["uri"],
+            "action": item.get("action", "retrieve" if "pk" in item or "pks" in item else "list"),
+            "pks": item["pks"] if "pks" in item else ([item["pk"]] if "pk" in item else []),
+            "many": "pks" in item,
+            "params": item.get("params") or {},
+        } for item in items]
+
+    def validate_batch_item(self, item):
+        """
+        Validates the sub-request.
+
+        :param item: The sub-request.
+        :return: A dictionary of errors, empty if valid.
+        """
+        ## Check the type and the endpoint:
+        if not isinstance(item, dict):
+            return {"non_field_errors": [_("Expected a dictionary.")]}
+        if not isinstance(item.get("uri"), str):
+            return {"uri": [_("This field is required.")]}
+
+        ## Check the action:
+        action = item.get("action", "retrieve" if "pk" in item or "pks" in item else "list")
+        if action == "retrieve" and "pk" not in item and not isinstance(item.get("pks"), list):
+            return {"pks": [_("Expected a primary key or a list of primary keys.")]}
+
+        ## Check the parameters:
+        if not isinstance(item.get("params") or {}, dict):
+            return {"params": [_("Expected a dictionary.")]}
+
+        ## Valid:
+        return {}
+
+    def get_endpoint(self, request, uri):
+        """
+        Returns the viewset and the list path of the endpoint of the URI routed along with the batch endpoint.
+
+        :param request: The request.
+        :param uri: The URI of the endpoint.
+        :return: A tuple of the viewset and the path if routed, `None`s otherwise.
+        """
+        ## Get the model:
+        model = registry.get_by_uri(uri)
+        if model is None:
+            return None, None
+
+        ## Get the path under the namespace of the batch endpoint:
+        namespace = getattr(request.resolver_match, "namespace", None)
+        try:
+            prefix = "{}:".format(namespace) if namespace else ""
+            path = reverse("{}{}-list".format(prefix, model._meta.object_name.lower()))
+        except NoReverseMatch:
+            return None, None
+
+        ## Done, return the viewset and path:
+        return model.LDRFMeta.viewset, path
+
+    def get_subrequest(self, request, path, params):
+        """
+        Returns a GET request of the path with the parameters and the headers of the batch request.
+
+        :param request: The batch request.
+        :param path: The path.
+        :param params: A dictionary of the request parameters.
+        :return: The sub-request.
+        """
+        ## Copy the request:
+        subrequest = copy.copy(request._request)
+
+        ## Set the parameters:
+        subrequest.GET = QueryDict(mutable=True)
+        for key, value in params.items():
+            subrequest.GET.setlist(key, [str(item) for item in (value if isinstance(value, list) else [value])])
+
+        ## Set the method, path and headers, note that the path info does not include the script prefix:
+        prefix = get_script_prefix()
+        subrequest.method = "GET"
+        subrequest.path = path
+        subrequest.path_info = "/{}".format(path[len(prefix):]) if path.startswith(prefix) else path
+        subrequest.META = dict([
+            (key, value) for key, value in request.META.items() if key not in BATCH_DROPPED_HEADERS
+        ])
+        subrequest.META.update({
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": subrequest.path_info,
+            "QUERY_STRING": subrequest.GET.urlencode(),
+            "HTTP_ACCEPT": "application/json",
+        })
+
+        ## Done, return the sub-request:
+        return subrequest
+
+    def execute(self, request, item):
+        """
+        Executes the sub-request via its endpoint.
+
+        :param request: The batch request.
+        :param item: The sub-request.
+        :return: A dictionary of the status and the data of the response.
+        """
+        ## Get the endpoint and the action:
+        viewset, path = self.get_endpoint(request, item["uri"])
+        handler = viewset and getattr(viewset, item["action"], None)
+        if handler is None or not (item["action"] == "list" or "get" in getattr(handler, "bind_to_methods", [])):
+            return {"status": status.HTTP_404_NOT_FOUND, "data": {"detail": _("Not found.")}}
+
+        ## Dispatch the sub-request, lists are not streamed:
+        path = path if item["action"] == "list" else "{}{}/".format(path, item["action"])
+        stream_param = getattr(viewset, "stream_param", None)
+        params = dict([(key, value) for key, value in item["params"].items() if key != stream_param])
+        response = viewset.as_view({"get": item["action"]})(self.get_subrequest(request, path, params))
+
+        ## Streamed responses (such as of custom routes) can not be batched:
+        if response.streaming:
+            return {"status": status.HTTP_400_BAD_REQUEST, "data": {
+                "detail": _("Streamed responses can not be batched."),
+            }}
+
+        ## Done, return the status and data, rendered responses (such as the cached ones) are parsed:
+        if hasattr(response, "data"):
+            return {"status": response.status_code, "data": response.data}
+        try:
+            return {"status": response.status_code, "data": json.loads(response.content.decode(response.charset))}
+        except ValueError:
+            return {"status": status.HTTP_400_BAD_REQUEST, "data": {"detail": _("Expected a JSON response.")}}
+
+    def execute_retrieves(self, request, items):
+        """
+        Executes the retrieve sub-requests of the same endpoint and parameters with a single query.
+
+        :param request: The batch request.
+        :param items: The retrieve sub-requests.
+        :return: A list of dictionaries of the status and the data of the responses, in order.
+        """
+        ## Get the endpoint:
+        viewset, path = self.get_endpoint(request, items[0]["uri"])
+        if viewset is None:
+            return [{"status": status.HTTP_404_NOT_FOUND, "data": {"detail": _("Not found.")}}] * len(items)
+
+        ## Set up the view as the retrieve endpoint would:
+        view = viewset(action_map={"get": "retrieve"}, args=(), kwargs={})
+        view.request = view.initialize_request(self.get_subrequest(request, path, items[0]["params"]))
+        view.headers = view.default_response_headers
+
+        ## Get and render the objects:
+        try:
+            ## Check authentication, permissions and throttles:
+            view.initial(view.request)
+
+            ## Convert the lookup values by the lookup field, invalid ones are not found:
+            queryset = view.filter_queryset(view.get_queryset())
+            pks = [pk for item in items for pk in item["pks"]]
+            lookups = self.get_lookups(queryset.model, view.lookup_field, pks)
+
+            ## Get the objects by their lookup values:
+            queryset = queryset.filter(**{"{}__in".format(view.lookup_field): set(lookups.values())})
+            objects = OrderedDict([(getattr(instance, view.lookup_field), instance) for instance in queryset])
+
+            ## Check the object permissions, forbidden objects are reported with their errors:
+            forbidden = {}
+            for value, instance in list(objects.items()):
+                try:
+                    view.check_object_permissions(view.request, instance)
+                except (NotAuthenticated, PermissionDenied) as error:
+                    response = view.handle_exception(error)
+                    forbidden[value] = {"status": response.status_code, "data": response.data}
+                    del objects[value]
+
+            ## Render the objects:
+            rendered = dict(zip(objects.keys(), view.get_serializer(list(objects.values()), many=True).data))
+        except Exception as error:
+            response = view.handle_exception(error)
+            return [{"status": response.status_code, "data": response.data}] * len(items)
+
+        ## Done, return the results:
+        return [self.get_retrieve_result(item, lookups, rendered, forbidden) for item in items]
+
+    def get_lookups(self, model, lookup_field, pks):
+        """
+        Returns the lookup values of the primary keys (or other lookup values) requested, converted by
+        the lookup field. Values which the field can not convert are left out.
+
+        :param model: The model.
+        :param lookup_field: The lookup field of the viewset.
+        :param pks: The values requested.
+        :return: A dictionary of the converted values by the string form of the values requested.
+        """
+        ## Get the lookup field:
+        field = model._meta.pk if lookup_field == "pk" else model._meta.get_field(lookup_field)
+
+        ## Convert the values:
+        lookups = {}
+        for pk in pks:
+            try:
+                value = field.to_python(pk)
+            except (DjangoValidationError, TypeError, ValueError):
+                continue
+            if value is not None:
+                lookups[str(pk)] = value
+
+        ## Done, return the converted values:
+        return lookups
+
+    def get_retrieve_result(self, item, lookups, rendered, forbidden):
+        """
+        Returns the result of the retrieve sub-request from the rendered objects.
+
+        :param item: The retrieve sub-request.
+        :param lookups: A dictionary of the converted lookup values by the string form of the values requested.
+        :param rendered: A dictionary of the rendered objects by their lookup values.
+        :param forbidden: A dictionary of the results of the forbidden objects by their lookup values.
+        :return: A dictionary of the status and the data of the response.
+        """
+        ## Get the lookup values of the objects requested, invalid ones are not found:
+        values = [lookups.get(str(pk)) for pk in item["pks"]]
+
+        ## Any object forbidden fails the sub-request:
+        for value in values:
+            if value in forbidden:
+                return forbidden[value]
+
+        ## Multiple objects are listed as found:
+        if item["many"]:
+            return {"status": status.HTTP_200_OK, "data": [rendered[value] for value in values if value in rendered]}
+
+        ## Single objects must be found:
+        data = rendered.get(values[0])
+        if data is None:
+            return {"status": status.HTTP_404_NOT_FOUND, "data": {"detail": _("Not found.")}}
+        return {"status": status.HTTP_200_OK, "data": data}
+
+
+def register_batch(router, uri="batch"):
+    """
+    Registers the batch endpoint with the router the lazydrf endpoints are registered with.
+
+    :param router: The router.
+    :param uri: The URI of the batch endpoint.
+    """
+    router.register(uri, BatchViewSet, base_name="batch")
@@ -0,0 +1,263 @@
+import hashlib
+import inspect
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from lazydrf.queries import get_query_plan
+
+
+#: Defines the concrete models whose generation counters are bumped on changes.
+TRACKED_MODELS = set()
+
+#: Defines the number of seconds the generation counters are kept for, bounding the staleness of
+#: anything keyed by them after writes which do not send signals (such as `QuerySet.update()`).
+GENERATIONS_TIMEOUT = 300
+
+
+def get_generations_cache():
+    """
+    Returns the cache the generation counters are kept in, as per the `LAZYDRF_GENERATIONS_CACHE` setting.
+
+    :return: The cache.
+    """
+    return caches[getattr(settings, "LAZYDRF_GENERATIONS_CACHE", "default")]
+
+
+def get_generation_key(model, pk=None):
+    """
+    Returns the cache key of the generation counter of the model, or of the object if the primary key is given.
+
+    :param model: The model.
+    :param pk: The primary key of the object if any.
+    :return: The cache key.
+    """
+    key = "lazydrf:generation:{}".format(model._meta.concrete_model._meta.label_lower)
+    return key if pk is None else "{}:{}".format(key, pk)
+
+
+def get_generations(models, pk=None):
+    """
+    Returns the generation counters of the models, or of the first model's object if the primary key is given.
+
+    Missing counters are initialized with a time based seed, so that counters evicted or expired from
+    the cache do not restart from a value seen before.
+
+    Note that an improperly configured error is raised if the counters of the first model are not
+    maintained, such as when `lazydrf` is not installed.
+
+    :param models: An iterable of models.
+    :param pk: The primary key of the object of the first model if any.
+    :return: A list of generation counters in the order of the models.
+    """
+    ## Check that the counters are maintained:
+    models = list(models)
+    if models and models[0]._meta.concrete_model not in TRACKED_MODELS:
+        raise ImproperlyConfigured("Generations of the model {} are not tracked, is lazydrf installed?".format(
+            models[0]._meta.label,
+        ))
+
+    ## Get the cache and the keys:
+    cache = get_generations_cache()
+    keys = [get_generation_key(model, pk if index == 0 else None) for index, model in enumerate(models)]
+
+    ## Get the counters:
+    generations = cache.get_many(keys)
+
+    ## Initialize missing counters:
+    for key in keys:
+        if key not in generations:
+            cache.add(key, _seed(), GENERATIONS_TIMEOUT)
+            generations[key] = cache.get(key)
+
+    ## Done, return counters:
+    return [generations[key] for key in keys]
+
+
+def bump_generation(model, pk=None):
+    """
+    Increments the generation counter of the model (or the object), invalidating everything keyed by it.
+
+    :param model: The model.
+    :param pk: The primary key of the object if any.
+    """
+    ## Get the cache and the key:
+    cache = get_generations_cache()
+    key = get_generation_key(model, pk)
+
+    ## Increment the counter, initialize if missing:
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _seed(), GENERATIONS_TIMEOUT)
+
+
+def bump_generations(model, pks):
+    """
+    Increments the generation counters of the model and the objects, such as after bulk operations
+    which do not send signals.
+
+    The counters of the objects are read and written with one cache round trip each instead of one
+    atomic increment per object. Note that the counters are then set to at least a fresh time based
+    seed, so that concurrent bulk writes of the same objects still move them past earlier values.
+
+    :param model: The model.
+    :param pks: An iterable of primary keys of the objects.
+    """
+    ## Nothing to do if the counters are not maintained:
+    if model._meta.concrete_model not in TRACKED_MODELS:
+        return
+
+    ## Bump the model counter:
+    bump_generation(model)
+
+    ## Get the cache and the keys of the objects:
+    cache = get_generations_cache()
+    keys = [get_generation_key(model, pk) for pk in pks]
+    if not keys:
+        return
+
+    ## Get the counters and set the next ones, never below a fresh seed:
+    generations = cache.get_many(keys)
+    seed = _seed()
+    cache.set_many(dict([(key, max(generations.get(key, 0) + 1, seed)) for key in keys]), GENERATIONS_TIMEOUT)
+
+
+def get_params_digest(*parts):
+    """
+    Returns a digest of the parts, such as normalized request parameters.
+
+    :param parts: Parts to digest.
+    :return: A hexadecimal digest.
+    """
+    return hashlib.md5(repr(parts).encode("utf-8")).hexdigest()
+
+
+def normalize_params(params, exclude=()):
+    """
+    Normalizes the query parameters into a sorted tuple of keys and sorted values.
+
+    :param params: A QueryDict.
+    :param exclude: Parameters to be excluded.
+    :return: A tuple.
+    """
+    return tuple(sorted((key, tuple(sorted(params.getlist(key)))) for key in params.keys() if key not in exclude))
+
+
+def get_keyed_models(model):
+    """
+    Returns the models whose changes alter the responses of the lazydrf model, hence the models whose
+    generation counters its caches and validators are keyed by.
+
+    These are the model itself, the related models rendered (expanded ones included) and the related
+    models filtered, searched, ordered or aggregated by.
+
+    :param model: The lazydrf model.
+    :return: A set of models.
+    """
+    ## Get the lazydrf meta:
+    ldrfmeta = model.LDRFMeta
+
+    ## Get the model and the related models rendered:
+    models = set([model]) | get_query_plan(ldrfmeta.serializer).models
+
+    ## Add the expandable related models and the related models they render:
+    for name in ldrfmeta.expandable:
+        related = model._meta.get_field(name).related_model
+        models |= set([related]) | get_query_plan(related.LDRFMeta.serializer).models
+
+    ## Get the field paths filtered, searched, ordered or aggregated by:
+    paths = [name for name, lookups in inspect.getmembers(ldrfmeta.filtering) if not name.startswith("__")]
+    paths += [name.lstrip("-^=@$") for name in ldrfmeta.ordering + ldrfmeta.searching]
+    paths += list(ldrfmeta.aggregating)
+
+    ## Add the related models along the paths:
+    for path in paths:
+        current = model
+        for name in path.split("__"):
+            try:
+                field = current._meta.get_field(name)
+            except FieldDoesNotExist:
+                break
+            if not field.is_relation or field.related_model is None:
+                break
+            current = field.related_model
+            models.add(current)
+
+    ## Done, return the models:
+    return models
+
+
+def track_generations(model):
+    """
+    Connects the signal handlers bumping the generation counters of the models the lazydrf model is keyed
+    by on their saves, deletes and many relation changes, unless connected already.
+
+    Handlers are connected per model, hence changes of the other models do not cost cache round trips.
+
+    :param model: The lazydrf model.
+    """
+    for tracked in sorted(get_keyed_models(model), key=lambda m: m._meta.label_lower):
+        ## Skip if connected already:
+        tracked = tracked._meta.concrete_model
+        if tracked in TRACKED_MODELS:
+            continue
+        TRACKED_MODELS.add(tracked)
+
+        ## Connect the handlers of saves and deletes:
+        label = tracked._meta.label_lower
+        post_save.connect(_on_change, sender=tracked, dispatch_uid="lazydrf.caching.post_save.{}".format(label))
+        post_delete.connect(_on_change, sender=tracked, dispatch_uid="lazydrf.caching.post_delete.{}".format(label))
+
+        ## Connect the handlers of the changes of many relations, forward or reverse:
+        for field in tracked._meta.get_fields(include_hidden=True):
+            through = field.many_to_many and (getattr(field, "through", None) or field.remote_field.through)
+            if through:
+                uid = "lazydrf.caching.m2m_changed.{}".format(through._meta.label_lower)
+                m2m_changed.connect(_on_m2m_change, sender=through, dispatch_uid=uid)
+
+
+def _seed():
+    """
+    Returns a seed for generation counters.
+    """
+    return int(time.time() * 1000)
+
+
+def _is_tracked(model):
+    """
+    Indicates if the generation counters of the model are maintained.
+    """
+    return model is not None and model._meta.concrete_model in TRACKED_MODELS
+
+
+def _on_change(sender, instance, **kwargs):
+    """
+    Bumps the generations of the model and the object saved or deleted.
+    """
+    bump_generation(sender)
+    bump_generation(sender, instance.pk)
+
+
+def _on_m2m_change(sender, instance, action, model, pk_set, **kwargs):
+    """
+    Bumps the generations of the tracked models and the objects on both sides of the changed many relation.
+    """
+    ## We are interested in the changes once done:
+    if not action.startswith("post_"):
+        return
+
+    ## Bump the instance side:
+    if _is_tracked(instance.__class__):
+        bump_generation(instance.__class__)
+        bump_generation(instance.__class__, instance.pk)
+
+    ## Bump the other side, note that the primary keys are not known on clear:
+    if _is_tracked(model):
+        bump_generation(model)
+        for pk in pk_set or []:
+            bump_generation(model, pk)
+
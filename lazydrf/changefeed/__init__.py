@@ -0,0 +1 @@
+default_app_config = "lazydrf.changefeed.apps.ChangefeedConfig"
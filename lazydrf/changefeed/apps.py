@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+
+class ChangefeedConfig(AppConfig):
+    name = "lazydrf.changefeed"
+    label = "lazydrf_changefeed"
+    verbose_name = "Change feeds of lazydrf models"
+
+    def ready(self):
+        ## Record the changes of tracked models:
+        from lazydrf.changefeed.signals import on_delete, on_m2m_change, on_save
+        post_save.connect(on_save, dispatch_uid="lazydrf.changefeed.post_save")
+        post_delete.connect(on_delete, dispatch_uid="lazydrf.changefeed.post_delete")
+        m2m_changed.connect(on_m2m_change, dispatch_uid="lazydrf.changefeed.m2m_changed")
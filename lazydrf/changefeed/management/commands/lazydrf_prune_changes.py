@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+from lazydrf.changefeed.models import prune_changes
+
+
+class Command(BaseCommand):
+    """
+    Defines a command which prunes the change log entries older than the retention period.
+    """
+
+    help = "Prunes the change log entries of lazydrf models older than the retention period."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", action="store", dest="days", type=int,
+                            default=getattr(settings, "LAZYDRF_CHANGES_RETENTION_DAYS", 30),
+                            help="Number of days to retain entries for, the LAZYDRF_CHANGES_RETENTION_DAYS "
+                                 "setting (30) by default.")
+        parser.add_argument("--database", action="store", dest="database", default=DEFAULT_DB_ALIAS,
+                            help="Database to prune the change log of.")
+
+    def handle(self, *args, **options):
+        ## Prune the entries created before the retention period:
+        count = prune_changes(timezone.now() - timedelta(days=options["days"]), using=options["database"])
+
+        ## Report:
+        if options["verbosity"] >= 1:
+            self.stdout.write("Pruned {} change log entries.".format(count))
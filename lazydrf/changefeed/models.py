@@ -0,0 +1,103 @@
+from django.db import models, router, transaction
+from django.db.models import Max
+
+
+class Change(models.Model):
+    """
+    Defines a change log entry of an object of a change-tracked lazydrf model.
+
+    Entries are ordered by their identifiers, which are the cursors of the change feeds.
+    """
+
+    #: Defines the label of the model such as "app.record".
+    model = models.CharField(max_length=255)
+
+    #: Defines the primary key of the object.
+    object_pk = models.CharField(max_length=255)
+
+    #: Indicates if the object is deleted.
+    deleted = models.BooleanField(default=False)
+
+    #: Defines the time of the change, such as to prune old entries.
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        index_together = [("model", "id")]
+
+
+class ChangeHorizon(models.Model):
+    """
+    Defines the identifier of the latest change log entry pruned of a model.
+
+    Cursors before the horizon have expired, since the changes after them are no longer known.
+    """
+
+    #: Defines the label of the model such as "app.record".
+    model = models.CharField(max_length=255, unique=True)
+
+    #: Defines the identifier of the latest entry pruned.
+    pruned = models.IntegerField(default=0)
+
+
+def get_model_label(model):
+    """
+    Returns the label the changes of the model are logged with.
+
+    :param model: The model.
+    :return: The label.
+    """
+    return model._meta.concrete_model._meta.label_lower
+
+
+def record_changes(model, pks, deleted=False, using=None):
+    """
+    Logs the changes of the objects of the model, such as after bulk operations which do not send signals.
+
+    :param model: The model.
+    :param pks: An iterable of primary keys of the objects.
+    :param deleted: Indicates if the objects are deleted.
+    :param using: The database alias to log to, the default routing if `None`.
+    """
+    ## Build the entries:
+    label = get_model_label(model)
+    entries = [Change(model=label, object_pk=str(pk), deleted=deleted) for pk in pks]
+
+    ## Insert:
+    if entries:
+        Change.objects.db_manager(using).bulk_create(entries)
+
+
+def get_horizon(model, using=None):
+    """
+    Returns the identifier of the latest change log entry pruned of the model.
+
+    :param model: The model.
+    :param using: The database alias to read from, the default routing if `None`.
+    :return: The identifier, `0` if no entries are pruned.
+    """
+    horizon = ChangeHorizon.objects.db_manager(using).filter(model=get_model_label(model))
+    return horizon.values_list("pruned", flat=True).first() or 0
+
+
+def prune_changes(before, using=None):
+    """
+    Deletes the change log entries created before the time, and moves the horizons of their models.
+
+    :param before: The time to prune the entries created before.
+    :param using: The database alias to prune, the default routing if `None`.
+    :return: The number of entries pruned.
+    """
+    with transaction.atomic(using=using or router.db_for_write(Change)):
+        ## Get the latest entry to prune by model:
+        entries = Change.objects.db_manager(using).filter(created__lt=before)
+        latest = entries.values("model").annotate(pruned=Max("id")).values_list("model", "pruned")
+
+        ## Move the horizons forward:
+        for label, pruned in latest:
+            horizon = ChangeHorizon.objects.db_manager(using).select_for_update().get_or_create(model=label)[0]
+            if pruned > horizon.pruned:
+                horizon.pruned = pruned
+                horizon.save(update_fields=["pruned"])
+
+        ## Prune and return the count:
+        return entries.delete()[0]
@@ -0,0 +1,45 @@
+from lazydrf.changefeed.models import record_changes
+
+
+def is_tracked(model):
+    """
+    Indicates if the model is a concrete lazydrf model whose changes are tracked.
+
+    :param model: The model.
+    :return: `True` if tracked, `False` otherwise.
+    """
+    ldrfmeta = getattr(model, "LDRFMeta", None)
+    return ldrfmeta is not None and not ldrfmeta.abstract and ldrfmeta.track_changes
+
+
+def on_save(sender, instance, raw=False, using=None, **kwargs):
+    """
+    Logs the change of the saved object of a tracked model.
+    """
+    if not raw and is_tracked(sender):
+        record_changes(sender, [instance.pk], using=using)
+
+
+def on_delete(sender, instance, using=None, **kwargs):
+    """
+    Logs the deletion of the object of a tracked model.
+    """
+    if is_tracked(sender):
+        record_changes(sender, [instance.pk], deleted=True, using=using)
+
+
+def on_m2m_change(sender, instance, action, model, pk_set, using=None, **kwargs):
+    """
+    Logs the changes of the objects of tracked models on both sides of the changed many relation.
+    """
+    ## We are interested in the changes once done:
+    if not action.startswith("post_"):
+        return
+
+    ## Log the instance side:
+    if is_tracked(instance.__class__):
+        record_changes(instance.__class__, [instance.pk], using=using)
+
+    ## Log the other side, note that the primary keys are not known on clear:
+    if is_tracked(model):
+        record_changes(model, pk_set or [], using=using)
@@ -0,0 +1,129 @@
+import time
+from contextlib import contextmanager
+
+import django
+from django.db.models import Case, Value, When
+
+
+def bulk_update(queryset, instances, fields, batch_size=None):
+    """
+    Updates the fields of the model instances with one query per batch.
+
+    Django's `QuerySet.bulk_update()` is used where available (Django 2.2+), otherwise the same
+    `UPDATE ... SET field = CASE pk WHEN ... END` query is built here.
+
+    :param queryset: The queryset of the model.
+    :param instances: A list of model instances.
+    :param fields: A list of field names to update.
+    :param batch_size: The number of instances per query if any.
+    """
+    ## Use Django's bulk update if available:
+    if hasattr(queryset, "bulk_update"):
+        queryset.bulk_update(instances, fields, batch_size=batch_size)
+        return
+
+    ## Get the model fields:
+    fields = [queryset.model._meta.get_field(name) for name in fields]
+
+    ## Update in batches:
+    batch_size = batch_size or len(instances) or 1
+    for offset in range(0, len(instances), batch_size):
+        ## Get the batch:
+        batch = instances[offset:offset + batch_size]
+
+        ## Build the updates per field:
+        updates = dict([
+            (field.attname, Case(*[
+                When(pk=instance.pk, then=Value(getattr(instance, field.attname), output_field=field))
+                for instance in batch
+            ], output_field=field))
+            for field in fields
+        ])
+
+        ## Update:
+        queryset.filter(pk__in=[instance.pk for instance in batch]).update(**updates)
+
+
+@contextmanager
+def track_queries(connection):
+    """
+    Tracks the number of queries run on the connection and the time spent in the database.
+
+    Django's `execute_wrapper()` is used where available (Django 2.0+), otherwise the cursors
+    created by the connection are wrapped in the meantime.
+
+    :param connection: The database connection such as `connections[alias]`, not the default connection proxy.
+    :return: A context manager yielding a dictionary of the "queries" count and the "time" in seconds.
+    """
+    ## Declare the statistics:
+    stats = {"queries": 0, "time": 0.0}
+
+    ## Use the execute wrapper if available:
+    if hasattr(connection, "execute_wrapper"):
+        def wrapper(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                stats["queries"] += 1
+                stats["time"] += time.perf_counter() - start
+
+        with connection.execute_wrapper(wrapper):
+            yield stats
+        return
+
+    ## Otherwise, wrap the cursors created by the connection, debug or not:
+    previous = dict([(name, connection.__dict__.get(name)) for name in ("make_cursor", "make_debug_cursor")])
+    for name in previous:
+        connection.__dict__[name] = _timed_cursor_factory(getattr(connection, name), stats)
+    try:
+        yield stats
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                del connection.__dict__[name]
+            else:
+                connection.__dict__[name] = value
+
+
+def _timed_cursor_factory(factory, stats):
+    """
+    Returns a cursor factory wrapping the cursors of the factory to track the queries in the statistics.
+    """
+    return lambda cursor: _TimedCursor(factory(cursor), stats)
+
+
+class _TimedCursor:
+    """
+    Defines a cursor proxy which tracks the number of queries and the time spent executing them.
+    """
+
+    def __init__(self, cursor, stats):
+        self.cursor = cursor
+        self.stats = stats
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return self.cursor.__exit__(*args)
+
+    def execute(self, sql, params=None):
+        return self.timed(self.cursor.execute, sql, params)
+
+    def executemany(self, sql, param_list):
+        return self.timed(self.cursor.executemany, sql, param_list)
+
+    def timed(self, execute, *args):
+        start = time.perf_counter()
+        try:
+            return execute(*args)
+        finally:
+            self.stats["queries"] += 1
+            self.stats["time"] += time.perf_counter() - start
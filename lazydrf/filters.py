@@ -0,0 +1,277 @@
+from collections import namedtuple
+
+from django import forms
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from django.forms.widgets import MultiWidget
+from django.utils.translation import ugettext_lazy as _
+from django_filters.filters import Filter
+from django_filters.filterset import STRICTNESS
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import DjangoFilterBackend
+
+
+#: Defines the maximum number of filter plans to be memoized per FilterSet class.
+FILTER_PLANS_CACHE_SIZE = 1024
+
+#: Defines the values which do not filter.
+EMPTY_VALUES = ([], (), {}, None, "")
+
+#: Defines the parameters of a FilterSet class: filter names by query parameter, and the supported
+#: query parameters by filtered field name.
+FilterParams = namedtuple("FilterParams", ["names", "supported"])
+
+#: Defines a prepared filter: the filter name, its form field, the lookup path, whether it excludes
+#: and whether it is combined with the other filters into a single `Q` object.
+PreparedFilter = namedtuple("PreparedFilter", ["name", "field", "lookup", "exclude", "combined"])
+
+#: Defines a filter plan: the prepared filters, the names of the filters applied by their FilterSet
+#: and whether the queryset is made distinct.
+FilterPlan = namedtuple("FilterPlan", ["prepared", "delegated", "distinct"])
+
+
+def is_plain_filter(filter_):
+    """
+    Indicates if the filter is a plain lookup filter which can be prepared, as opposed to method,
+    multiple choice, range or lookup type filters.
+
+    :param filter_: The filter.
+    :return: `True` if plain, `False` otherwise.
+    """
+    return type(filter_).filter is Filter.filter and isinstance(filter_.lookup_expr, str)
+
+
+def is_single_valued(model, path):
+    """
+    Indicates if the field path traverses forward single-valued relations only, hence lookups on it can
+    be combined into a single `filter()` call without changing the semantics.
+
+    :param model: The model.
+    :param path: The field path.
+    :return: `True` if single-valued, `False` otherwise.
+    """
+    for name in path.split("__")[:-1]:
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return False
+        if not (field.many_to_one or field.one_to_one) or field.related_model is None:
+            return False
+        model = field.related_model
+    return True
+
+
+def get_filter_params(filter_class):
+    """
+    Returns the query parameters of the FilterSet class.
+
+    Parameters are memoized on the class itself, hence released along with FilterSet classes which
+    are built per request (such as the `AutoFilterSet` classes of views declaring `filter_fields`).
+
+    :param filter_class: The FilterSet class.
+    :return: A FilterParams instance.
+    """
+    ## Return the parameters memoized on the class (not on a base class) if any:
+    if "_ldrf_filter_params" in filter_class.__dict__:
+        return filter_class._ldrf_filter_params
+
+    ## Declare the filter names by parameter and the supported parameters by field name:
+    names = {}
+    supported = {}
+
+    ## Iterate over filters:
+    for name, filter_ in filter_class.base_filters.items():
+        ## Get the parameters of the filter, multi-widgets have a parameter per sub-widget:
+        widget = filter_.field.widget
+        if isinstance(widget, MultiWidget):
+            params = ["{}_{}".format(name, index) for index in range(len(widget.widgets))]
+        else:
+            params = [name]
+
+        ## Add the parameters:
+        for param in params:
+            names[param] = name
+        supported.setdefault(filter_.name, []).extend(params)
+
+    ## Memoize and return the parameters:
+    filter_class._ldrf_filter_params = FilterParams(names, supported)
+    return filter_class._ldrf_filter_params
+
+
+def get_filter_plan(filter_class, names):
+    """
+    Returns the filter plan of the FilterSet class for the filters present in requests.
+
+    Filter plans are memoized on the FilterSet class per set of filters, hence lookups are resolved
+    once for requests with the same filter parameters regardless of their values. At most
+    `FILTER_PLANS_CACHE_SIZE` plans are memoized per class, further sets of filters are planned
+    per request.
+
+    :param filter_class: The FilterSet class.
+    :param names: A frozen set of the names of the filters present.
+    :return: A FilterPlan instance.
+    """
+    ## Get the plans memoized on the class (not on a base class), return the plan if memoized:
+    plans = filter_class.__dict__.get("_ldrf_filter_plans")
+    if plans is None:
+        plans = filter_class._ldrf_filter_plans = {}
+    elif names in plans:
+        return plans[names]
+
+    ## Declare the plan items:
+    prepared = []
+    delegated = []
+    distinct = False
+
+    ## Iterate over the filters in the declaration order:
+    for name, filter_ in filter_class.base_filters.items():
+        ## Skip if not present, absent filters do not filter:
+        if name not in names:
+            continue
+
+        ## Delegate to the FilterSet if not a plain filter:
+        if not is_plain_filter(filter_):
+            delegated.append(name)
+            continue
+
+        ## Prepare the filter:
+        prepared.append(PreparedFilter(
+            name,
+            filter_.field,
+            "{}__{}".format(filter_.name, filter_.lookup_expr),
+            filter_.exclude,
+            is_single_valued(filter_class._meta.model, filter_.name),
+        ))
+        distinct = distinct or filter_.distinct
+
+    ## Get the plan and memoize it if there is room:
+    plan = FilterPlan(tuple(prepared), tuple(delegated), distinct)
+    if len(plans) < FILTER_PLANS_CACHE_SIZE:
+        plans[names] = plan
+
+    ## Done, return the plan:
+    return plan
+
+
+class CompiledFilterBackend(DjangoFilterBackend):
+    """
+    Defines a filter backend which applies the FilterSet class of the view by memoized filter plans
+    instead of instantiating and validating the FilterSet form on every request.
+
+    Query parameters looking like a lookup on a filtered field which is not declared are rejected.
+    FilterSet classes with ordering fall back to the usual filter backend.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        """
+        Filters the queryset by the filter parameters of the request.
+        """
+        ## Get the filter class, fall back if none or ordering:
+        filter_class = self.get_filter_class(view, queryset)
+        if filter_class is None or filter_class._meta.order_by:
+            return super(CompiledFilterBackend, self).filter_queryset(request, queryset, view)
+
+        ## Get the parameters of the filter class and the request data:
+        params = get_filter_params(filter_class)
+        data = request.query_params
+
+        ## Get the names of the filters present, rejecting unsupported lookups early:
+        names = set()
+        for param in data:
+            if param in params.names:
+                names.add(params.names[param])
+            elif "__" in param:
+                self.check_lookup(param, params)
+
+        ## Nothing to do if no filters present:
+        if not names:
+            return queryset
+
+        ## Get the plan:
+        plan = get_filter_plan(filter_class, frozenset(names))
+
+        ## Clean the values and build the combined condition:
+        condition = Q()
+        separate = []
+        for item in plan.prepared:
+            ## Clean the value:
+            try:
+                value = item.field.clean(item.field.widget.value_from_datadict(data, {}, item.name))
+            except forms.ValidationError:
+                if filter_class.strict == STRICTNESS.RAISE_VALIDATION_ERROR:
+                    raise
+                elif bool(filter_class.strict) == STRICTNESS.RETURN_NO_RESULTS:
+                    return queryset.none()
+                continue
+
+            ## Skip if empty:
+            if value in EMPTY_VALUES:
+                continue
+
+            ## Combine or keep apart:
+            lookup = Q(**{item.lookup: value})
+            if item.combined:
+                condition &= ~lookup if item.exclude else lookup
+            else:
+                separate.append((item, value))
+
+        ## Apply the combined condition and the separate lookups in a chain:
+        queryset = queryset.filter(condition) if condition else queryset.all()
+        for item, value in separate:
+            queryset = (queryset.exclude if item.exclude else queryset.filter)(**{item.lookup: value})
+
+        ## Make distinct if required:
+        if plan.distinct:
+            queryset = queryset.distinct()
+
+        ## Apply the delegated filters via the FilterSet:
+        if plan.delegated:
+            queryset = self.apply_delegated(filter_class, data, queryset, plan.delegated)
+
+        ## Done, return the queryset:
+        return queryset
+
+    def check_lookup(self, param, params):
+        """
+        Raises a validation error if the query parameter is a lookup on a filtered field which is not supported.
+
+        :param param: The query parameter.
+        :param params: The FilterParams of the filter class.
+        """
+        field = param.rpartition("__")[0]
+        if field in params.supported:
+            raise ValidationError({param: [_("Unsupported filter lookup. Supported: {}.").format(
+                ", ".join(params.supported[field]),
+            )]})
+
+    def apply_delegated(self, filter_class, data, queryset, names):
+        """
+        Applies the filters which are not plain lookups via a FilterSet instance.
+
+        :param filter_class: The FilterSet class.
+        :param data: The request data.
+        :param queryset: The queryset.
+        :param names: Names of the filters to apply.
+        :return: The filtered queryset.
+        """
+        ## Create the FilterSet:
+        filterset = filter_class(data, queryset=queryset)
+
+        ## Apply the filters:
+        for name in names:
+            ## Clean the value:
+            try:
+                value = filterset.form.fields[name].clean(filterset.form[name].value())
+            except forms.ValidationError:
+                if filter_class.strict == STRICTNESS.RAISE_VALIDATION_ERROR:
+                    raise
+                elif bool(filter_class.strict) == STRICTNESS.RETURN_NO_RESULTS:
+                    return queryset.none()
+                continue
+
+            ## Filter:
+            if value is not None:
+                queryset = filterset.filters[name].filter(queryset, value)
+
+        ## Done, return the queryset:
+        return queryset
@@ -0,0 +1,248 @@
+import inspect
+from collections import namedtuple
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+
+from lazydrf.search import FullTextSearchFilter
+
+
+#: Defines the lookups which a B-tree index on the column can serve.
+INDEXABLE_LOOKUPS = {"exact", "in", "gt", "gte", "lt", "lte", "range", "isnull", "startswith", "year"}
+
+#: Defines the lookups of the search field prefixes of DRF's search filter.
+SEARCH_LOOKUPS = {"^": "istartswith", "=": "iexact", "@": "search", "$": "iregex", "": "icontains"}
+
+#: Defines the advice statuses.
+OK, MISSING, UNINDEXABLE, UNCHECKED = "ok", "missing", "unindexable", "unchecked"
+
+#: Defines an index advice on a field of a model for a lookup advertised by the API.
+Advice = namedtuple("Advice", ["model", "field", "source", "lookup", "status", "index"])
+
+
+def get_model_field(model, name):
+    """
+    Returns the concrete local field of the model by its name, `None` if there is no such field.
+
+    :param model: The model.
+    :param name: The name of the field.
+    :return: The model field if any, `None` otherwise.
+    """
+    ## The primary key can be referred to as "pk":
+    if name == "pk":
+        return model._meta.pk
+
+    ## Get the field:
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+    ## Done, return the field if concrete:
+    return field if field.concrete and not field.many_to_many else None
+
+
+def get_indexes(model):
+    """
+    Returns the column lists of the indexes declared on the model.
+
+    Each index is a tuple of field names with the leading field first.
+
+    :param model: The model.
+    :return: A list of field name tuples.
+    """
+    ## Get the model meta:
+    meta = model._meta
+
+    ## Single column indexes:
+    indexes = [(field.name,) for field in meta.concrete_fields if field.primary_key or field.unique or field.db_index]
+
+    ## Composite indexes:
+    indexes += [tuple(fields) for fields in list(meta.unique_together) + list(meta.index_together)]
+
+    ## Indexes declared via Meta.indexes where available:
+    indexes += [
+        tuple(name.lstrip("-") for name in index.fields) for index in getattr(meta, "indexes", []) if index.fields
+    ]
+
+    ## Done, return indexes:
+    return indexes
+
+
+def get_database_indexes(model, using):
+    """
+    Returns the column lists of the indexes of the model's table introspected from the database.
+
+    Each index is a tuple of field names with the leading field first, indexes on columns which
+    are not model fields (such as expression indexes) are skipped. There are no indexes if the
+    table does not exist (yet).
+
+    :param model: The model.
+    :param using: The database alias.
+    :return: A list of field name tuples.
+    """
+    ## Get the field names by column:
+    names = dict([(field.column, field.name) for field in model._meta.concrete_fields])
+
+    ## No indexes if the table does not exist:
+    if not has_table(model, using):
+        return []
+
+    ## Get the constraints:
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+
+    ## Done, return the indexes:
+    return [
+        tuple(names[column] for column in constraint["columns"])
+        for constraint in constraints.values()
+        if (constraint["index"] or constraint["unique"] or constraint["primary_key"]) and constraint["columns"]
+        and all(column in names for column in constraint["columns"])
+    ]
+
+
+def has_table(model, using):
+    """
+    Indicates if the table of the model exists in the database.
+
+    :param model: The model.
+    :param using: The database alias.
+    :return: `True` if the table exists, `False` otherwise.
+    """
+    return model._meta.db_table in connections[using].introspection.table_names()
+
+
+def is_indexed(model, name):
+    """
+    Indicates if the field is the leading column of an index on the model.
+
+    :param model: The model.
+    :param name: The name of the field.
+    :return: `True` if the field leads an index, `False` otherwise.
+    """
+    ## Get the field:
+    field = get_model_field(model, name)
+
+    ## Done, check the leading columns:
+    return field is not None and any(index[0] == field.name for index in get_indexes(model))
+
+
+def resolve_field(model, path):
+    """
+    Resolves the field path (such as "owner__name") to the model and the field it ends at.
+
+    :param model: The model to start resolving from.
+    :param path: The field path.
+    :return: A tuple of the model and its concrete field if any, `None`s otherwise.
+    """
+    ## Iterate over the path:
+    names = path.split("__")
+    for index, name in enumerate(names):
+        ## Get the field:
+        field = get_model_field(model, name)
+        if field is None and index + 1 < len(names):
+            ## Not a concrete field, we may be traversing a reverse or many relation:
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                return None, None
+
+        ## Check the field:
+        if field is None:
+            return None, None
+
+        ## Done if this is the last name:
+        if index + 1 == len(names):
+            return model, field
+
+        ## Move on to the related model:
+        if not field.is_relation or field.related_model is None:
+            return None, None
+        model = field.related_model
+
+
+def advise(model, using=None):
+    """
+    Returns the index advices for the filtering lookups, ordering and searching fields advertised by the API
+    of the model.
+
+    :param model: The lazydrf model.
+    :param using: The database alias to introspect existing indexes from, declared indexes only if `None`.
+    :return: A list of Advice instances.
+    """
+    ## Get the lazydrf meta and the viewset:
+    ldrfmeta = model.LDRFMeta
+    viewset = ldrfmeta.viewset
+
+    ## Declare the advices:
+    advices = []
+
+    ## Check the filtering lookups:
+    for name, lookups in inspect.getmembers(ldrfmeta.filtering):
+        if name.startswith("__"):
+            continue
+        elif hasattr(lookups, "__call__"):
+            advices.append(Advice(model, name, "filtering", "method", UNCHECKED, None))
+        else:
+            advices += [_advise_lookup(model, name, "filtering", lookup, using) for lookup in lookups]
+
+    ## Check the ordering fields:
+    advices += [_advise_lookup(model, name.lstrip("-"), "ordering", "order", using) for name in ldrfmeta.ordering]
+
+    ## Check the searching fields, unless served by the full-text search:
+    full_text = FullTextSearchFilter in viewset.filter_backends
+    for name in ldrfmeta.searching:
+        prefix = name[0] if name[:1] in SEARCH_LOOKUPS else ""
+        if full_text:
+            advices.append(Advice(model, name[len(prefix):], "searching", "fulltext", OK, None))
+        else:
+            advices.append(_advise_lookup(model, name[len(prefix):], "searching", SEARCH_LOOKUPS[prefix], using))
+
+    ## Check the keyset pagination ordering which is tiebroken by the primary key:
+    ordering = getattr(viewset, "ordering", None)
+    ordering = ordering if isinstance(ordering, str) else (list(ordering or []) or [None])[0]
+    field = ordering and get_model_field(model, ordering.lstrip("-"))
+    if field is not None and not field.unique and not field.is_relation:
+        index = (field.name, model._meta.pk.name)
+        status = OK if any(existing[:2] == index for existing in _get_indexes(model, using)) else MISSING
+        advices.append(Advice(model, ordering.lstrip("-"), "pagination", "order", status, index))
+
+    ## Suggest the composite indexes instead of the single-column ones they serve, being their prefixes:
+    composites = dict([
+        ((advice.model, advice.index[0]), advice.index)
+        for advice in advices if advice.status == MISSING and len(advice.index) > 1
+    ])
+    advices = [
+        advice._replace(index=composites.get((advice.model, advice.index[0]), advice.index))
+        if advice.status == MISSING else advice for advice in advices
+    ]
+
+    ## Done, return advices:
+    return advices
+
+
+def _get_indexes(model, using):
+    """
+    Returns the declared indexes of the model, and the database indexes if the database alias is given.
+    """
+    return get_indexes(model) + (get_database_indexes(model, using) if using else [])
+
+
+def _advise_lookup(model, path, source, lookup, using):
+    """
+    Returns the index advice for the lookup on the field path.
+    """
+    ## Resolve the field:
+    target, field = resolve_field(model, path)
+
+    ## Check the field and the lookup:
+    if field is None:
+        return Advice(model, path, source, lookup, UNCHECKED, None)
+    elif lookup not in INDEXABLE_LOOKUPS and lookup != "order":
+        return Advice(target, field.name, source, lookup, UNINDEXABLE, None)
+    elif any(index[0] == field.name for index in _get_indexes(target, using)):
+        return Advice(target, field.name, source, lookup, OK, None)
+
+    ## Done, the index is missing:
+    return Advice(target, field.name, source, lookup, MISSING, (field.name,))
@@ -0,0 +1,82 @@
+import logging
+from collections import OrderedDict
+
+from django.conf import settings
+from django.dispatch import Signal
+
+
+#: Defines the logger of the instrumentation records.
+logger = logging.getLogger("lazydrf.instrumentation")
+
+#: Defines the signal sent with the instrumentation record of each instrumented request, for metrics backends.
+request_instrumented = Signal(providing_args=["request", "record"])
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Defines the exception raised when a request exceeds its query budget and budgets are strict.
+    """
+    pass
+
+
+#: Defines the phases reported in the `Server-Timing` header and their descriptions.
+SERVER_TIMING_PHASES = OrderedDict([
+    ("db", "Database"),
+    ("query", "Queryset evaluation"),
+    ("serialize", "Serialization"),
+    ("render", "Rendering"),
+    ("total", "Total"),
+])
+
+
+def get_server_timing(record):
+    """
+    Returns the `Server-Timing` header value of the instrumentation record.
+
+    :param record: The instrumentation record with durations in seconds.
+    :return: The header value with durations in milliseconds.
+    """
+    return ", ".join([
+        '{};dur={:.2f};desc="{}"'.format(phase, record[phase] * 1000, description)
+        for phase, description in SERVER_TIMING_PHASES.items() if record.get(phase) is not None
+    ])
+
+
+def emit(sender, request, record):
+    """
+    Emits the instrumentation record as a structured log record and via the `request_instrumented` signal.
+
+    :param sender: The viewset class.
+    :param request: The request.
+    :param record: The instrumentation record.
+    """
+    ## Log the record, available as the `lazydrf` attribute of the log record:
+    logger.info(
+        "%s %s %s %.2fms %d queries", record["method"], record["path"], record["status"], record["total"] * 1000,
+        record["queries"], extra={"lazydrf": record},
+    )
+
+    ## Send the signal:
+    request_instrumented.send(sender=sender, request=request, record=record)
+
+
+def get_budget(budget, action):
+    """
+    Returns the budget of the action.
+
+    :param budget: The budget for all actions, or a dictionary of budgets by action, if any.
+    :param action: The action.
+    :return: The budget of the action if any, `None` otherwise.
+    """
+    return budget.get(action) if isinstance(budget, dict) else budget
+
+
+def report_budget_violation(message):
+    """
+    Reports the query budget violation, raising if the `LAZYDRF_STRICT_QUERY_BUDGETS` setting is enabled.
+
+    :param message: The description of the violation.
+    """
+    if getattr(settings, "LAZYDRF_STRICT_QUERY_BUDGETS", False):
+        raise QueryBudgetExceeded(message)
+    logger.warning("Query budget exceeded: %s", message)
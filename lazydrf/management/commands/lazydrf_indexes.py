@@ -0,0 +1,155 @@
+from collections import OrderedDict
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.db.migrations import AlterField, AlterIndexTogether, Migration
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+
+from lazydrf.indexes import MISSING, OK, UNINDEXABLE, advise, get_model_field, has_table
+from lazydrf.registry import registry
+
+
+class Command(BaseCommand):
+    """
+    Defines a command which reports the indexes missing for the filtering, ordering and searching
+    fields advertised by the lazydrf endpoints, and optionally writes migrations creating them.
+    """
+
+    help = "Reports the missing indexes of the lookups advertised by lazydrf endpoints."
+
+    def add_arguments(self, parser):
+        parser.add_argument("app_label", nargs="*", help="Application labels to check, all applications if none.")
+        parser.add_argument("--write", action="store_true", dest="write", default=False,
+                            help="Write a migration creating the missing indexes for each application.")
+        parser.add_argument("--database", action="store", dest="database", default=DEFAULT_DB_ALIAS,
+                            help="Database to introspect indexes from and to build the index statements for.")
+
+    def handle(self, *args, **options):
+        ## Check the application labels:
+        try:
+            for label in options["app_label"]:
+                apps.get_app_config(label)
+        except LookupError as error:
+            raise CommandError(str(error))
+
+        ## Declare the missing indexes by model:
+        missing = OrderedDict()
+
+        ## Iterate over the registered lazydrf models:
+        for model in registry.get_models(*options["app_label"]):
+            ## Report the model:
+            self.stdout.write(self.style.MIGRATE_HEADING("{}:".format(model._meta.label)))
+
+            ## Report the table if it does not exist, only the declared indexes are checked then:
+            if not has_table(model, options["database"]):
+                message = "  table {} does not exist (checking the declared indexes only)"
+                self.stdout.write(self.style.NOTICE(message.format(model._meta.db_table)))
+
+            ## Report the advices:
+            for advice in advise(model, options["database"]):
+                self.stdout.write(self.format_advice(model, advice))
+                if advice.status == MISSING:
+                    missing.setdefault(advice.model, OrderedDict())[advice.index] = None
+
+        ## Done if nothing is missing or not asked to write migrations:
+        if not missing or not options["write"]:
+            return
+
+        ## Get the migration operations by application:
+        operations = OrderedDict()
+        for model, indexes in missing.items():
+            operations.setdefault(model._meta.app_label, []).extend(self.get_index_operations(model, list(indexes)))
+
+        ## Write the migrations:
+        for app_label, app_operations in operations.items():
+            self.write_migration(app_label, app_operations)
+
+        ## Remind to declare the indexes on the models, since makemigrations would drop them otherwise:
+        self.stdout.write(self.style.NOTICE("Declare the indexes on the models, too:"))
+        for model, indexes in missing.items():
+            for index in indexes:
+                self.stdout.write(self.style.NOTICE("  {}: {}".format(model._meta.label, (
+                    "db_index=True on {}".format(index[0]) if len(index) == 1 else "index_together {}".format(index)
+                ))))
+
+    def format_advice(self, model, advice):
+        """
+        Formats the advice as a report line.
+
+        :param model: The model whose endpoint advertises the lookup.
+        :param advice: The advice.
+        :return: The report line.
+        """
+        ## Get the field label, qualified if on a related model:
+        field = advice.field if advice.model is model else "{}.{}".format(advice.model._meta.label, advice.field)
+
+        ## Get the line:
+        line = "  {} {} {}: {}".format(advice.source, field, advice.lookup, advice.status)
+
+        ## Done, style and return:
+        if advice.status == MISSING:
+            return self.style.WARNING("{} (suggested index on {})".format(line, ", ".join(advice.index)))
+        elif advice.status == UNINDEXABLE:
+            return self.style.ERROR("{} (no B-tree index can serve this lookup)".format(line))
+        elif advice.status == OK:
+            return line
+        return self.style.NOTICE(line)
+
+    def get_index_operations(self, model, indexes):
+        """
+        Returns the migration operations creating the indexes, altering the fields of single column
+        indexes to `db_index=True` and adding composite indexes to the `index_together` of the model.
+
+        :param model: The model.
+        :param indexes: A list of tuples of the field names of the indexes.
+        :return: A list of migration operations.
+        """
+        ## Declare the operations:
+        operations = []
+
+        ## Single column indexes alter their fields:
+        for index in [index for index in indexes if len(index) == 1]:
+            field = get_model_field(model, index[0])
+            name, path, args, kwargs = field.deconstruct()
+            kwargs["db_index"] = True
+            operations.append(AlterField(model._meta.model_name, field.name, field.__class__(*args, **kwargs)))
+
+        ## Composite indexes are added to the indexes together:
+        composites = [tuple(index) for index in indexes if len(index) > 1]
+        if composites:
+            together = set([tuple(fields) for fields in model._meta.index_together] + composites)
+            operations.append(AlterIndexTogether(model._meta.model_name, together))
+
+        ## Done, return the operations:
+        return operations
+
+    def write_migration(self, app_label, operations):
+        """
+        Writes the migration with the operations for the application.
+
+        :param app_label: The application label.
+        :param operations: A list of migration operations.
+        """
+        ## Get the leaf migrations of the application:
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        leaves = sorted(loader.graph.leaf_nodes(app_label))
+        if app_label not in loader.migrated_apps:
+            raise CommandError("Application {} has no migrations.".format(app_label))
+
+        ## Create the migration:
+        number = (MigrationAutodetector.parse_number(leaves[-1][1]) or 0) + 1 if leaves else 1
+        migration = Migration("{:04d}_lazydrf_indexes".format(number), app_label)
+        migration.dependencies = leaves
+        migration.operations = operations
+
+        ## Write the migration, note that older Django versions render it as bytes:
+        writer = MigrationWriter(migration)
+        content = writer.as_string()
+        with open(writer.path, "wb") as stream:
+            stream.write(content if isinstance(content, bytes) else content.encode("utf-8"))
+
+        ## Report:
+        self.stdout.write(self.style.MIGRATE_LABEL("Wrote {}".format(writer.path)))
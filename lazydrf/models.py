@@ -1,22 +1,74 @@
 import inspect
+from threading import RLock
 
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
 from django.db.models.base import ModelBase
 from django_filters import MethodFilter, FilterSet
 from rest_framework import filters
 from rest_framework.serializers import ModelSerializer
 from rest_framework.viewsets import ReadOnlyModelViewSet, ModelViewSet
 
+from lazydrf.caching import track_generations
+from lazydrf.filters import CompiledFilterBackend
+from lazydrf.pagination import KeysetPagination
+from lazydrf.registry import registry
+from lazydrf.search import FullTextSearchFilter, check_search_model
+from lazydrf.viewsets import (AggregateMixin, BulkMixin, CachedResponseMixin, ChangeFeedMixin, ColumnarMixin,
+                              CompiledListMixin, ConditionalMixin, ExpandMixin, InstrumentationMixin,
+                              PreconditionMixin, QueryPlanMixin, ReplicaMixin, SparseFieldsMixin,
+                              StreamingListMixin)
+
 
 class LDRFMeta:
     """
     Defines a lazydrf metadata class.
     """
 
+    #: Defines the artifacts which can be built lazily.
+    ARTIFACTS = [
+        "serializer", "ordering", "searching", "aggregating", "expandable", "modified", "filtering", "viewset",
+    ]
+
+    #: Defines the lock guarding lazy builds, reentrant as artifacts build the artifacts of base models.
+    LOCK = RLock()
+
     def __init__(self, model):
         self.__model = model
         self.__meta = getattr(model, "_meta")
         self.__name = self.__meta.model_name
         self.__abstract = hasattr(self.__meta, "abstract") and self.__meta.abstract
+        self.__builders = dict()
+        self.__track_changes = False
+        self.__track_generations = False
+
+    def defer(self, artifact, builder):
+        """
+        Defers building the artifact (such as the serializer) until it is first accessed.
+
+        :param artifact: The name of the artifact.
+        :param builder: A callable building the artifact.
+        """
+        self.__builders[artifact] = builder
+
+    def build(self):
+        """
+        Builds all deferred artifacts, such as to warm up in the `ready()` of an application.
+        """
+        ## Build the artifacts:
+        for artifact in self.ARTIFACTS:
+            getattr(self, artifact)
+
+        ## Build the filterset, only for concrete models:
+        if not self.abstract:
+            getattr(self, "filterset")
+
+    def _build(self, artifact):
+        """
+        Builds and sets the artifact if it is not set yet but deferred.
+        """
+        with self.LOCK:
+            if not hasattr(self, "__{}".format(artifact)) and artifact in self.__builders:
+                setattr(self, artifact, self.__builders.pop(artifact)())
 
     @property
     def model(self):
@@ -54,15 +106,57 @@ class LDRFMeta:
         """
         return self.__abstract
 
+    @property
+    def track_changes(self):
+        """
+        Indicates if the changes of the model are logged to the change feed.
+
+        This is known without building the viewset, hence it can be checked on every save.
+
+        :return: `True` if tracked, `False` otherwise.
+        """
+        return self.__track_changes
+
+    @track_changes.setter
+    def track_changes(self, value):
+        """
+        Sets if the changes of the model are logged to the change feed.
+
+        :param value: `True` if tracked, `False` otherwise.
+        """
+        self.__track_changes = bool(value)
+
+    @property
+    def track_generations(self):
+        """
+        Indicates if the viewset is keyed by generation counters, ie. it caches responses, answers conditional
+        requests or caches counts, hence the counters of the models it is keyed by must be maintained.
+
+        This is known without building the viewset, hence the signal handlers can be connected on start-up.
+
+        :return: `True` if tracked, `False` otherwise.
+        """
+        return self.__track_generations
+
+    @track_generations.setter
+    def track_generations(self, value):
+        """
+        Sets if the viewset is keyed by generation counters.
+
+        :param value: `True` if tracked, `False` otherwise.
+        """
+        self.__track_generations = bool(value)
+
     @property
     def serializer(self):
         """
         Returns the serializer of the model.
 
-        Note that a runtime error is raised if the serializer is not set yet.
+        Note that a runtime error is raised if the serializer is neither set nor deferred yet.
 
         :return: The serializer of the model.
         """
+        self._build("serializer")
         if not hasattr(self, "__serializer"):
             raise RuntimeError("Serializer for the model {} is not defined yet.".format(self.name))
         return getattr(self, "__serializer")
@@ -85,10 +179,11 @@ class LDRFMeta:
         """
         Returns the ordering of the model.
 
-        Note that a runtime error is raised if the ordering is not set yet.
+        Note that a runtime error is raised if the ordering is neither set nor deferred yet.
 
         :return: The ordering of the model.
         """
+        self._build("ordering")
         if not hasattr(self, "__ordering"):
             raise RuntimeError("Ordering for the model {} is not defined yet.".format(self.name))
         return getattr(self, "__ordering")
@@ -111,10 +206,11 @@ class LDRFMeta:
         """
         Returns the searching of the model.
 
-        Note that a runtime error is raised if the searching is not set yet.
+        Note that a runtime error is raised if the searching is neither set nor deferred yet.
 
         :return: The searching of the model.
         """
+        self._build("searching")
         if not hasattr(self, "__searching"):
             raise RuntimeError("Searching for the model {} is not defined yet.".format(self.name))
         return getattr(self, "__searching")
@@ -132,15 +228,70 @@ class LDRFMeta:
             raise RuntimeError("Searching is already set.")
         setattr(self, "__searching", value)
 
+    @property
+    def aggregating(self):
+        """
+        Returns the aggregating of the model.
+
+        Note that a runtime error is raised if the aggregating is neither set nor deferred yet.
+
+        :return: The aggregating of the model.
+        """
+        self._build("aggregating")
+        if not hasattr(self, "__aggregating"):
+            raise RuntimeError("Aggregating for the model {} is not defined yet.".format(self.name))
+        return getattr(self, "__aggregating")
+
+    @aggregating.setter
+    def aggregating(self, value):
+        """
+        Sets the aggregating of the model.
+
+        Note that a runtime error is raised if the aggregating is already set.
+
+        :param value: The aggregating.
+        """
+        if hasattr(self, "__aggregating"):
+            raise RuntimeError("Aggregating is already set.")
+        setattr(self, "__aggregating", value)
+
+    @property
+    def expandable(self):
+        """
+        Returns the expandable relations of the model.
+
+        Note that a runtime error is raised if the expandable relations are neither set nor deferred yet.
+
+        :return: The expandable relations of the model.
+        """
+        self._build("expandable")
+        if not hasattr(self, "__expandable"):
+            raise RuntimeError("Expandable relations for the model {} are not defined yet.".format(self.name))
+        return getattr(self, "__expandable")
+
+    @expandable.setter
+    def expandable(self, value):
+        """
+        Sets the expandable relations of the model.
+
+        Note that a runtime error is raised if the expandable relations are already set.
+
+        :param value: The expandable relations.
+        """
+        if hasattr(self, "__expandable"):
+            raise RuntimeError("Expandable relations are already set.")
+        setattr(self, "__expandable", value)
+
     @property
     def filtering(self):
         """
         Returns the filtering of the model.
 
-        Note that a runtime error is raised if the filtering is not set yet.
+        Note that a runtime error is raised if the filtering is neither set nor deferred yet.
 
         :return: The filtering of the model.
         """
+        self._build("filtering")
         if not hasattr(self, "__filtering"):
             raise RuntimeError("Filtering for the model {} is not defined yet.".format(self.name))
         return getattr(self, "__filtering")
@@ -158,15 +309,43 @@ class LDRFMeta:
             raise RuntimeError("Filtering is already set.")
         setattr(self, "__filtering", value)
 
+    @property
+    def modified(self):
+        """
+        Returns the name of the last modification timestamp field of the model if any.
+
+        Note that a runtime error is raised if the modified field is neither set nor deferred yet.
+
+        :return: The name of the modified field if any, `None` otherwise.
+        """
+        self._build("modified")
+        if not hasattr(self, "__modified"):
+            raise RuntimeError("Modified field for the model {} is not defined yet.".format(self.name))
+        return getattr(self, "__modified")
+
+    @modified.setter
+    def modified(self, value):
+        """
+        Sets the name of the last modification timestamp field of the model.
+
+        Note that a runtime error is raised if the modified field is already set.
+
+        :param value: The name of the modified field.
+        """
+        if hasattr(self, "__modified"):
+            raise RuntimeError("Modified field is already set.")
+        setattr(self, "__modified", value)
+
     @property
     def viewset(self):
         """
         Returns the viewset of the model.
 
-        Note that a runtime error is raised if the viewset is not set yet.
+        Note that a runtime error is raised if the viewset is neither set nor deferred yet.
 
         :return: The viewset of the model.
         """
+        self._build("viewset")
         if not hasattr(self, "__viewset"):
             raise RuntimeError("Viewset for the model {} is not defined yet.".format(self.name))
         return getattr(self, "__viewset")
@@ -184,6 +363,18 @@ class LDRFMeta:
             raise RuntimeError("Viewset is already set.")
         setattr(self, "__viewset", value)
 
+    @property
+    def filterset(self):
+        """
+        Returns the FilterSet class of the model, built on first access.
+
+        :return: The FilterSet class.
+        """
+        with self.LOCK:
+            if not hasattr(self, "__filterset"):
+                setattr(self, "__filterset", self._get_filter_class())
+        return getattr(self, "__filterset")
+
     def _get_filter_class(self):
         """
         Process the filtering information and constructs a FilterSet.
@@ -226,8 +417,17 @@ class LDRFMeta:
         """
         Registers the viewset to the router.
         """
+        ## Check if the URI is taken on the router:
+        taken = [
+            entry[1] for entry in router.registry if entry[0] == self.viewset.uri and entry[1] is not self.viewset
+        ]
+        if taken:
+            raise ImproperlyConfigured("URI {} of the model {} collides with the viewset of the model {}.".format(
+                self.viewset.uri, self.meta.label, getattr(taken[0], "model", taken[0]),
+            ))
+
         ## Set the filter class on the viewset:
-        self.viewset.filter_class = self._get_filter_class()
+        self.viewset.filter_class = self.filterset
 
         ## Now, register:
         router.register(self.viewset.uri, self.viewset)
@@ -246,13 +446,25 @@ class LDRF(ModelBase):
                         ("readable", list),
                         ("declared", dict),
                         ("ordering", list),
-                        ("searching", list)]
+                        ("searching", list),
+                        ("aggregating", dict),
+                        ("expandable", list),
+                        ("modified", lambda: None)]
 
     #: Defines APIFields attributes and their defaults:
     API_VIEWSET_ATTRS = [
         ("readonly", lambda: False),
+        ("full_text_search", lambda: False),
     ]
 
+    #: Defines the mixins of the generated viewsets.
+    API_VIEWSET_MIXINS = [InstrumentationMixin, ConditionalMixin, CachedResponseMixin, StreamingListMixin,
+                          CompiledListMixin, ColumnarMixin, AggregateMixin, ChangeFeedMixin, QueryPlanMixin,
+                          ExpandMixin, SparseFieldsMixin, ReplicaMixin]
+
+    #: Defines the additional mixins of the generated viewsets which are not read-only.
+    API_VIEWSET_WRITE_MIXINS = [PreconditionMixin, BulkMixin]
+
     def __new__(mcs, name, bases, attrs, **kwargs):
         """
         Processes the model provided with name, base classes, class attributes and additional
@@ -282,20 +494,33 @@ class LDRF(ModelBase):
         ## Set the LDRFMeta attribute:
         model.LDRFMeta = LDRFMeta(model)
 
-        ## Set the serializer:
-        model.LDRFMeta.serializer = LDRF.build_serializer(model, api_fields, bases)
-
-        ## Set the ordering:
-        model.LDRFMeta.ordering = LDRF.build_ordering(model, api_fields, bases)
-
-        ## Set the searching:
-        model.LDRFMeta.searching = LDRF.build_searching(model, api_fields, bases)
-
-        ## Set the filtering:
-        model.LDRFMeta.filtering = LDRF.build_filtering(model, api_filtering, bases)
+        ## Set if changes are tracked and if the viewset is keyed by generations, as the viewset will:
+        model.LDRFMeta.track_changes = LDRF.get_track_changes(api_viewset, bases)
+        model.LDRFMeta.track_generations = LDRF.get_track_generations(api_viewset, bases)
+
+        ## Defer building the serializer, ordering, searching, aggregating, expandable relations, modified field,
+        ## filtering and viewset until first access:
+        model.LDRFMeta.defer("serializer", lambda: LDRF.build_serializer(model, api_fields, bases))
+        model.LDRFMeta.defer("ordering", lambda: LDRF.build_ordering(model, api_fields, bases))
+        model.LDRFMeta.defer("searching", lambda: LDRF.build_searching(model, api_fields, bases))
+        model.LDRFMeta.defer("aggregating", lambda: LDRF.build_aggregating(model, api_fields, bases))
+        model.LDRFMeta.defer("expandable", lambda: LDRF.build_expandable(model, api_fields, bases))
+        model.LDRFMeta.defer("modified", lambda: LDRF.build_modified(model, api_fields, bases))
+        model.LDRFMeta.defer("filtering", lambda: LDRF.build_filtering(model, api_filtering, bases))
+        model.LDRFMeta.defer("viewset", lambda: LDRF.build_viewset(model, api_viewset, bases))
+
+        ## Check if the full-text index of concrete models can be kept:
+        if api_viewset.full_text_search and not model.LDRFMeta.abstract:
+            check_search_model(model)
+
+        ## Add concrete models to the registry:
+        if not model.LDRFMeta.abstract:
+            registry.add(model)
 
-        ## Set the viewset:
-        model.LDRFMeta.viewset = LDRF.build_viewset(model, api_viewset, bases)
+        ## Maintain the generations of concrete models declared once the applications are ready, such as
+        ## dynamically, the ones declared before are tracked by the application:
+        if not model.LDRFMeta.abstract and model.LDRFMeta.track_generations and model._meta.apps.ready:
+            track_generations(model)
 
         ## Done, return the model:
         return model
@@ -362,6 +587,63 @@ class LDRF(ModelBase):
         """
         return [field for base in bases for field in mcs.get_searching(base)] + spec.searching
 
+    @classmethod
+    def build_aggregating(mcs, model, spec, bases):
+        """
+        Returns the aggregating fields and their operations.
+
+        :param model: The model.
+        :param spec: Aggregating specification.
+        :param bases: Base classes of the model.
+        :return: A dictionary of lists of operations by field.
+        """
+        ## Merge the aggregating of the base models and the spec:
+        aggregating = dict()
+        for entry in [mcs.get_aggregating(base) for base in bases] + [spec.aggregating]:
+            for field, operations in (entry or {}).items():
+                merged = aggregating.setdefault(field, [])
+                merged.extend([operation for operation in operations if operation not in merged])
+
+        ## Done, return the aggregating:
+        return aggregating
+
+    @classmethod
+    def build_expandable(mcs, model, spec, bases):
+        """
+        Returns the expandable relations.
+
+        Note that an improperly configured error is raised if a relation is not one to a lazydrf model.
+
+        :param model: The model.
+        :param spec: Expandable relations specification.
+        :param bases: Base classes of the model.
+        :return: A list of relation names.
+        """
+        ## Check the relations of the spec:
+        for name in spec.expandable:
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                field = None
+            if field is None or not field.is_relation or mcs.get_ldrfmeta(field.related_model) is None:
+                message = "Expandable {} of the model {} is not a relation to a lazydrf model."
+                raise ImproperlyConfigured(message.format(name, model._meta.label))
+
+        ## Done, return the expandable relations:
+        return [name for base in bases for name in mcs.get_expandable(base)] + spec.expandable
+
+    @classmethod
+    def build_modified(mcs, model, spec, bases):
+        """
+        Returns the name of the last modification timestamp field.
+
+        :param model: The model.
+        :param spec: Modified field specification.
+        :param bases: Base classes of the model.
+        :return: The name of the modified field if any, `None` otherwise.
+        """
+        return spec.modified or next((field for field in [mcs.get_modified(base) for base in bases] if field), None)
+
     @classmethod
     def build_filtering(cls, model, spec, bases):
         """
@@ -407,7 +689,9 @@ class LDRF(ModelBase):
         attrs["serializer_class"] = model.LDRFMeta.serializer
 
         ## Add filtering backends for the rest of the specifications:
-        attrs["filter_backends"] = (filters.OrderingFilter, filters.SearchFilter, filters.DjangoFilterBackend)
+        attrs["filter_backends"] = (filters.OrderingFilter,
+                                    FullTextSearchFilter if spec.full_text_search else filters.SearchFilter,
+                                    CompiledFilterBackend)
 
         ## Set ordering fields:
         attrs["ordering_fields"] = model.LDRFMeta.ordering
@@ -419,6 +703,19 @@ class LDRF(ModelBase):
         ## Set searching fields:
         attrs["search_fields"] = model.LDRFMeta.searching
 
+        ## Set aggregating fields:
+        attrs["aggregating"] = model.LDRFMeta.aggregating
+
+        ## Set expandable relations:
+        attrs["expandable"] = model.LDRFMeta.expandable
+
+        ## Set the modified field:
+        attrs["modified_field"] = model.LDRFMeta.modified
+
+        ## Set the keyset pagination, unless inherited from the base viewsets:
+        if not base_viewsets:
+            attrs["pagination_class"] = KeysetPagination
+
         ## Set the filter class:
         attrs["_filter_class"] = model.LDRFMeta.filtering
 
@@ -430,11 +727,52 @@ class LDRF(ModelBase):
         attrs.update(dict([field for field in inspect.getmembers(spec) if not field[0].startswith("__")]))
 
         ## Defines the base classes to extend:
-        base_viewsets = tuple(base_viewsets) or (ReadOnlyModelViewSet if spec.readonly else ModelViewSet,)
+        base_viewsets = tuple(base_viewsets) or (
+            tuple(cls.API_VIEWSET_MIXINS + ([] if spec.readonly else cls.API_VIEWSET_WRITE_MIXINS)) +
+            (ReadOnlyModelViewSet if spec.readonly else ModelViewSet,)
+        )
 
         ## Done, create and return:
         return type("Viewset", base_viewsets, attrs)
 
+    @classmethod
+    def get_track_changes(mcs, spec, bases):
+        """
+        Returns if the changes of the model are tracked as per the specification, or as inherited from
+        the base models as the viewset would.
+
+        :param spec: Viewset specification.
+        :param bases: Base classes of the model.
+        :return: `True` if tracked, `False` otherwise.
+        """
+        ## Check the specification:
+        if hasattr(spec, "track_changes"):
+            return bool(spec.track_changes)
+
+        ## Check the base models:
+        ldrfmetas = [e for e in [mcs.get_ldrfmeta(base) for base in bases] if e is not None]
+        return bool(ldrfmetas) and ldrfmetas[0].track_changes
+
+    @classmethod
+    def get_track_generations(mcs, spec, bases):
+        """
+        Returns if the viewset is keyed by generation counters as per the specification, or as inherited
+        from the base models.
+
+        :param spec: Viewset specification.
+        :param bases: Base classes of the model.
+        :return: `True` if keyed by generations, `False` otherwise.
+        """
+        ## Check the specification:
+        options = [getattr(spec, "cache_responses", False), getattr(spec, "conditional", False),
+                   getattr(spec, "count_strategy", None) == "cached"]
+        if any(options):
+            return True
+
+        ## Check the base models:
+        ldrfmetas = [e for e in [mcs.get_ldrfmeta(base) for base in bases] if e is not None]
+        return bool(ldrfmetas) and ldrfmetas[0].track_generations
+
     @classmethod
     def get_ldrfmeta(mcs, model):
         """
@@ -475,6 +813,36 @@ class LDRF(ModelBase):
         """
         return (mcs.get_ldrfmeta(model) or []) and model.LDRFMeta.searching
 
+    @classmethod
+    def get_aggregating(mcs, model):
+        """
+        Returns the aggregating from the model.
+
+        :param model: The model from which the aggregating to be extracted.
+        :return: The aggregating if any, `None` otherwise
+        """
+        return mcs.get_ldrfmeta(model) and model.LDRFMeta.aggregating
+
+    @classmethod
+    def get_expandable(mcs, model):
+        """
+        Returns the expandable relations from the model.
+
+        :param model: The model from which the expandable relations to be extracted.
+        :return: The expandable relations if any, `None` otherwise
+        """
+        return (mcs.get_ldrfmeta(model) or []) and model.LDRFMeta.expandable
+
+    @classmethod
+    def get_modified(mcs, model):
+        """
+        Returns the modified field from the model.
+
+        :param model: The model from which the modified field to be extracted.
+        :return: The modified field if any, `None` otherwise
+        """
+        return mcs.get_ldrfmeta(model) and model.LDRFMeta.modified
+
     @classmethod
     def get_filtering(mcs, model):
         """
@@ -0,0 +1,481 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from functools import reduce
+from itertools import takewhile
+from operator import and_, or_
+
+from django.apps import apps
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from django.template import loader
+from django.utils.translation import ugettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from lazydrf.caching import get_generations, get_params_digest, normalize_params
+from lazydrf.indexes import get_model_field, is_indexed
+
+
+#: Defines the models by their table names, collected once the models are loaded.
+TABLE_MODELS = {}
+
+
+class KeysetPagination(BasePagination):
+    """
+    Defines a keyset (cursor) pagination which seeks to the page position instead of scanning an offset.
+
+    The ordering is taken from the `?ordering=` parameter if all of its fields are indexed and
+    keyset-able, from the viewset's default ordering otherwise. The primary key is appended as
+    the tiebreaker unless the ordering contains a unique field already.
+
+    The number of items is not reported unless a count strategy is chosen via the viewset's
+    `count_strategy`: "exact" counts on every page, "cached" caches the count per filter
+    parameters until the models queried change, and "estimated" uses the query planner's
+    estimate if above `count_estimate_threshold`, counting exactly otherwise.
+    """
+
+    #: Defines the request parameter of the cursor.
+    cursor_query_param = "cursor"
+
+    #: Defines the default page size, overridden by the viewset's `page_size` if any.
+    page_size = api_settings.PAGE_SIZE or 100
+
+    #: Defines the message for invalid cursors.
+    invalid_cursor_message = _("Invalid cursor")
+
+    #: Defines the template for the browsable API.
+    template = "rest_framework/pagination/previous_and_next.html"
+
+    #: Defines the default count strategy, overridden by the viewset's `count_strategy` if any.
+    count_strategy = "none"
+
+    #: Defines the default estimated number of items above which the estimate is reported.
+    count_estimate_threshold = 10000
+
+    #: Defines the cache alias to store counts in.
+    count_cache_alias = "default"
+
+    #: Defines the timeout of cached counts in seconds.
+    count_cache_timeout = 3600
+
+    #: Defines the count methods by count strategy.
+    count_methods = {
+        "none": None,
+        "exact": "get_exact_count",
+        "cached": "get_cached_count",
+        "estimated": "get_estimated_count",
+    }
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Paginates the queryset and returns the page as a list.
+
+        :param queryset: The queryset to paginate.
+        :param request: The request.
+        :param view: The view.
+        :return: The list of items in the page.
+        """
+        ## Get the page size, base url and ordering:
+        self.page_size = getattr(view, "page_size", None) or self.page_size
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        ## Count the items as per the count strategy:
+        self.count, self.count_estimated = self.get_count(queryset, request, view)
+
+        ## Decode the cursor:
+        reverse, position = self.decode_cursor(request, queryset.model)
+
+        ## Order the queryset, in reverse if we are paging backwards:
+        queryset = queryset.order_by(*(_reverse_ordering(self.ordering) if reverse else self.ordering))
+
+        ## Make sure that the ordering columns are loaded if columns are projected:
+        queryset = _load_columns(queryset, [field.lstrip("-") for field in self.ordering])
+
+        ## Seek to the position if any:
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(self.ordering, position, reverse))
+
+        ## Fetch the page with an extra item telling if there are more items:
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+
+        ## The query was in reverse, hence the page, too:
+        if reverse:
+            self.page.reverse()
+
+        ## Determine the next and previous pages:
+        self.has_next = position is not None if reverse else has_more
+        self.has_previous = has_more if reverse else position is not None
+
+        ## Display page controls in the browsable API if there is more than one page:
+        self.display_page_controls = (self.has_next or self.has_previous) and self.template is not None
+
+        ## Done, return the page:
+        return self.page
+
+    def get_paginated_response(self, data):
+        """
+        Returns the paginated response.
+
+        :param data: The serialized page.
+        :return: A response.
+        """
+        ## Report the count if counted:
+        count = [] if self.count is None else [("count", self.count)]
+        count += [("count_estimated", self.count_estimated)] if self.count_estimated is not None else []
+
+        ## Done, return the response:
+        return Response(OrderedDict(count + [
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+    def get_count(self, queryset, request, view):
+        """
+        Counts the items as per the count strategy of the view.
+
+        Note that an improperly configured error is raised if the count strategy is not known.
+
+        :param queryset: The filtered queryset.
+        :param request: The request.
+        :param view: The view.
+        :return: A tuple of the count if counted and whether it is estimated if applicable, `None`s otherwise.
+        """
+        ## Get the count strategy:
+        strategy = getattr(view, "count_strategy", None) or self.count_strategy
+        if strategy not in self.count_methods:
+            raise ImproperlyConfigured("Unknown count strategy: {}".format(strategy))
+
+        ## Done, count if required:
+        method = self.count_methods[strategy]
+        return (None, None) if method is None else getattr(self, method)(queryset, request, view)
+
+    def get_exact_count(self, queryset, request, view):
+        """
+        Returns the exact count of the items.
+        """
+        return queryset.count(), None
+
+    def get_cached_count(self, queryset, request, view):
+        """
+        Returns the count of the items cached per filter parameters and the generations of the models queried.
+
+        Counts read from a replica are not cached, since it may lag behind the generations.
+        """
+        ## Count exactly if reading from a replica:
+        if getattr(view, "is_replica_read", lambda request: False)(request):
+            return queryset.count(), None
+
+        ## Get the models queried, note that joined tables are known once filtered:
+        tables = set([join.table_name for join in queryset.query.alias_map.values()])
+        table_models = get_table_models()
+        models = [queryset.model] + sorted(
+            [model for table in tables for model in table_models.get(table, []) if model is not queryset.model],
+            key=lambda model: model._meta.label_lower,
+        )
+
+        ## Get the user if the view caches per user:
+        user = getattr(request.user, "pk", None) if getattr(view, "cache_per_user", False) else None
+
+        ## Get the key:
+        digest = get_params_digest(
+            request.path, user, normalize_params(request.query_params, exclude=(self.cursor_query_param,)),
+            get_generations(models),
+        )
+        key = "lazydrf:count:{}:{}".format(queryset.model._meta.label_lower, digest)
+
+        ## Get the count from the cache, count if missing:
+        cache = caches[self.count_cache_alias]
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, self.count_cache_timeout)
+
+        ## Done, return the count:
+        return count, None
+
+    def get_estimated_count(self, queryset, request, view):
+        """
+        Returns the estimated count of the items if above the threshold, the exact count otherwise.
+        """
+        ## Get the estimate and the threshold:
+        estimate = estimate_count(queryset)
+        threshold = getattr(view, "count_estimate_threshold", None) or self.count_estimate_threshold
+
+        ## Done, return the estimate if large enough, count otherwise:
+        if estimate is not None and estimate >= threshold:
+            return estimate, True
+        return queryset.count(), False
+
+    def get_next_link(self):
+        """
+        Returns the link to the next page if any.
+
+        If the page is empty, the next page is the first page.
+
+        :return: The link to the next page if any, `None` otherwise.
+        """
+        if not self.has_next:
+            return None
+        return self.encode_cursor(False, self.get_position(self.page[-1]) if self.page else None)
+
+    def get_previous_link(self):
+        """
+        Returns the link to the previous page if any.
+
+        If the page is empty, the previous page is the last page.
+
+        :return: The link to the previous page if any, `None` otherwise.
+        """
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(True, self.get_position(self.page[0]) if self.page else None)
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Returns the keyset ordering as a tuple of field names prefixed with "-" if descending.
+
+        :param request: The request.
+        :param queryset: The queryset.
+        :param view: The view.
+        :return: A tuple of field names.
+        """
+        ## Get the model:
+        model = queryset.model
+
+        ## Get the requested ordering:
+        requested = [field.strip() for field in request.query_params.get(api_settings.ORDERING_PARAM, "").split(",")]
+        requested = [field for field in requested if field]
+
+        ## Honour the requested ordering only if all its fields are allowed and indexed:
+        allowed = set(getattr(view, "ordering_fields", None) or [])
+        if requested and all(self.is_seekable(model, field.lstrip("-"), allowed) for field in requested):
+            ordering = requested
+        else:
+            default = getattr(view, "ordering", None) or []
+            default = [default] if isinstance(default, str) else list(default)
+            ordering = [field for field in default if is_keyset_field(model, field.lstrip("-"))]
+
+            ## Keep the leading orderings by annotations (such as search ranks) of the filter backends:
+            annotations = queryset.query.annotations
+            annotated = takewhile(lambda field: field.lstrip("-") in annotations, queryset.query.order_by)
+            ordering = list(annotated) + ordering
+
+        ## Append the primary key as the tiebreaker unless there is a unique field already:
+        if not any(getattr(get_model_field(model, field.lstrip("-")), "unique", False) for field in ordering):
+            ordering.append(model._meta.pk.name)
+
+        ## Done, return the ordering:
+        return tuple(ordering)
+
+    def is_seekable(self, model, name, allowed):
+        """
+        Indicates if the field can be used as a requested keyset ordering field.
+
+        :param model: The model.
+        :param name: The name of the field.
+        :param allowed: The set of ordering fields allowed by the view.
+        :return: `True` if the field can be used, `False` otherwise.
+        """
+        return name in allowed and is_keyset_field(model, name) and is_indexed(model, name)
+
+    def get_keyset_filter(self, ordering, position, reverse):
+        """
+        Returns the filter seeking past the position for the ordering.
+
+        For the ordering (a, b) this is `a > x OR (a = x AND b > y)` with comparisons flipped
+        for descending fields and reverse paging.
+
+        :param ordering: The ordering.
+        :param position: The position values for the ordering fields.
+        :param reverse: Indicates if we are paging backwards.
+        :return: A Q instance.
+        """
+        return keyset_filter(ordering, position, reverse)
+
+    def get_position(self, item):
+        """
+        Returns the position of the item as a list of ordering field values.
+
+        :param item: A model instance or a dictionary.
+        :return: A list of values.
+        """
+        if isinstance(item, dict):
+            return [item[field.lstrip("-")] for field in self.ordering]
+        return [getattr(item, field.lstrip("-")) for field in self.ordering]
+
+    def decode_cursor(self, request, model=None):
+        """
+        Decodes the cursor from the request, converting the position values by the ordering fields.
+
+        :param request: The request.
+        :param model: The model to convert the position values by the ordering fields of if any.
+        :return: A tuple of the reverse flag and the position if any, `None` otherwise.
+        """
+        ## Get the cursor, if none we are on the first page:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return False, None
+
+        ## Decode the cursor:
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode("ascii")).decode("utf-8"))
+            reverse, position = bool(cursor["r"]), cursor["p"]
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        ## Check the position:
+        if position is not None and (not isinstance(position, list) or len(position) != len(self.ordering)):
+            raise NotFound(self.invalid_cursor_message)
+
+        ## Convert the position values, annotations (such as search ranks) are taken as they are:
+        if position is not None and model is not None:
+            fields = [get_model_field(model, field.lstrip("-")) for field in self.ordering]
+            try:
+                position = [
+                    value if field is None else field.to_python(value) for field, value in zip(fields, position)
+                ]
+            except (DjangoValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            if None in position:
+                raise NotFound(self.invalid_cursor_message)
+
+        ## Done, return:
+        return reverse, position
+
+    def encode_cursor(self, reverse, position):
+        """
+        Encodes the cursor and returns the link to the page.
+
+        :param reverse: Indicates if we are paging backwards.
+        :param position: The position to seek to if any, `None` for the first (or last) page.
+        :return: The link.
+        """
+        cursor = json.dumps({"r": int(reverse), "p": position}, cls=DjangoJSONEncoder, separators=(",", ":"))
+        encoded = urlsafe_b64encode(cursor.encode("utf-8")).decode("ascii")
+        url = remove_query_param(self.base_url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_html_context(self):
+        """
+        Returns the context for the browsable API page controls.
+        """
+        return {
+            "previous_url": self.get_previous_link(),
+            "next_url": self.get_next_link(),
+        }
+
+    def to_html(self):
+        """
+        Renders the page controls for the browsable API.
+        """
+        return loader.get_template(self.template).render(self.get_html_context())
+
+
+def is_keyset_field(model, name):
+    """
+    Indicates if the field can be used in a keyset ordering, ie. it is a local, non-nullable,
+    non-relational column.
+
+    :param model: The model.
+    :param name: The name of the field.
+    :return: `True` if the field can be used, `False` otherwise.
+    """
+    field = get_model_field(model, name)
+    return field is not None and not field.null and not field.is_relation
+
+
+def get_table_models():
+    """
+    Returns the models by their table names, collected on the first call instead of scanning the
+    models on every count. Note that models created later, such as dynamically, are not collected.
+
+    :return: A dictionary of lists of models by table name.
+    """
+    ## Collect the models once loaded:
+    if not TABLE_MODELS:
+        for model in apps.get_models():
+            TABLE_MODELS.setdefault(model._meta.db_table, []).append(model)
+
+    ## Done, return the models:
+    return TABLE_MODELS
+
+
+def keyset_filter(ordering, position, reverse=False):
+    """
+    Returns the filter seeking past the position for the ordering.
+
+    For the ordering (a, b) this is `a > x OR (a = x AND b > y)` with comparisons flipped
+    for descending fields and reverse seeking.
+
+    :param ordering: The ordering as a sequence of field names prefixed with "-" if descending.
+    :param position: The position values for the ordering fields.
+    :param reverse: Indicates if we are seeking backwards.
+    :return: A Q instance.
+    """
+    ## Declare the disjunction terms:
+    terms = []
+
+    ## Build the terms:
+    for index, field in enumerate(ordering):
+        ## Get the field name and the comparison:
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") != reverse else "gt"
+
+        ## Equality on the preceding fields and comparison on the current one:
+        equals = [Q(**{prev.lstrip("-"): value}) for prev, value in zip(ordering[:index], position[:index])]
+        terms.append(reduce(and_, equals + [Q(**{"{}__{}".format(name, lookup): position[index]})]))
+
+    ## Done, return the disjunction:
+    return reduce(or_, terms)
+
+
+def estimate_count(queryset):
+    """
+    Returns the query planner's estimate of the number of rows of the queryset where available.
+
+    :param queryset: The queryset.
+    :return: The estimated number of rows if available, `None` otherwise.
+    """
+    ## Get the connection and the query:
+    connection = connections[queryset.db]
+    sql, params = queryset.order_by().query.sql_with_params()
+
+    ## Postgres reports the estimated rows of the plan root:
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN (FORMAT JSON) {}".format(sql), params)
+            plan = cursor.fetchone()[0]
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    ## Not available:
+    return None
+
+
+def _reverse_ordering(ordering):
+    """
+    Reverses the ordering.
+    """
+    return tuple(field[1:] if field.startswith("-") else "-{}".format(field) for field in ordering)
+
+
+def _load_columns(queryset, fields):
+    """
+    Adds the fields to the columns to be loaded if the queryset loads only some columns.
+    """
+    names, defer = queryset.query.deferred_loading
+    if defer or not names:
+        return queryset
+    return queryset.only(*(set(names) | set(fields) - set(queryset.query.annotations)))
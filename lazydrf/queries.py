@@ -0,0 +1,275 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.relations import ManyRelatedField, RelatedField
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+
+class QueryPlan:
+    """
+    Defines the join, prefetch and column projection plan of a queryset rendered by a serializer.
+    """
+
+    def __init__(self, select_related=None, prefetch_related=None, only=None, models=None):
+        #: Defines the relations to be joined via `select_related`.
+        self.select_related = sorted(set(select_related or []))
+
+        #: Defines the relations to be fetched via `prefetch_related`.
+        self.prefetch_related = sorted(set(prefetch_related or []))
+
+        #: Defines the columns to be loaded via `only`, `None` if the full instance is required.
+        self.only = None if only is None else sorted(set(only))
+
+        #: Defines the related models rendered, excluding the model itself.
+        self.models = set(models or [])
+
+    def apply(self, queryset, select_related=None, prefetch_related=None, only=None):
+        """
+        Applies the plan to the queryset.
+
+        Explicit `select_related`, `prefetch_related` and `only` arguments take precedence
+        over the planned ones when they are not `None`.
+
+        :param queryset: The queryset to apply the plan to.
+        :param select_related: Relations to join instead of the planned ones.
+        :param prefetch_related: Relations to prefetch instead of the planned ones.
+        :param only: Columns to load instead of the planned ones.
+        :return: The planned queryset.
+        """
+        ## Get the relations and columns, explicit ones first:
+        select_related = self.select_related if select_related is None else select_related
+        prefetch_related = self.prefetch_related if prefetch_related is None else prefetch_related
+        only = self.only if only is None else only
+
+        ## Join forward relations:
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+
+        ## Prefetch many relations:
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+
+        ## Load only the columns of interest:
+        if only:
+            queryset = queryset.only(*only)
+
+        ## Done, return the queryset:
+        return queryset
+
+
+def get_query_plan(serializer_class):
+    """
+    Returns the query plan for the serializer class.
+
+    The plan is computed on first access and memoized on the serializer class itself, so
+    that each serializer class is inspected only once per process.
+
+    :param serializer_class: The model serializer class.
+    :return: A QueryPlan instance.
+    """
+    ## Check if we have the plan already, note that we don't want to inherit the plan:
+    if "_ldrf_query_plan" not in serializer_class.__dict__:
+        serializer_class._ldrf_query_plan = build_query_plan(serializer_class)
+
+    ## Done, return the plan:
+    return serializer_class._ldrf_query_plan
+
+
+def build_query_plan(serializer_class):
+    """
+    Builds the query plan for the serializer class by walking its fields.
+
+    :param serializer_class: The model serializer class.
+    :return: A QueryPlan instance.
+    """
+    ## Create the builder and walk the serializer fields:
+    builder = _PlanBuilder()
+    builder.walk(serializer_class.Meta.model, serializer_class().fields, [], False)
+
+    ## Done, create the plan and return:
+    return QueryPlan(builder.select_related, builder.prefetch_related, builder.only, builder.models)
+
+
+def get_source_field(model, attr):
+    """
+    Returns the model field of the source attribute, reverse relations by their accessor names (such as
+    "item_set") as sources refer to them, too.
+
+    :param model: The model.
+    :param attr: The source attribute.
+    :return: The model field if any, `None` otherwise.
+    """
+    ## Get the field by its name:
+    try:
+        return model._meta.get_field(attr)
+    except FieldDoesNotExist:
+        pass
+
+    ## Get the reverse relation by its accessor name:
+    for field in model._meta.get_fields():
+        if field.auto_created and not field.concrete and field.get_accessor_name() == attr:
+            return field
+
+    ## Not a model field:
+    return None
+
+
+def resolve_source(model, source_attrs):
+    """
+    Resolves the source attributes of a serializer field against the model.
+
+    :param model: The model to start resolving from.
+    :param source_attrs: Source attributes of the serializer field.
+    :return: A tuple of the relation path, whether the path spans a many relation, the model
+             reached, whether the full source is a model relation and the column reached if any.
+    """
+    ## Declare the path and the state:
+    path = []
+    many = False
+    current = model
+
+    ## Iterate over the source attributes:
+    for attr in source_attrs:
+        ## Get the model field, stop if this is not a model field (such as a property):
+        field = get_source_field(current, attr)
+        if field is None:
+            return path, many, current, False, None
+
+        ## If not a relation, we are done:
+        if not field.is_relation:
+            return path, many, current, False, attr
+
+        ## Extend the path:
+        path.append(attr)
+        many = many or field.many_to_many or field.one_to_many
+
+        ## Generic relations have no related model, hence they can only be prefetched:
+        if field.related_model is None:
+            return path, True, None, True, None
+
+        ## Move on to the related model:
+        current = field.related_model
+
+    ## Done, the full source is a relation:
+    return path, many, current, bool(path), None
+
+
+class _PlanBuilder:
+    """
+    Collects the relations and columns required to render serializer fields.
+    """
+
+    def __init__(self):
+        #: Defines the relations to be joined.
+        self.select_related = set()
+
+        #: Defines the relations to be prefetched.
+        self.prefetch_related = set()
+
+        #: Defines the columns to be loaded, `None` once the full instance is required.
+        self.only = set()
+
+        #: Defines the related models rendered.
+        self.models = set()
+
+    def add_models(self, model, path):
+        """
+        Adds the models reached via the relation path.
+        """
+        for attr in path:
+            model = get_source_field(model, attr).related_model
+            if model is None:
+                return
+            self.models.add(model)
+
+    def require_instance(self):
+        """
+        Marks that the full instance is required, ie. no column projection is possible.
+        """
+        self.only = None
+
+    def add_column(self, path):
+        """
+        Adds a column to be loaded unless the full instance is already required.
+        """
+        if self.only is not None:
+            self.only.add("__".join(path))
+
+    def add_join(self, model, prefix, path):
+        """
+        Adds the forward relations of the path to the columns to be loaded.
+
+        Django requires the relation itself to be loaded when it is traversed via `select_related`.
+        """
+        for index, attr in enumerate(path):
+            field = get_source_field(model, attr)
+            if field.concrete:
+                self.add_column(prefix + path[:index + 1])
+            model = field.related_model
+
+    def walk(self, model, fields, prefix, many):
+        """
+        Walks the serializer fields and collects the relations and columns.
+
+        :param model: The model the fields are rendered from.
+        :param fields: The serializer fields.
+        :param prefix: The relation path leading to the model.
+        :param many: Indicates if the relation path spans a many relation.
+        """
+        for field in fields.values():
+            ## Write-only fields are never rendered:
+            if field.write_only:
+                continue
+
+            ## Fields with source "*" work on the same instance:
+            if field.source == "*":
+                if isinstance(field, BaseSerializer) and not isinstance(field, ListSerializer):
+                    self.walk(model, field.fields, prefix, many)
+                elif not many and not (isinstance(field, RelatedField) and field.use_pk_only_optimization()):
+                    ## Method fields and alike may access anything on the instance:
+                    self.require_instance()
+                continue
+
+            ## Resolve the source:
+            path, spans_many, related, is_relation, column = resolve_source(model, field.source_attrs)
+
+            ## Columns of prefetched relations are loaded by separate queries, we project the rest:
+            projected = not (many or spans_many)
+
+            ## Check what the field needs from the instance:
+            if column is not None:
+                ## Plain column, possibly across forward relations:
+                if projected:
+                    self.add_join(model, prefix, path)
+                    self.add_column(prefix + path + [column])
+            elif not is_relation:
+                ## Not a model field (such as a property), we need the full instance:
+                if projected:
+                    self.require_instance()
+            elif isinstance(field, RelatedField) and field.use_pk_only_optimization() and not spans_many:
+                ## Primary key only relation, the related instance is not needed:
+                if projected:
+                    self.add_join(model, prefix, path)
+                path = path[:-1]
+            elif isinstance(field, RelatedField) and hasattr(field, "slug_field"):
+                ## Slug relation, only the slug column is needed:
+                if projected:
+                    self.add_join(model, prefix, path)
+                    self.add_column(prefix + path + [field.slug_field])
+            elif projected and not isinstance(field, (BaseSerializer, ManyRelatedField)):
+                ## Other related fields (such as string related ones) need the full instance:
+                self.require_instance()
+
+            ## If no relation is traversed, nothing to do:
+            if not path:
+                continue
+
+            ## Add the relation and the related models:
+            self.add_models(model, path)
+            lookup = "__".join(prefix + path)
+            (self.prefetch_related if many or spans_many else self.select_related).add(lookup)
+
+            ## Recurse into nested serializers:
+            child = field.child if isinstance(field, ListSerializer) else field
+            if is_relation and related is not None and isinstance(child, BaseSerializer):
+                if projected:
+                    self.add_join(model, prefix, path)
+                self.walk(related, child.fields, prefix + path, many or spans_many)
@@ -0,0 +1,132 @@
+from collections import OrderedDict
+from threading import RLock
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+class Registry:
+    """
+    Defines a registry of the concrete lazydrf models indexed by application label, model name and URI.
+
+    Models are added by the `LDRF` metaclass as they are declared. The URI index is built on first
+    lookup, since URIs are defined by the lazily built viewsets.
+    """
+
+    def __init__(self):
+        #: Defines the models by application label and model name.
+        self.models = OrderedDict()
+
+        #: Defines the models by URI, `None` until looked up.
+        self.uris = None
+
+        #: Defines the lock guarding the URI index.
+        self.lock = RLock()
+
+    def add(self, model):
+        """
+        Adds the model to the registry, replacing any model of the same label.
+
+        :param model: The lazydrf model.
+        """
+        with self.lock:
+            self.models.setdefault(model._meta.app_label, OrderedDict())[model._meta.model_name] = model
+            self.uris = None
+
+    def get_model(self, app_label, model_name):
+        """
+        Returns the model by its application label and model name.
+
+        :param app_label: The application label.
+        :param model_name: The model name, case insensitive.
+        :return: The model if any, `None` otherwise.
+        """
+        return self.models.get(app_label, {}).get(model_name.lower())
+
+    def get_models(self, *app_labels):
+        """
+        Returns the models of the applications, of all applications if none.
+
+        :param app_labels: Application labels.
+        :return: A list of models.
+        """
+        return [
+            model for app_label in (app_labels or self.models) for model in self.models.get(app_label, {}).values()
+        ]
+
+    def get_by_uri(self, uri):
+        """
+        Returns the model by the URI of its endpoint.
+
+        :param uri: The URI.
+        :return: The model if any, `None` otherwise.
+        """
+        return self.get_uris().get(uri)
+
+    def get_uris(self):
+        """
+        Returns the models by the URIs of their endpoints.
+
+        Note that an improperly configured error is raised if the URIs of two models collide.
+
+        :return: An ordered dictionary of models by URI.
+        """
+        with self.lock:
+            if self.uris is None:
+                self.uris = self.index_uris(self.get_models())
+            return self.uris
+
+    def index_uris(self, models):
+        """
+        Returns the models by the URIs of their endpoints.
+
+        Note that an improperly configured error is raised if the URIs of two models collide.
+
+        :param models: A list of models.
+        :return: An ordered dictionary of models by URI.
+        """
+        uris = OrderedDict()
+        for model in models:
+            uri = model.LDRFMeta.viewset.uri
+            if uri in uris:
+                raise ImproperlyConfigured("URI {} of the model {} collides with the model {}.".format(
+                    uri, model._meta.label, uris[uri]._meta.label,
+                ))
+            uris[uri] = model
+        return uris
+
+    def get_endpoints(self, *app_labels):
+        """
+        Returns the endpoints of the models of the applications, of all applications if none.
+
+        :param app_labels: Application labels.
+        :return: A list of tuples of the URI, the model and the viewset.
+        """
+        return [(model.LDRFMeta.viewset.uri, model, model.LDRFMeta.viewset) for model in self.get_models(*app_labels)]
+
+    def register_all(self, router, *app_labels):
+        """
+        Registers the endpoints of the models of the applications (all if none) with the router.
+
+        Note that an improperly configured error is raised if the URIs of two of the models collide.
+
+        :param router: The router.
+        :param app_labels: Application labels.
+        """
+        ## Get the models and check the collisions among them:
+        models = self.get_models(*app_labels)
+        self.index_uris(models)
+
+        ## Register:
+        for model in models:
+            model.LDRFMeta.register(router)
+
+
+#: Defines the registry of lazydrf models.
+registry = Registry()
+
+
+def register_all(router, *app_labels):
+    """
+    Registers the endpoints of the lazydrf models of the applications (all if none) with the router.
+    """
+    registry.register_all(router, *app_labels)
@@ -0,0 +1,113 @@
+from rest_framework.renderers import JSONRenderer
+
+
+#: Defines the layouts of the columnar JSON renderer.
+COLUMNAR_LAYOUTS = ("rows", "columns")
+
+
+def to_columnar(items, columns=None):
+    """
+    Converts the serialized items into columnar data.
+
+    :param items: A list of dictionaries.
+    :param columns: The column names in order, the keys of the first item if `None`.
+    :return: A dictionary of the "columns" and the "rows" as lists of values in the column order.
+    """
+    ## Get the columns:
+    columns = list(columns if columns is not None else (items[0].keys() if items else []))
+
+    ## Done, return the columnar data:
+    return {"columns": columns, "rows": [[item.get(column) for column in columns] for item in items]}
+
+
+def is_columnar(data):
+    """
+    Indicates if the data is columnar data already, such as rendered by the compiled serializers.
+
+    :param data: The data.
+    :return: `True` if columnar, `False` otherwise.
+    """
+    return isinstance(data, dict) and set(data.keys()) == {"columns", "rows"}
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """
+    Defines a JSON renderer which renders lists of items as the column names and the rows of values,
+    instead of repeating the keys in every item.
+
+    Lists and the results of paginated lists are rendered as `{"columns": [...], "rows": [[...], ...]}`,
+    or as `{"columns": [...], "arrays": [[...], ...]}` with the values of each column with the "columns"
+    layout requested via the `layout` media type or request parameter. Anything else is rendered as JSON.
+    """
+
+    media_type = "application/vnd.lazydrf.columnar+json"
+    format = "columnar"
+
+    #: Defines the request parameter selecting the layout, "rows" (default) or "columns".
+    layout_param = "layout"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Renders the data, lists in columnar form.
+        """
+        ## Get the context:
+        renderer_context = renderer_context or {}
+        view = renderer_context.get("view")
+
+        ## Get the columns from the serializer of the view if any:
+        columns = getattr(view, "get_columnar_columns", lambda: None)()
+
+        ## Convert the list or the results of the paginated list:
+        layout = self.get_layout(accepted_media_type, renderer_context)
+        if isinstance(data, list):
+            data = self.get_columnar(data, columns, layout)
+        elif isinstance(data, dict) and (isinstance(data.get("results"), list) or is_columnar(data.get("results"))):
+            data = dict(data, results=self.get_columnar(data["results"], columns, layout))
+        elif is_columnar(data):
+            data = self.get_columnar(data, columns, layout)
+
+        ## Done, render as JSON:
+        return super(ColumnarJSONRenderer, self).render(data, accepted_media_type, renderer_context)
+
+    def get_columnar(self, data, columns, layout):
+        """
+        Returns the columnar data of the items (or the columnar data) in the layout.
+
+        :param data: A list of dictionaries, or columnar data.
+        :param columns: The column names in order if known.
+        :param layout: The layout.
+        :return: The columnar data.
+        """
+        ## Convert to columnar data if required:
+        data = data if is_columnar(data) else to_columnar(data, columns)
+
+        ## Transpose if column-major:
+        if layout == "columns":
+            return {"columns": data["columns"], "arrays": [list(values) for values in zip(*data["rows"])] or
+                    [[] for column in data["columns"]]}
+
+        ## Done, return the row-major data:
+        return data
+
+    def get_layout(self, accepted_media_type, renderer_context):
+        """
+        Returns the requested layout, from the media type parameters or the request.
+
+        :param accepted_media_type: The accepted media type.
+        :param renderer_context: The renderer context.
+        :return: The layout.
+        """
+        ## Get the layout from the media type parameters:
+        params = dict([
+            [part.strip() for part in param.split("=", 1)]
+            for param in (accepted_media_type or "").split(";")[1:] if "=" in param
+        ])
+        layout = params.get(self.layout_param)
+
+        ## Otherwise, get it from the request:
+        request = renderer_context.get("request")
+        if layout is None and request is not None:
+            layout = request.query_params.get(self.layout_param)
+
+        ## Done, return the layout:
+        return layout if layout in COLUMNAR_LAYOUTS else "rows"
@@ -0,0 +1,600 @@
+import logging
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.db.backends.utils import truncate_name
+from django.db.migrations.operations.base import Operation
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
+
+
+#: Defines the logger of the full-text search index installations.
+logger = logging.getLogger("lazydrf.search")
+
+#: Defines the name of the rank annotation of full-text search results.
+SEARCH_RANK = "search_rank"
+
+#: Defines the suffix of the names of the full-text search database objects.
+SEARCH_INDEX_SUFFIX = "ldrf_fts"
+
+#: Defines the Postgres weight labels in the order of the search fields.
+POSTGRES_WEIGHTS = "ABCD"
+
+#: Defines the internal types of the integer primary key fields, required by the SQLite backend for rowids.
+INTEGER_FIELDS = ("AutoField", "BigAutoField", "IntegerField", "BigIntegerField", "SmallIntegerField",
+                  "PositiveIntegerField", "PositiveSmallIntegerField")
+
+#: Defines the internal types of the text fields which can be searched.
+TEXT_FIELDS = ("CharField", "TextField", "SlugField", "EmailField", "URLField")
+
+#: Defines the database aliases and the names of the full-text indexes known to be installed.
+INSTALLED_SEARCH_INDEXES = set()
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    Defines a search filter backend which matches the search terms against a full-text index over
+    the search fields instead of `icontains` scans.
+
+    Search fields prefixed with "^" are matched by term prefixes. Results are ranked and ordered
+    by relevance unless an ordering is requested. Databases without a full-text backend, or without
+    the full-text index installed (such as before migrating), fall back to the usual search filter.
+    """
+
+    #: Defines the view actions whose results are not ranked, such as the aggregations.
+    unranked_actions = ("aggregate",)
+
+    def filter_queryset(self, request, queryset, view):
+        """
+        Filters the queryset by the search terms of the request.
+        """
+        ## Get the search fields and terms, nothing to do if none:
+        search_fields = getattr(view, "search_fields", None)
+        terms = self.get_search_terms(request)
+        if not search_fields or not terms:
+            return queryset
+
+        ## Get the backend, fall back to the usual search if not supported or not installed:
+        backend = get_search_backend(queryset.model, search_fields, queryset.db, getattr(view, "search_config", None))
+        if backend is None or not is_search_index_installed(backend):
+            return super(FullTextSearchFilter, self).filter_queryset(request, queryset, view)
+
+        ## Match the terms:
+        queryset = backend.match(queryset, terms)
+
+        ## Order by rank unless an ordering is requested or results are not ranked:
+        ranked = getattr(view, "action", None) not in self.unranked_actions
+        if ranked and not request.query_params.get(api_settings.ORDERING_PARAM):
+            queryset = backend.rank(queryset, terms).order_by("-{}".format(SEARCH_RANK), *queryset.query.order_by)
+
+        ## Done, return the queryset:
+        return queryset
+
+
+class SearchBackend:
+    """
+    Defines the base full-text search backend of a model over its search fields.
+    """
+
+    def __init__(self, model, fields, connection, config=None):
+        #: Defines the model.
+        self.model = model
+
+        #: Defines the search fields as tuples of the model field and the prefix matching flag.
+        self.fields = fields
+
+        #: Defines the database connection.
+        self.connection = connection
+
+        #: Defines the text search configuration if applicable.
+        self.config = config
+
+        #: Defines the quoted name of the model table.
+        self.table = connection.ops.quote_name(model._meta.db_table)
+
+        #: Defines the quoted name of the primary key column.
+        self.pk = connection.ops.quote_name(model._meta.pk.column)
+
+    @property
+    def name(self):
+        """
+        Returns the name of the full-text search database objects.
+
+        :return: The name.
+        """
+        name = "{}_{}".format(self.model._meta.db_table, SEARCH_INDEX_SUFFIX)
+        return truncate_name(name, self.connection.ops.max_name_length())
+
+    def get_install_sql(self, concurrently=False):
+        """
+        Returns the SQL statements installing the full-text index and keeping it in sync.
+
+        :param concurrently: Indicates if the index is built without locking writes where supported,
+                             which is not possible within a transaction.
+        :return: A list of SQL statements.
+        """
+        raise NotImplementedError
+
+    def get_uninstall_sql(self, concurrently=False):
+        """
+        Returns the SQL statements dropping the full-text index.
+
+        :param concurrently: Indicates if the index is dropped without locking writes where supported.
+        :return: A list of SQL statements.
+        """
+        raise NotImplementedError
+
+    def is_installed(self):
+        """
+        Indicates if the full-text index is installed.
+
+        :return: `True` if installed, `False` otherwise.
+        """
+        raise NotImplementedError
+
+    def match(self, queryset, terms):
+        """
+        Filters the queryset by the terms.
+
+        :param queryset: The queryset.
+        :param terms: A list of search terms.
+        :return: The filtered queryset.
+        """
+        raise NotImplementedError
+
+    def rank(self, queryset, terms):
+        """
+        Annotates the queryset with the rank of the items for the terms, the higher the better.
+
+        :param queryset: The queryset filtered by `match`.
+        :param terms: A list of search terms.
+        :return: The annotated queryset.
+        """
+        raise NotImplementedError
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """
+    Defines the full-text search backend over an FTS5 external content table synced by triggers.
+    """
+
+    def get_install_sql(self, concurrently=False):
+        """
+        Returns the SQL statements creating the FTS5 table, its triggers and populating it.
+        """
+        ## Get the names and the columns:
+        name = self.connection.ops.quote_name(self.name)
+        columns = [self.connection.ops.quote_name(field.column) for field, prefix in self.fields]
+        news = ", ".join(["new.{}".format(column) for column in columns])
+        olds = ", ".join(["old.{}".format(column) for column in columns])
+        columns = ", ".join(columns)
+
+        ## Index term prefixes if prefix matching is required:
+        prefix = ", prefix='2 3'" if any(prefix for field, prefix in self.fields) else ""
+
+        ## Build the statements:
+        insert = "INSERT INTO {0}(rowid, {1}) VALUES (new.{2}, {3});".format(name, columns, self.pk, news)
+        delete = "INSERT INTO {0}({0}, rowid, {1}) VALUES ('delete', old.{2}, {3});".format(
+            name, columns, self.pk, olds,
+        )
+        return [
+            "CREATE VIRTUAL TABLE {} USING fts5({}, content={}, content_rowid={}{})".format(
+                name, columns, "'{}'".format(self.model._meta.db_table), "'{}'".format(self.model._meta.pk.column),
+                prefix,
+            ),
+            "CREATE TRIGGER {} AFTER INSERT ON {} BEGIN {} END".format(self.get_trigger("ai"), self.table, insert),
+            "CREATE TRIGGER {} AFTER DELETE ON {} BEGIN {} END".format(self.get_trigger("ad"), self.table, delete),
+            "CREATE TRIGGER {} AFTER UPDATE ON {} BEGIN {} {} END".format(
+                self.get_trigger("au"), self.table, delete, insert,
+            ),
+            "INSERT INTO {0}({0}) VALUES ('rebuild')".format(name),
+        ]
+
+    def get_uninstall_sql(self, concurrently=False):
+        """
+        Returns the SQL statements dropping the triggers and the FTS5 table.
+        """
+        return ["DROP TRIGGER IF EXISTS {}".format(self.get_trigger(suffix)) for suffix in ("ai", "ad", "au")] + [
+            "DROP TABLE IF EXISTS {}".format(self.connection.ops.quote_name(self.name)),
+        ]
+
+    def is_installed(self):
+        """
+        Indicates if the FTS5 table exists.
+        """
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [self.name])
+            return cursor.fetchone() is not None
+
+    def get_trigger(self, suffix):
+        """
+        Returns the quoted name of the trigger with the suffix.
+        """
+        return self.connection.ops.quote_name("{}_{}".format(self.name, suffix))
+
+    def get_query(self, terms):
+        """
+        Returns the FTS5 query matching all terms, by prefix for the prefix matching fields.
+        """
+        ## Get the prefix matching columns:
+        columns = " ".join([field.column for field, prefix in self.fields if prefix])
+
+        ## Build the query for each term, quoted as a phrase:
+        queries = []
+        for term in terms:
+            phrase = '"{}"'.format(term.replace('"', '""'))
+            queries.append("({} OR {{{}}} : {} *)".format(phrase, columns, phrase) if columns else phrase)
+
+        ## Done, return the query:
+        return " AND ".join(queries)
+
+    def match(self, queryset, terms):
+        """
+        Joins the FTS5 table by the rowids and filters the queryset by the rows matching the terms.
+        """
+        name = self.connection.ops.quote_name(self.name)
+        where = ["{}.rowid = {}.{}".format(name, self.table, self.pk), "{} MATCH %s".format(name)]
+        return queryset.extra(tables=[self.name], where=where, params=[self.get_query(terms)])
+
+    def rank(self, queryset, terms):
+        """
+        Annotates the queryset with the negated BM25 score of the matched rows of the FTS5 table joined
+        by `match`, weighting the earlier search fields more.
+        """
+        name = self.connection.ops.quote_name(self.name)
+        weights = ", ".join([str(len(self.fields) - index) for index in range(len(self.fields))])
+        sql = "-bm25({}, {})".format(name, weights)
+        return queryset.annotate(**{SEARCH_RANK: RawSQL(sql, [], output_field=FloatField())})
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    Defines the full-text search backend over a GIN expression index of the weighted `tsvector` of the search fields.
+    """
+
+    def get_document(self, qualified=True):
+        """
+        Returns the weighted `tsvector` expression of the search fields.
+
+        :param qualified: Indicates if the columns are qualified by the table name.
+        :return: The SQL expression.
+        """
+        ## Get the column template:
+        column = "{}.{{}}".format(self.table) if qualified else "{}"
+
+        ## Build the weighted vector of each column:
+        vectors = [
+            "setweight(to_tsvector({}, coalesce({}, '')), '{}')".format(
+                self.get_config(), column.format(self.connection.ops.quote_name(field.column)),
+                self.get_weight(index),
+            )
+            for index, (field, prefix) in enumerate(self.fields)
+        ]
+
+        ## Done, return the concatenated vectors:
+        return "({})".format(" || ".join(vectors))
+
+    def get_config(self):
+        """
+        Returns the text search configuration literal.
+        """
+        return "'{}'::regconfig".format((self.config or "simple").replace("'", "''"))
+
+    def get_weight(self, index):
+        """
+        Returns the weight label of the search field at the index.
+        """
+        return POSTGRES_WEIGHTS[min(index, len(POSTGRES_WEIGHTS) - 1)]
+
+    def get_install_sql(self, concurrently=False):
+        """
+        Returns the SQL statement creating the GIN expression index.
+        """
+        return ["CREATE INDEX {}{} ON {} USING GIN ({})".format(
+            "CONCURRENTLY " if concurrently else "", self.connection.ops.quote_name(self.name), self.table,
+            self.get_document(qualified=False),
+        )]
+
+    def get_uninstall_sql(self, concurrently=False):
+        """
+        Returns the SQL statement dropping the GIN expression index.
+        """
+        return ["DROP INDEX {}IF EXISTS {}".format(
+            "CONCURRENTLY " if concurrently else "", self.connection.ops.quote_name(self.name),
+        )]
+
+    def is_installed(self):
+        """
+        Indicates if the GIN expression index exists.
+        """
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = %s", [self.name])
+            return cursor.fetchone() is not None
+
+    def get_query(self, terms):
+        """
+        Returns the `tsquery` string matching all terms, by prefix for the prefix matching fields' weights.
+        """
+        ## Get the weights of the prefix matching fields:
+        weights = set([self.get_weight(index) for index, (field, prefix) in enumerate(self.fields) if prefix])
+        weights = "".join(sorted(weights))
+
+        ## Build the query for each term, quoted as a lexeme:
+        queries = []
+        for term in terms:
+            lexeme = "'{}'".format(term.replace("\\", "\\\\").replace("'", "''"))
+            queries.append("({} | {}:*{})".format(lexeme, lexeme, weights) if weights else lexeme)
+
+        ## Done, return the query:
+        return " & ".join(queries)
+
+    def match(self, queryset, terms):
+        """
+        Filters the queryset by the rows whose document matches the terms.
+        """
+        sql = "{} @@ to_tsquery({}, %s)".format(self.get_document(), self.get_config())
+        return queryset.extra(where=[sql], params=[self.get_query(terms)])
+
+    def rank(self, queryset, terms):
+        """
+        Annotates the queryset with the `ts_rank` of the document for the terms.
+        """
+        sql = "ts_rank({}, to_tsquery({}, %s))".format(self.get_document(), self.get_config())
+        return queryset.annotate(**{SEARCH_RANK: RawSQL(sql, [self.get_query(terms)], output_field=FloatField())})
+
+
+#: Defines the full-text search backends by database vendor.
+SEARCH_BACKENDS = {
+    "sqlite": SQLiteSearchBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+def get_search_backend(model, search_fields, using=DEFAULT_DB_ALIAS, config=None):
+    """
+    Returns the full-text search backend of the model for the database if supported.
+
+    :param model: The model.
+    :param search_fields: The search fields as declared for DRF's search filter.
+    :param using: The database alias.
+    :param config: The text search configuration if applicable.
+    :return: A search backend if the database is supported, `None` otherwise.
+    """
+    ## Get the connection and the backend class:
+    connection = connections[using]
+    backend = SEARCH_BACKENDS.get(connection.vendor)
+
+    ## Done, create and return the backend if any:
+    return backend and backend(model, get_search_fields(model, search_fields), connection, config)
+
+
+def check_search_model(model):
+    """
+    Checks that the full-text index of the model can be kept on the configured databases.
+
+    Note that an improperly configured error is raised if an SQLite database is configured and the
+    primary key of the model is not an integer, since the FTS5 table is keyed by the rowids.
+
+    :param model: The model.
+    """
+    ## Nothing to check unless an SQLite database is configured:
+    if not any(connections[alias].vendor == "sqlite" for alias in connections):
+        return
+
+    ## Get the primary key field, the target of the parent link if inherited:
+    field = model._meta.pk
+    while field.is_relation:
+        field = field.target_field
+
+    ## Check the type:
+    if field.get_internal_type() not in INTEGER_FIELDS:
+        raise ImproperlyConfigured(
+            "Full-text search of the model {} requires an integer primary key on SQLite.".format(model._meta.label)
+        )
+
+
+def is_search_index_installed(backend):
+    """
+    Indicates if the full-text index of the search backend is installed.
+
+    Installed indexes are remembered, so that the database is checked until the index is installed only.
+
+    :param backend: The search backend.
+    :return: `True` if installed, `False` otherwise.
+    """
+    ## Get the key and check if known to be installed:
+    key = (backend.connection.alias, backend.name)
+    if key in INSTALLED_SEARCH_INDEXES:
+        return True
+
+    ## Check the database, remember if installed:
+    installed = backend.is_installed()
+    if installed:
+        INSTALLED_SEARCH_INDEXES.add(key)
+
+    ## Done, return:
+    return installed
+
+
+def get_search_fields(model, search_fields):
+    """
+    Returns the model fields of the search fields with prefix matching flags.
+
+    Note that an improperly configured error is raised if a search field is not a local text column.
+
+    :param model: The model.
+    :param search_fields: The search fields as declared for DRF's search filter.
+    :return: A list of tuples of the model field and the prefix matching flag.
+    """
+    ## Declare the fields:
+    fields = []
+
+    ## Iterate over the search fields:
+    for search_field in search_fields:
+        ## Get the name and the prefix matching flag:
+        name = re.sub(r"^[\^=@$]", "", search_field)
+        field = next((field for field in model._meta.local_concrete_fields if field.name == name), None)
+
+        ## Check the field:
+        if field is None or field.is_relation or field.get_internal_type() not in TEXT_FIELDS:
+            raise ImproperlyConfigured("Full-text search field {} of the model {} is not a local text column.".format(
+                search_field, model._meta.label,
+            ))
+
+        ## Add the field:
+        fields.append((field, search_field.startswith("^")))
+
+    ## Done, return the fields:
+    return fields
+
+
+def install_search_index(model, using=DEFAULT_DB_ALIAS, verbosity=0, stdout=None):
+    """
+    Installs the full-text search index of the model if its viewset uses the full-text search filter
+    and the index is missing, such as if not installed by an `InstallSearchIndex` migration operation.
+
+    Postgres indexes are built concurrently unless within a transaction.
+
+    :param model: The model.
+    :param using: The database alias.
+    :param verbosity: The verbosity level.
+    :param stdout: The output stream of the command to report to if any, the logger otherwise.
+    :return: `True` if installed now, `False` otherwise.
+    """
+    ## Get the viewset, nothing to do if not using full-text search:
+    viewset = model.LDRFMeta.viewset
+    if FullTextSearchFilter not in viewset.filter_backends or not viewset.search_fields:
+        return False
+
+    ## Check if the model lives on the database:
+    if model._meta.abstract or model._meta.proxy or not router.allow_migrate_model(using, model):
+        return False
+
+    ## Check if the table exists, the model may not be migrated (yet):
+    if model._meta.db_table not in connections[using].introspection.table_names():
+        return False
+
+    ## Get the backend, nothing to do if not supported or already installed:
+    backend = get_search_backend(model, viewset.search_fields, using, getattr(viewset, "search_config", None))
+    if backend is None or backend.is_installed():
+        return False
+
+    ## Install:
+    with backend.connection.cursor() as cursor:
+        for sql in backend.get_install_sql(concurrently=not backend.connection.in_atomic_block):
+            cursor.execute(sql)
+
+    ## Report:
+    message = "Installed full-text search index {}".format(backend.name)
+    if stdout is None:
+        logger.info(message)
+    elif verbosity >= 1:
+        stdout.write("  {}\n".format(message))
+
+    ## Done, return:
+    return True
+
+
+def install_search_indexes(sender, using=DEFAULT_DB_ALIAS, verbosity=0, stdout=None, **kwargs):
+    """
+    Installs the missing full-text search indexes of the lazydrf models of the migrated application.
+
+    This is connected to the `post_migrate` signal when the lazydrf application is installed. Models
+    whose tables do not exist are skipped. The installations are reported to the output stream of the
+    command if sent along, logged otherwise.
+    """
+    for model in sender.get_models():
+        if hasattr(model, "LDRFMeta"):
+            install_search_index(model, using, verbosity, stdout)
+
+
+class InstallSearchIndex(Operation):
+    """
+    Defines a migration operation installing the full-text search index of a model over the search
+    fields, and dropping it when migrating backwards.
+
+    On Postgres, the index is built concurrently (without locking writes) if the migration is not
+    atomic, ie. declares `atomic = False`.
+    """
+
+    #: Indicates that the operation can not be reduced to plain SQL, since it checks the installed index.
+    reduces_to_sql = False
+
+    #: Indicates that the operation can be reversed.
+    reversible = True
+
+    def __init__(self, model_name, fields, config=None):
+        #: Defines the name of the model.
+        self.model_name = model_name
+
+        #: Defines the search fields as declared for DRF's search filter.
+        self.fields = list(fields)
+
+        #: Defines the text search configuration if applicable.
+        self.config = config
+
+    def deconstruct(self):
+        """
+        Returns the arguments to serialize the operation with.
+        """
+        kwargs = {"model_name": self.model_name, "fields": self.fields}
+        if self.config is not None:
+            kwargs["config"] = self.config
+        return self.__class__.__name__, [], kwargs
+
+    def state_forwards(self, app_label, state):
+        """
+        Leaves the state as it is, the index is not part of the model state.
+        """
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        """
+        Installs the full-text search index unless already installed.
+        """
+        ## Get the backend of the model, nothing to do if the model does not live on the database or not supported:
+        backend = self.get_backend(app_label, schema_editor, to_state)
+        if backend is None:
+            return
+
+        ## Install unless installed, concurrently unless within a transaction:
+        if schema_editor.collect_sql or not backend.is_installed():
+            for sql in backend.get_install_sql(concurrently=not schema_editor.connection.in_atomic_block):
+                schema_editor.execute(sql)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        """
+        Drops the full-text search index.
+        """
+        ## Get the backend of the model, nothing to do if the model does not live on the database or not supported:
+        backend = self.get_backend(app_label, schema_editor, from_state)
+        if backend is None:
+            return
+
+        ## Uninstall, concurrently unless within a transaction:
+        for sql in backend.get_uninstall_sql(concurrently=not schema_editor.connection.in_atomic_block):
+            schema_editor.execute(sql)
+        INSTALLED_SEARCH_INDEXES.discard((backend.connection.alias, backend.name))
+
+    def get_backend(self, app_label, schema_editor, state):
+        """
+        Returns the search backend of the model in the state.
+
+        :param app_label: The label of the application migrated.
+        :param schema_editor: The schema editor.
+        :param state: The project state.
+        :return: A search backend if the model lives on the database and the database is supported, `None` otherwise.
+        """
+        model = state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return None
+        return get_search_backend(model, self.fields, schema_editor.connection.alias, self.config)
+
+    def describe(self):
+        """
+        Returns the description of the operation.
+        """
+        return "Install the full-text search index of {}".format(self.model_name)
@@ -0,0 +1,246 @@
+from collections import OrderedDict
+from functools import lru_cache
+
+from rest_framework.fields import BooleanField, CharField, FloatField, IntegerField
+from rest_framework.relations import PrimaryKeyRelatedField
+
+from lazydrf.queries import resolve_source
+
+
+#: Defines the maximum number of narrowed serializer classes to be memoized.
+NARROWED_SERIALIZERS_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=NARROWED_SERIALIZERS_CACHE_SIZE)
+def narrow_serializer(serializer_class, fields):
+    """
+    Returns a serializer class derived from the serializer class which renders only the given fields.
+
+    Narrowed serializer classes are memoized per field set, hence their query plans are, too.
+
+    :param serializer_class: The model serializer class to narrow.
+    :param fields: A tuple of field names to keep, in the order of the serializer fields.
+    :return: The narrowed serializer class.
+    """
+    ## Define the meta, keep the read-only fields of interest:
+    meta = type("Meta", (serializer_class.Meta,), {
+        "fields": list(fields),
+        "read_only_fields": [
+            field for field in getattr(serializer_class.Meta, "read_only_fields", []) if field in fields
+        ],
+    })
+
+    ## Create the serializer:
+    narrowed = type(serializer_class.__name__, (serializer_class,), {"Meta": meta})
+
+    ## Drop the declared fields which are not of interest:
+    narrowed._declared_fields = OrderedDict([
+        (name, field) for name, field in serializer_class._declared_fields.items() if name in fields
+    ])
+
+    ## Done, return the narrowed serializer:
+    return narrowed
+
+
+@lru_cache(maxsize=NARROWED_SERIALIZERS_CACHE_SIZE)
+def expand_serializer(serializer_class, relations):
+    """
+    Returns a serializer class derived from the serializer class which renders the given relations
+    via the serializers of the related lazydrf models instead of their primary keys.
+
+    Expanded serializer classes are memoized per relation set, hence their query plans are, too.
+
+    :param serializer_class: The model serializer class to expand.
+    :param relations: A tuple of relation names to expand.
+    :return: The expanded serializer class.
+    """
+    ## Get the model and the fields:
+    model = serializer_class.Meta.model
+    fields = serializer_class().fields
+
+    ## Declare the nested serializers:
+    attrs = {}
+    for name in relations:
+        ## Get the relation:
+        relation = model._meta.get_field(name)
+        many = relation.many_to_many or relation.one_to_many
+
+        ## Keep the source of the field if it differs from its name:
+        kwargs = {"source": fields[name].source} if fields[name].source != name else {}
+
+        ## Declare the nested serializer:
+        attrs[name] = relation.related_model.LDRFMeta.serializer(read_only=True, many=many, **kwargs)
+
+    ## Done, create and return the expanded serializer:
+    return type(serializer_class.__name__, (serializer_class,), attrs)
+
+
+#: Defines the field representations which are identities for the values loaded from the database.
+IDENTITY_REPRESENTATIONS = set([
+    BooleanField.to_representation,
+    CharField.to_representation,
+    FloatField.to_representation,
+    IntegerField.to_representation,
+])
+
+
+class CompiledSerializer:
+    """
+    Defines a serializer compiled into a `values()` query and a row transformer.
+
+    Rows are rendered without instantiating model instances or walking the serializer fields.
+    """
+
+    def __init__(self, columns):
+        #: Defines the output name, source column and converter (if any) of each field.
+        self.columns = columns
+
+        #: Defines the source columns to be loaded.
+        self.sources = [source for name, source, converter in columns]
+
+    def values(self, queryset, extra=None):
+        """
+        Returns the `values()` queryset loading the source columns and the extra columns.
+
+        :param queryset: The queryset.
+        :param extra: Additional columns to be loaded, such as ordering columns.
+        :return: A values queryset.
+        """
+        return queryset.values(*OrderedDict.fromkeys(self.sources + list(extra or [])))
+
+    def transform(self, rows):
+        """
+        Transforms the rows of the values queryset into the serialized representation.
+
+        :param rows: Rows as dictionaries.
+        :return: A list of ordered dictionaries.
+        """
+        ## Get the columns and the converters:
+        columns = [(name, source) for name, source, converter in self.columns]
+        converters = [(name, converter) for name, source, converter in self.columns if converter is not None]
+
+        ## Declare the data:
+        data = []
+
+        ## Transform the rows:
+        for row in rows:
+            item = OrderedDict([(name, row[source]) for name, source in columns])
+            for name, converter in converters:
+                if item[name] is not None:
+                    item[name] = converter(item[name])
+            data.append(item)
+
+        ## Done, return the data:
+        return data
+
+    def transform_columnar(self, rows):
+        """
+        Transforms the rows of the values queryset into columnar data, without a dictionary per row.
+
+        :param rows: Rows as dictionaries.
+        :return: A dictionary of the "columns" and the "rows" as lists of values in the column order.
+        """
+        ## Get the sources and the converters by column index:
+        sources = [source for name, source, converter in self.columns]
+        converters = [
+            (index, converter) for index, (name, source, converter) in enumerate(self.columns)
+            if converter is not None
+        ]
+
+        ## Declare the data:
+        data = []
+
+        ## Transform the rows:
+        for row in rows:
+            values = [row[source] for source in sources]
+            for index, converter in converters:
+                if values[index] is not None:
+                    values[index] = converter(values[index])
+            data.append(values)
+
+        ## Done, return the columnar data:
+        return {"columns": [name for name, source, converter in self.columns], "rows": data}
+
+
+def get_compiled_serializer(serializer_class):
+    """
+    Returns the compiled serializer for the serializer class, `None` if it can not be compiled.
+
+    The compiled serializer is computed on first access and memoized on the serializer class itself.
+
+    :param serializer_class: The model serializer class.
+    :return: A CompiledSerializer instance if the serializer can be compiled, `None` otherwise.
+    """
+    ## Check if we have the compiled serializer already, note that we don't want to inherit it:
+    if "_ldrf_compiled" not in serializer_class.__dict__:
+        serializer_class._ldrf_compiled = compile_serializer(serializer_class)
+
+    ## Done, return the compiled serializer:
+    return serializer_class._ldrf_compiled
+
+
+def get_readable_fields(serializer_class):
+    """
+    Returns the names of the fields the serializer class renders, in order.
+
+    The names are computed on first access and memoized on the serializer class itself.
+
+    :param serializer_class: The serializer class.
+    :return: A list of field names.
+    """
+    ## Check if we have the names already, note that we don't want to inherit them:
+    if "_ldrf_readable" not in serializer_class.__dict__:
+        serializer_class._ldrf_readable = [
+            name for name, field in serializer_class().fields.items() if not field.write_only
+        ]
+
+    ## Done, return the names:
+    return serializer_class._ldrf_readable
+
+
+def compile_serializer(serializer_class):
+    """
+    Compiles the serializer class.
+
+    Only fields rendering a column (possibly across forward relations) or the primary key of a
+    forward relation can be compiled. Serializers with any other fields (such as method fields
+    or nested serializers) need instances, hence they are not compiled.
+
+    :param serializer_class: The model serializer class.
+    :return: A CompiledSerializer instance if the serializer can be compiled, `None` otherwise.
+    """
+    ## Get the model:
+    model = serializer_class.Meta.model
+
+    ## Declare the columns:
+    columns = []
+
+    ## Iterate over the readable fields:
+    for name, field in serializer_class().fields.items():
+        ## Write-only fields are never rendered:
+        if field.write_only:
+            continue
+
+        ## Fields with source "*" need the instance:
+        if field.source == "*":
+            return None
+
+        ## Resolve the source:
+        path, many, related, is_relation, column = resolve_source(model, field.source_attrs)
+
+        ## Many relations need instances:
+        if many:
+            return None
+
+        ## Compile the field:
+        if column is not None:
+            converter = None if type(field).to_representation in IDENTITY_REPRESENTATIONS else field.to_representation
+            columns.append((name, "__".join(path + [column]), converter))
+        elif is_relation and isinstance(field, PrimaryKeyRelatedField):
+            converter = field.pk_field.to_representation if field.pk_field is not None else None
+            columns.append((name, "__".join(path), converter))
+        else:
+            return None
+
+    ## Done, return the compiled serializer:
+    return CompiledSerializer(columns)
@@ -0,0 +1,172 @@
+import json
+
+from django.db.models import Model
+from django.db.models.query import QuerySet
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+from lazydrf.indexes import get_model_field
+from lazydrf.pagination import _load_columns, is_keyset_field, keyset_filter
+
+
+#: Defines the content types of the streaming formats.
+STREAMING_CONTENT_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def iterate(queryset, chunk_size=1000):
+    """
+    Iterates over the queryset in chunks fetched by a query each, hence without holding more than
+    a chunk of rows in memory.
+
+    `QuerySet.iterator()` does not bound the memory usage on most backends, since database
+    drivers such as sqlite3 and psycopg2 fetch all rows of the query at once. Instead, each chunk
+    seeks past the last row of the previous one by the ordering of the queryset (the keyset, see
+    `get_keyset_ordering`). Querysets which can not be seeked, such as ones ordered by nullable or
+    related fields or rows without the ordering columns, are fetched in slices of increasing offsets.
+
+    Related objects to be prefetched are prefetched per chunk by the chunk queries.
+
+    :param queryset: The queryset.
+    :param chunk_size: The number of items per chunk.
+    :return: An iterator of chunks (lists) of items.
+    """
+    ## Get the keyset ordering if any and order by it:
+    ordering = get_keyset_ordering(queryset)
+    if ordering is not None:
+        queryset = _load_columns(queryset.order_by(*ordering), [field.lstrip("-") for field in ordering])
+
+    ## Declare the position of the last item and the offset of the chunk:
+    position, offset = None, 0
+
+    ## Iterate over chunks:
+    while True:
+        ## Get the chunk, done if empty:
+        if position is None:
+            chunk = list(queryset[offset:offset + chunk_size])
+        else:
+            chunk = list(queryset.filter(keyset_filter(ordering, position))[:chunk_size])
+        if not chunk:
+            return
+
+        ## Yield the chunk:
+        yield chunk
+
+        ## Done if the chunk is the last one:
+        if len(chunk) < chunk_size:
+            return
+
+        ## Seek past the last item if possible, move the offset otherwise:
+        position = None if ordering is None else get_position(chunk[-1], ordering)
+        offset += chunk_size
+
+
+def get_keyset_ordering(queryset):
+    """
+    Returns the ordering of the queryset to seek by, ie. its ordering (or the default ordering of
+    the model) with the primary key appended as the tiebreaker unless ordered by a unique field.
+
+    :param queryset: The queryset.
+    :return: A list of field names prefixed with "-" if descending, `None` if the queryset can not be seeked.
+    """
+    ## Sliced querysets can not be filtered, distinct ones may not be ordered differently:
+    query = queryset.query
+    if not query.can_filter() or query.distinct_fields:
+        return None
+
+    ## Get the ordering:
+    if query.order_by:
+        ordering = list(query.order_by)
+    else:
+        ordering = list(queryset.model._meta.ordering) if query.default_ordering else []
+
+    ## All fields must be keyset fields or annotations (such as search ranks):
+    model = queryset.model
+    for field in ordering:
+        if not isinstance(field, str):
+            return None
+        name = field.lstrip("-")
+        if name not in query.annotations and not is_keyset_field(model, name):
+            return None
+
+    ## Append the primary key as the tiebreaker unless there is a unique field already:
+    if not any(getattr(get_model_field(model, field.lstrip("-")), "unique", False) for field in ordering):
+        ordering.append(model._meta.pk.name)
+
+    ## Done, return the ordering:
+    return ordering
+
+
+def get_position(item, ordering):
+    """
+    Returns the position of the item as a list of ordering field values.
+
+    :param item: A model instance or a dictionary.
+    :param ordering: The ordering.
+    :return: A list of values, `None` if the item does not have all of the ordering columns.
+    """
+    names = [field.lstrip("-") for field in ordering]
+    if isinstance(item, dict):
+        return [item[name] for name in names] if all(name in item for name in names) else None
+    if isinstance(item, Model):
+        return [getattr(item, name) for name in names]
+    return None
+
+
+def encode(item):
+    """
+    Encodes the item as compact JSON.
+
+    :param item: The item.
+    :return: The JSON encoded item as bytes.
+    """
+    return json.dumps(item, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def stream_json(items):
+    """
+    Encodes the items incrementally as a JSON array.
+
+    :param items: An iterable of items.
+    :return: An iterator of bytes.
+    """
+    separator = b"["
+    for item in items:
+        yield separator + encode(item)
+        separator = b","
+    yield b"[]" if separator == b"[" else b"]"
+
+
+def stream_ndjson(items):
+    """
+    Encodes the items incrementally as newline delimited JSON.
+
+    :param items: An iterable of items.
+    :return: An iterator of bytes.
+    """
+    for item in items:
+        yield encode(item) + b"\n"
+
+
+def stream_response(items, format="json", chunk_size=1000):
+    """
+    Returns a streaming response of the items encoded in the given format.
+
+    Querysets are iterated in chunks fetched by a query each, hence the memory usage stays flat.
+
+    :param items: A queryset or an iterable of items.
+    :param format: The streaming format, "json" or "ndjson".
+    :param chunk_size: The number of items per chunk for querysets.
+    :return: A streaming response.
+    """
+    ## Iterate over querysets in chunks:
+    if isinstance(items, QuerySet):
+        items = (item for chunk in iterate(items, chunk_size) for item in chunk)
+
+    ## Get the encoder:
+    encoder = stream_ndjson if format == "ndjson" else stream_json
+
+    ## Done, return the response:
+    return StreamingHttpResponse(encoder(items), content_type=STREAMING_CONTENT_TYPES[format])
@@ -0,0 +1,89 @@
+from django.core.urlresolvers import NoReverseMatch, reverse
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from lazydrf.instrumentation import QueryBudgetExceeded
+from lazydrf.registry import registry
+
+
+def get_endpoint_paths(model, viewset, namespace=None):
+    """
+    Returns the paths of the list endpoint and the detail endpoint of the first object of the model.
+
+    Endpoints which are not routed are skipped.
+
+    :param model: The model.
+    :param viewset: The viewset of the model.
+    :param namespace: The URL namespace the router is included with if any.
+    :return: A list of paths.
+    """
+    ## Get the URL name prefix as per DRF's default base name:
+    prefix = "{}{}".format("{}:".format(namespace) if namespace else "", model._meta.object_name.lower())
+
+    ## Declare the paths:
+    paths = []
+
+    ## Add the list path:
+    try:
+        paths.append(reverse("{}-list".format(prefix)))
+    except NoReverseMatch:
+        return paths
+
+    ## Add the detail path of the first object if any:
+    instance = model._default_manager.order_by("pk").first()
+    if instance is not None:
+        lookup = getattr(viewset, "lookup_url_kwarg", None) or viewset.lookup_field
+        paths.append(reverse("{}-detail".format(prefix), kwargs={lookup: getattr(instance, viewset.lookup_field)}))
+
+    ## Done, return paths:
+    return paths
+
+
+def check_query_budgets(client=None, app_labels=(), namespace=None):
+    """
+    Requests the list and detail endpoints of the lazydrf models with query budgets using the data
+    in the database (such as fixtures), and returns the budget violations.
+
+    :param client: The test client, a new API client if none.
+    :param app_labels: Application labels to check, all applications if empty.
+    :param namespace: The URL namespace the router is included with if any.
+    :return: A list of violation messages.
+    """
+    ## Get the client:
+    client = client or APIClient()
+
+    ## Declare the violations:
+    violations = []
+
+    ## Request the endpoints with strict budgets:
+    with override_settings(LAZYDRF_STRICT_QUERY_BUDGETS=True):
+        for uri, model, viewset in registry.get_endpoints(*app_labels):
+            ## Skip if no budgets:
+            if viewset.query_budget is None and viewset.query_time_budget is None:
+                continue
+
+            ## Request the endpoints:
+            for path in get_endpoint_paths(model, viewset, namespace):
+                try:
+                    client.get(path)
+                except QueryBudgetExceeded as error:
+                    violations.append(str(error))
+
+    ## Done, return violations:
+    return violations
+
+
+class QueryBudgetTestMixin:
+    """
+    Defines a test case mixin checking the query budgets of the generated endpoints against the fixtures.
+    """
+
+    #: Defines the application labels to check, all applications if empty.
+    query_budget_apps = ()
+
+    #: Defines the URL namespace the router is included with if any.
+    query_budget_namespace = None
+
+    def test_query_budgets(self):
+        violations = check_query_budgets(self.client, self.query_budget_apps, self.query_budget_namespace)
+        self.assertFalse(violations, "Query budgets exceeded:\n{}".format("\n".join(violations)))
@@ -1,9 +1,47 @@
-from django.db.models import Model, CharField
+import json
+from base64 import urlsafe_b64encode
+from io import StringIO
+from threading import Thread
+from unittest import mock
+
+from django.apps import apps
+from django.conf.urls import include, url
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.migrations import AlterField, AlterIndexTogether
+from django.db.migrations.state import ProjectState
+from django.db.models import Model, BooleanField, CharField, ForeignKey, IntegerField
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
 from django_filters.filters import LOOKUP_TYPES
+from django_filters.filterset import FilterSet
+from rest_framework import serializers
 from rest_framework.decorators import list_route
+from rest_framework.exceptions import ValidationError
 from rest_framework.fields import SerializerMethodField
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.permissions import BasePermission
+from rest_framework.request import Request
+from rest_framework.routers import DefaultRouter
+from rest_framework.test import APIClient, APIRequestFactory
 
-from lazydrf.models import LDRF
+from lazydrf.batch import register_batch
+from lazydrf.caching import TRACKED_MODELS, get_generations_cache
+from lazydrf.changefeed.models import Change
+from lazydrf.filters import CompiledFilterBackend, get_filter_params, get_filter_plan
+from lazydrf.instrumentation import QueryBudgetExceeded, request_instrumented
+from lazydrf.management.commands.lazydrf_indexes import Command as IndexesCommand
+from lazydrf.models import LDRF, LDRFMeta
+from lazydrf.queries import get_query_plan
+from lazydrf.registry import Registry, registry
+from lazydrf.renderers import ColumnarJSONRenderer
+from lazydrf.search import InstallSearchIndex, install_search_index
+from lazydrf.serializers import get_compiled_serializer, narrow_serializer
+from lazydrf.streaming import get_keyset_ordering, iterate
+from lazydrf.testing import QueryBudgetTestMixin, check_query_budgets
+from lazydrf.utils import register_app, warm_up
 
 
 class TestBase(Model, metaclass=LDRF):
@@ -35,9 +73,9 @@ class TestBase(Model, metaclass=LDRF):
     class APIViewset:
         readonly = True
 
-        @list_route
+        @list_route()
         def justname(self, request):
-            return self.model.objects.values_list("name")
+            return self.get_streaming_response(self.model.objects.values_list("name", flat=True))
 
 
 class TestSubclass(TestBase):
@@ -54,3 +92,1129 @@ class TestSubclass(TestBase):
 
     class APIFields:
         editable = ["value"]
+
+
+class TestUnlockedPermission(BasePermission):
+    """
+    Defines a permission denying writes to locked items.
+    """
+
+    def has_object_permission(self, request, view, obj):
+        return not obj.locked
+
+
+class TestOwnerPermission(BasePermission):
+    """
+    Defines a permission granting access to the items owned by an owner named after the user.
+    """
+
+    def has_object_permission(self, request, view, obj):
+        return obj.owner is not None and obj.owner.name == request.user.username
+
+
+class TestVisibleFilter(BaseFilterBackend):
+    """
+    Defines a filter backend hiding the hidden items.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        return queryset.filter(hidden=False)
+
+
+class TestOwner(Model, metaclass=LDRF):
+    """
+    Defines an owner model.
+    """
+
+    #: Defines a name attribute.
+    name = CharField(max_length=16)
+
+    class Meta:
+        app_label = "lazydrf"
+
+    class APIFields:
+        editable = ["name"]
+        readable = ["id"]
+
+
+class TestItem(Model, metaclass=LDRF):
+    """
+    Defines an item model with all the write, conditional and change feed features enabled.
+    """
+
+    #: Defines a unique key attribute.
+    key = CharField(max_length=16, unique=True)
+
+    #: Defines a rank attribute, the keyset ordering field.
+    rank = IntegerField(default=0)
+
+    #: Indicates if the item can not be written.
+    locked = BooleanField(default=False)
+
+    #: Indicates if the item is not visible.
+    hidden = BooleanField(default=False)
+
+    #: Defines the owner of the item.
+    owner = ForeignKey(TestOwner, null=True, blank=True)
+
+    class Meta:
+        app_label = "lazydrf"
+
+    class APIFields:
+        editable = ["key", "rank", "locked", "hidden", "owner"]
+        readable = ["id"]
+        ordering = ["rank"]
+        expandable = ["owner"]
+
+    class APIViewset:
+        conditional = True
+        streaming = True
+        track_changes = True
+        changes_settle_seconds = 0
+        bulk_upsert_field = "key"
+        page_size = 2
+        permission_classes = (TestUnlockedPermission,)
+        filter_backends = (TestVisibleFilter,)
+
+
+class TestDocument(Model, metaclass=LDRF):
+    """
+    Defines a document model searched via the full-text index.
+    """
+
+    #: Defines a title attribute.
+    title = CharField(max_length=64)
+
+    #: Defines a code attribute, matched by prefixes.
+    code = CharField(max_length=16)
+
+    class Meta:
+        app_label = "lazydrf"
+
+    class APIFields:
+        editable = ["title", "code"]
+        readable = ["id"]
+        searching = ["title", "^code"]
+
+    class APIViewset:
+        full_text_search = True
+
+
+class TestItemOwnerSerializer(serializers.ModelSerializer):
+    """
+    Defines an item serializer rendering the name of the owner.
+    """
+
+    owner_name = serializers.CharField(source="owner.name")
+
+    class Meta:
+        model = TestItem
+        fields = ["id", "key", "owner_name"]
+
+
+class TestOwnerItemsSerializer(serializers.ModelSerializer):
+    """
+    Defines an owner serializer rendering the keys of the items.
+    """
+
+    items = serializers.SlugRelatedField(source="testitem_set", slug_field="key", many=True, read_only=True)
+
+    class Meta:
+        model = TestOwner
+        fields = ["id", "name", "items"]
+
+
+#: Defines the URL patterns of the test endpoints, routed once the test models are loaded.
+urlpatterns = []
+
+
+def route_test_endpoints():
+    """
+    Routes the endpoints of the test models and the batch endpoint, unless routed already.
+    """
+    if not urlpatterns:
+        router = DefaultRouter()
+        register_app("lazydrf", router)
+        register_batch(router)
+        urlpatterns.append(url(r"^", include(router.urls)))
+
+
+@override_settings(ROOT_URLCONF="lazydrf.tests")
+class EndpointTestCase(TestCase):
+    """
+    Defines a test case creating the tables of the test models, and the items of the test endpoints.
+    """
+
+    #: Defines the models to create the tables of.
+    models = [TestOwner, TestItem]
+
+    @classmethod
+    def setUpClass(cls):
+        ## Route the endpoints:
+        route_test_endpoints()
+
+        ## Create the tables, out of the transaction of the test case:
+        with connection.schema_editor() as editor:
+            for model in cls.models:
+                editor.create_model(model)
+        super(EndpointTestCase, cls).setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super(EndpointTestCase, cls).tearDownClass()
+        with connection.schema_editor() as editor:
+            for model in reversed(cls.models):
+                editor.delete_model(model)
+
+    def setUp(self):
+        ## Reset the generation counters:
+        get_generations_cache().clear()
+
+        ## Create the owner and the items:
+        self.owner = TestOwner.objects.create(name="owner")
+        self.items = [
+            TestItem.objects.create(key="k{}".format(index), rank=index, owner=self.owner) for index in range(5)
+        ]
+        self.client = APIClient()
+
+    def get_cursor(self, position, reverse=False):
+        """
+        Returns the encoded cursor of the position.
+        """
+        return urlsafe_b64encode(json.dumps({"r": int(reverse), "p": position}).encode("utf-8")).decode("ascii")
+
+
+class QueryPlanTestCase(EndpointTestCase):
+    """
+    Tests the query plans of serializers.
+    """
+
+    def test_joins_forward_relations(self):
+        plan = get_query_plan(TestItemOwnerSerializer)
+        self.assertEqual((plan.select_related, plan.prefetch_related), (["owner"], []))
+        with self.assertNumQueries(1):
+            data = TestItemOwnerSerializer(plan.apply(TestItem.objects.all()), many=True).data
+        self.assertEqual([item["owner_name"] for item in data], ["owner"] * 5)
+
+    def test_prefetches_reverse_relations(self):
+        TestOwner.objects.create(name="other")
+        plan = get_query_plan(TestOwnerItemsSerializer)
+        self.assertEqual((plan.select_related, plan.prefetch_related), ([], ["testitem_set"]))
+        with self.assertNumQueries(2):
+            data = TestOwnerItemsSerializer(plan.apply(TestOwner.objects.order_by("pk")), many=True).data
+        self.assertEqual([sorted(item["items"]) for item in data], [["k0", "k1", "k2", "k3", "k4"], []])
+
+
+class ProjectionTestCase(EndpointTestCase):
+    """
+    Tests the column projections of serializers.
+    """
+
+    def test_loads_rendered_columns_only(self):
+        plan = get_query_plan(TestItemOwnerSerializer)
+        self.assertEqual(plan.only, ["id", "key", "owner", "owner__name"])
+        with CaptureQueriesContext(connection) as queries:
+            TestItemOwnerSerializer(plan.apply(TestItem.objects.all()), many=True).data
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("rank", queries[0]["sql"])
+
+    def test_method_fields_load_instances(self):
+        class TestItemMethodSerializer(serializers.ModelSerializer):
+            label = serializers.SerializerMethodField()
+
+            class Meta:
+                model = TestItem
+                fields = ["id", "label"]
+
+        self.assertIsNone(get_query_plan(TestItemMethodSerializer).only)
+
+
+class SparseFieldsTestCase(EndpointTestCase):
+    """
+    Tests sparse fieldsets.
+    """
+
+    def get_list(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/testitems/", params)
+        self.assertEqual(len(queries), 1)
+        return response, queries[0]["sql"]
+
+    def test_fields(self):
+        response, sql = self.get_list({"fields": "key,id,unknown"})
+        self.assertEqual([list(item.keys()) for item in response.data["results"]], [["id", "key"]] * 2)
+        self.assertNotIn("owner_id", sql)
+
+    def test_omit(self):
+        response, sql = self.get_list({"omit": "owner,hidden"})
+        self.assertEqual(list(response.data["results"][0].keys()), ["id", "key", "rank", "locked"])
+        self.assertNotIn("owner_id", sql)
+
+    def test_narrowed_serializers_are_memoized(self):
+        narrowed = narrow_serializer(TestItem.LDRFMeta.serializer, ("id", "key"))
+        self.assertIs(narrow_serializer(TestItem.LDRFMeta.serializer, ("id", "key")), narrowed)
+        self.assertEqual(get_query_plan(narrowed).only, ["id", "key"])
+
+    def test_writes_render_all_fields(self):
+        path = "/testitems/{}/?fields=id".format(self.items[0].pk)
+        response = self.client.patch(path, {"rank": 10}, format="json")
+        self.assertEqual(response.data["rank"], 10)
+
+
+class CursorTestCase(EndpointTestCase):
+    """
+    Tests keyset cursors.
+    """
+
+    def test_next_page(self):
+        response = self.client.get(self.client.get("/testitems/").data["next"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item["key"] for item in response.data["results"]], ["k2", "k3"])
+
+    def test_malformed_cursors(self):
+        for cursor in ["x", self.get_cursor([1]), self.get_cursor(["abc", 1]), self.get_cursor([[1], 1]),
+                       self.get_cursor([None, 1]), self.get_cursor("abc")]:
+            response = self.client.get("/testitems/", {"cursor": cursor})
+            self.assertEqual(response.status_code, 404, cursor)
+
+
+class CompiledListTestCase(EndpointTestCase):
+    """
+    Tests compiled listings.
+    """
+
+    def get_pages(self):
+        """
+        Returns the pages of the items by following the next links.
+        """
+
+        pages = [self.client.get("/testitems/").data]
+        while pages[-1]["next"]:
+            pages.append(self.client.get(pages[-1]["next"]).data)
+        return pages
+
+    def test_renders_as_the_serializer(self):
+        ## List the usual way:
+        expected = self.get_pages()
+
+        ## List compiled, with one query per page:
+        with mock.patch.object(TestItem.LDRFMeta.viewset, "compiled", True):
+            with CaptureQueriesContext(connection) as queries:
+                compiled = self.get_pages()
+
+        ## The pages are the same:
+        self.assertIsNotNone(get_compiled_serializer(TestItem.LDRFMeta.serializer))
+        self.assertEqual([len(page["results"]) for page in compiled], [2, 2, 1])
+        self.assertEqual(compiled, expected)
+        self.assertEqual(len(queries), 3)
+
+    def test_compiles_forward_columns(self):
+        compiled = get_compiled_serializer(TestItemOwnerSerializer)
+        rows = compiled.values(TestItem.objects.order_by("pk"))
+        self.assertEqual(compiled.transform(rows[:1]), [{"id": self.items[0].pk, "key": "k0", "owner_name": "owner"}])
+
+    def test_method_fields_are_not_compiled(self):
+        class TestItemMethodSerializer(serializers.ModelSerializer):
+            label = serializers.SerializerMethodField()
+
+            class Meta:
+                model = TestItem
+                fields = ["id", "label"]
+
+        self.assertIsNone(get_compiled_serializer(TestItemMethodSerializer))
+
+
+class CacheTestCase(EndpointTestCase):
+    """
+    Tests cached responses.
+    """
+
+    def test_cached_retrieves_check_object_permissions(self):
+        path = "/testitems/{}/".format(self.items[0].pk)
+        viewset = TestItem.LDRFMeta.viewset
+        with mock.patch.multiple(viewset, cache_responses=True, permission_classes=(TestOwnerPermission,)):
+            ## Cache the response of the permitted user:
+            self.client.force_authenticate(User(username="owner"))
+            self.assertEqual(self.client.get(path).status_code, 200)
+            with self.assertNumQueries(2):
+                self.assertEqual(self.client.get(path).status_code, 200)
+
+            ## Others are denied, from the cache or not:
+            self.client.force_authenticate(User(username="other"))
+            self.assertEqual(self.client.get(path).status_code, 403)
+
+    def test_generations_of_keyed_models_only(self):
+        ## The items are conditional, the owners are rendered by the expanded items:
+        self.assertEqual(TRACKED_MODELS, {TestItem, TestOwner})
+
+        ## Saves of other models do not touch the generations:
+        with mock.patch("lazydrf.caching.bump_generation") as bump:
+            User.objects.create(username="someone")
+            self.assertFalse(bump.called)
+            self.owner.save()
+            self.assertTrue(bump.called)
+
+    @override_settings(LAZYDRF_GENERATIONS_CACHE="generations", CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "generations": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "generations"},
+    })
+    def test_generations_cache_setting(self):
+        etag = self.client.get("/testitems/").get("ETag")
+        self.assertIsNotNone(get_generations_cache().get("lazydrf:generation:lazydrf.testitem"))
+        self.assertEqual(self.client.get("/testitems/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_cached_lists_are_invalidated(self):
+        with mock.patch.object(TestItem.LDRFMeta.viewset, "cache_responses", True):
+            self.assertEqual(len(self.client.get("/testitems/").data["results"]), 2)
+            with self.assertNumQueries(0):
+                self.client.get("/testitems/")
+            TestItem.objects.filter(rank__lt=2).delete()
+            self.assertEqual(self.client.get("/testitems/").data["results"][0]["key"], "k2")
+
+
+class StreamingTestCase(EndpointTestCase):
+    """
+    Tests streamed lists.
+    """
+
+    def test_streams_in_keyset_chunks(self):
+        with mock.patch.object(TestItem.LDRFMeta.viewset, "stream_chunk_size", 2):
+            response = self.client.get("/testitems/", {"stream": "ndjson"})
+            with CaptureQueriesContext(connection) as queries:
+                lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+        self.assertEqual([json.loads(line)["key"] for line in lines], ["k0", "k1", "k2", "k3", "k4"])
+        self.assertEqual(len(queries), 3)
+        self.assertTrue(all("OFFSET" not in query["sql"] for query in queries[1:]))
+
+    def test_iterates_by_offsets_without_keyset(self):
+        chunks = list(iterate(TestItem.objects.order_by("-rank").values_list("key", flat=True), 2))
+        self.assertEqual(chunks, [["k4", "k3"], ["k2", "k1"], ["k0"]])
+        chunks = list(iterate(TestItem.objects.order_by("owner", "rank"), 3))
+        self.assertEqual([[item.key for item in chunk] for chunk in chunks], [["k0", "k1", "k2"], ["k3", "k4"]])
+
+    def test_keyset_ordering(self):
+        self.assertEqual(get_keyset_ordering(TestItem.objects.order_by("-rank")), ["-rank", "id"])
+        self.assertEqual(get_keyset_ordering(TestItem.objects.order_by("key")), ["key"])
+        self.assertIsNone(get_keyset_ordering(TestItem.objects.order_by("owner__name")))
+
+
+class ConditionalTestCase(EndpointTestCase):
+    """
+    Tests entity tags and preconditions.
+    """
+
+    def test_not_modified_until_written(self):
+        etag = self.client.get("/testitems/").get("ETag")
+        self.assertEqual(self.client.get("/testitems/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.items[0].save()
+        self.assertEqual(self.client.get("/testitems/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_hidden_objects_have_no_validators(self):
+        TestItem.objects.filter(pk=self.items[0].pk).update(hidden=True)
+        path = "/testitems/{}/".format(self.items[0].pk)
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH="*").status_code, 404)
+        self.assertEqual(self.client.patch(path, {"rank": 10}, format="json", HTTP_IF_MATCH="*").status_code, 404)
+
+    def test_forbidden_objects_have_no_validators(self):
+        path = "/testitems/{}/".format(self.items[0].pk)
+        with mock.patch.object(TestItem.LDRFMeta.viewset, "permission_classes", (TestOwnerPermission,)):
+            self.client.force_authenticate(User(username="other"))
+            self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH="*").status_code, 403)
+            self.client.force_authenticate(User(username="owner"))
+            self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH="*").status_code, 304)
+
+            ## The object looked up for the validators is rendered, the owner is fetched by the permission:
+            with self.assertNumQueries(2):
+                self.assertEqual(self.client.get(path).status_code, 200)
+
+    def test_if_match(self):
+        path = "/testitems/{}/".format(self.items[0].pk)
+        etag = self.client.get(path).get("ETag")
+        response = self.client.patch(path, {"rank": 10}, format="json", HTTP_IF_MATCH='"bogus"')
+        self.assertEqual(response.status_code, 412)
+        response = self.client.patch(path, {"rank": 10}, format="json", HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.get("ETag"), etag)
+        response = self.client.patch(path, {"rank": 20}, format="json", HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(TestItem.objects.get(pk=self.items[0].pk).rank, 10)
+
+
+class BulkTestCase(EndpointTestCase):
+    """
+    Tests bulk creates, updates and upserts.
+    """
+
+    def test_upsert(self):
+        response = self.client.post("/testitems/bulk/", [{"key": "k0", "rank": 10}, {"key": "new", "rank": 11}],
+                                    format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {"created": 1, "updated": 1})
+        self.assertEqual(TestItem.objects.get(key="k0").rank, 10)
+        self.assertTrue(TestItem.objects.filter(key="new").exists())
+
+    def test_upsert_checks_object_permissions(self):
+        TestItem.objects.filter(key="k0").update(locked=True)
+        response = self.client.post("/testitems/bulk/", [{"key": "k0", "rank": 10}], format="json")
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(TestItem.objects.get(key="k0").rank, 0)
+
+    def test_upsert_is_scoped_to_the_queryset(self):
+        TestItem.objects.filter(key="k0").update(hidden=True)
+        response = self.client.post("/testitems/bulk/", [{"key": "k0", "rank": 10}], format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(TestItem.objects.get(key="k0").rank, 0)
+
+    def test_duplicate_upsert_keys(self):
+        response = self.client.post("/testitems/bulk/", [{"key": "dup"}, {"key": "dup"}], format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data[1].keys()), ["key"])
+        self.assertFalse(TestItem.objects.filter(key="dup").exists())
+
+    def test_items_which_are_not_objects(self):
+        response = self.client.post("/testitems/bulk/", [{"key": "new"}, 1], format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data[0], {})
+        self.assertIn("non_field_errors", response.data[1])
+
+    def test_unique_values_taken(self):
+        items = [{"id": self.items[0].pk, "key": "k2"}, {"id": self.items[1].pk, "key": "k1"}]
+        response = self.client.patch("/testitems/bulk/", items, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual((list(response.data[0].keys()), response.data[1]), (["key"], {}))
+        self.assertEqual(TestItem.objects.get(pk=self.items[0].pk).key, "k0")
+
+    def test_queries_do_not_depend_on_the_number_of_items(self):
+        ## Count the queries of upserting and updating two and then four items:
+        counts = []
+        for size in (2, 4):
+            upserts = [{"key": item.key, "rank": size} for item in self.items[:size]]
+            updates = [{"id": item.pk, "key": item.key, "rank": size} for item in self.items[:size]]
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.post("/testitems/bulk/", upserts, format="json").status_code, 201)
+                self.assertEqual(self.client.patch("/testitems/bulk/", updates, format="json").status_code, 200)
+            counts.append(len(queries))
+
+        ## The number of queries is the same:
+        self.assertEqual(counts[0], counts[1])
+
+    def test_bulk_updates_invalidate_entity_tags(self):
+        path = "/testitems/{}/".format(self.items[0].pk)
+        etag = self.client.get(path).get("ETag")
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.client.patch("/testitems/bulk/", [{"id": self.items[0].pk, "rank": 10}], format="json")
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class SearchTestCase(EndpointTestCase):
+    """
+    Tests full-text search via the FTS5 index.
+    """
+
+    #: Defines the models to create the tables of.
+    models = EndpointTestCase.models + [TestDocument]
+
+    @classmethod
+    def setUpClass(cls):
+        super(SearchTestCase, cls).setUpClass()
+        cls.operation = InstallSearchIndex("testdocument", ["title", "^code"])
+        with connection.schema_editor() as editor:
+            cls.operation.database_forwards("lazydrf", editor, None, ProjectState.from_apps(apps))
+
+    @classmethod
+    def tearDownClass(cls):
+        with connection.schema_editor() as editor:
+            cls.operation.database_backwards("lazydrf", editor, ProjectState.from_apps(apps), None)
+        super(SearchTestCase, cls).tearDownClass()
+
+    def setUp(self):
+        super(SearchTestCase, self).setUp()
+        TestDocument.objects.create(title="green apples", code="ap1")
+        TestDocument.objects.create(title="apples and pears", code="pe1")
+        TestDocument.objects.create(title="red apples, apples, apples", code="ap2")
+
+    def test_search(self):
+        response = self.client.get("/testdocuments/", {"search": "apples"})
+        self.assertEqual([item["code"] for item in response.data["results"]], ["ap2", "ap1", "pe1"])
+        response = self.client.get("/testdocuments/", {"search": "ap"})
+        self.assertEqual(sorted([item["code"] for item in response.data["results"]]), ["ap1", "ap2"])
+
+    def test_search_joins_the_index_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/testdocuments/", {"search": "pears"})
+        sql = [query["sql"] for query in queries if "MATCH" in query["sql"]]
+        self.assertEqual(len(sql), 1)
+        self.assertEqual(sql[0].count("MATCH"), 1)
+
+    def test_search_index_is_synced(self):
+        document = TestDocument.objects.create(title="plums", code="pl1")
+        self.assertEqual(len(self.client.get("/testdocuments/", {"search": "plums"}).data["results"]), 1)
+        document.delete()
+        self.assertEqual(self.client.get("/testdocuments/", {"search": "plums"}).data["results"], [])
+
+    def test_missing_indexes_are_installed(self):
+        ## Drop the index:
+        with connection.schema_editor() as editor:
+            self.operation.database_backwards("lazydrf", editor, ProjectState.from_apps(apps), None)
+
+        ## Models without tables are skipped:
+        with mock.patch.object(TestDocument._meta, "db_table", "lazydrf_missing"):
+            self.assertFalse(install_search_index(TestDocument))
+
+        ## Missing indexes are installed:
+        self.assertTrue(install_search_index(TestDocument))
+        self.assertEqual(len(self.client.get("/testdocuments/", {"search": "pears"}).data["results"]), 1)
+
+
+class IndexesTestCase(EndpointTestCase):
+    """
+    Tests the index advisor command.
+    """
+
+    def test_report(self):
+        stdout = StringIO()
+        call_command("lazydrf_indexes", "lazydrf", stdout=stdout, no_color=True)
+        report = stdout.getvalue()
+        self.assertIn("pagination rank order: missing (suggested index on rank, id)", report)
+        self.assertIn("table lazydrf_testdocument does not exist", report)
+
+    def test_index_operations(self):
+        operations = IndexesCommand().get_index_operations(TestItem, [("locked",), ("rank", "id")])
+        self.assertEqual([type(operation) for operation in operations], [AlterField, AlterIndexTogether])
+        self.assertEqual((operations[0].name, operations[0].field.db_index), ("locked", True))
+        self.assertEqual(operations[1].index_together, {("rank", "id")})
+
+
+class CountTestCase(EndpointTestCase):
+    """
+    Tests the count strategies of paginated lists.
+    """
+
+    def get_count(self, strategy, params=None):
+        with mock.patch.object(TestItem.LDRFMeta.viewset, "count_strategy", strategy, create=True):
+            return self.client.get("/testitems/", params or {}).data.get("count")
+
+    def test_strategies(self):
+        self.assertIsNone(self.get_count("none"))
+        self.assertEqual(self.get_count("exact"), 5)
+        self.assertEqual(self.get_count("estimated"), 5)
+
+    def test_cached_count(self):
+        ## Count and cache:
+        self.assertEqual(self.get_count("cached"), 5)
+
+        ## The cached count is served without counting or scanning the models:
+        with mock.patch("lazydrf.pagination.apps.get_models", side_effect=AssertionError), self.assertNumQueries(1):
+            self.assertEqual(self.get_count("cached"), 5)
+
+        ## Counts are cached per filter parameters and invalidated by changes:
+        self.assertEqual(self.get_count("cached", {"owner__name": "owner"}), 5)
+        TestItem.objects.create(key="new")
+        self.assertEqual(self.get_count("cached"), 6)
+
+
+class LazyBuildTestCase(TestCase):
+    """
+    Tests building the serializers, viewsets and filter sets lazily.
+    """
+
+    def test_builds_on_first_access(self):
+        class TestLazy(TestBase):
+            class Meta:
+                app_label = "lazydrf"
+                abstract = True
+
+            class APIFields:
+                expandable = ["missing"]
+
+        ## Nothing is built on declaration, not even the invalid expandable relations:
+        builders = getattr(TestLazy.LDRFMeta, "_LDRFMeta__builders")
+        self.assertEqual(sorted(builders), sorted(LDRFMeta.ARTIFACTS))
+
+        ## The serializer is built on access, alone:
+        self.assertEqual(TestLazy.LDRFMeta.serializer.Meta.fields, TestBase.LDRFMeta.serializer.Meta.fields)
+        self.assertNotIn("serializer", builders)
+        self.assertIn("viewset", builders)
+
+        ## The invalid expandable relations are reported on access:
+        with self.assertRaises(ImproperlyConfigured):
+            TestLazy.LDRFMeta.expandable
+
+    def test_builds_once_concurrently(self):
+        class TestLazy(TestBase):
+            class Meta:
+                app_label = "lazydrf"
+                abstract = True
+
+        ## Access the viewset from threads:
+        viewsets = []
+        threads = [Thread(target=lambda: viewsets.append(TestLazy.LDRFMeta.viewset)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        ## The viewset is built once:
+        self.assertEqual(len(viewsets), 8)
+        self.assertEqual(len(set(viewsets)), 1)
+
+    def test_warm_up(self):
+        warm_up("lazydrf")
+        for model in [TestOwner, TestItem]:
+            self.assertEqual(getattr(model.LDRFMeta, "_LDRFMeta__builders"), {})
+            self.assertIsNotNone(model.LDRFMeta.filterset)
+
+
+class RegistryTestCase(TestCase):
+    """
+    Tests the registry of lazydrf models.
+    """
+
+    def setUp(self):
+        self.registry = Registry()
+        self.registry.add(TestOwner)
+        self.registry.add(TestItem)
+
+    def test_lookups(self):
+        self.assertEqual(self.registry.get_models(), [TestOwner, TestItem])
+        self.assertEqual(self.registry.get_models("missing"), [])
+        self.assertIs(self.registry.get_model("lazydrf", "TestItem"), TestItem)
+        self.assertIsNone(self.registry.get_model("lazydrf", "missing"))
+        self.assertIs(self.registry.get_by_uri("testitems"), TestItem)
+        self.assertIsNone(self.registry.get_by_uri("missing"))
+        self.assertIs(registry.get_model("lazydrf", "testowner"), TestOwner)
+
+    def test_register_all(self):
+        router = DefaultRouter()
+        self.registry.register_all(router, "lazydrf")
+        self.assertEqual([entry[0] for entry in router.registry], ["testowners", "testitems"])
+
+    def test_uri_collisions(self):
+        with mock.patch.object(TestOwner.LDRFMeta.viewset, "uri", "testitems"):
+            ## Collisions are reported on lookups and registration:
+            with self.assertRaises(ImproperlyConfigured):
+                self.registry.get_by_uri("testitems")
+            with self.assertRaises(ImproperlyConfigured):
+                self.registry.register_all(DefaultRouter())
+
+            ## Collisions are checked among the models of the registry only:
+            other = Registry()
+            other.add(TestItem)
+            self.assertIs(other.get_by_uri("testitems"), TestItem)
+
+    def test_router_collisions(self):
+        router = DefaultRouter()
+        TestItem.LDRFMeta.register(router)
+        with mock.patch.object(TestOwner.LDRFMeta.viewset, "uri", "testitems"):
+            with self.assertRaises(ImproperlyConfigured):
+                TestOwner.LDRFMeta.register(router)
+
+
+class InstrumentationTestCase(EndpointTestCase):
+    """
+    Tests instrumenting requests.
+    """
+
+    def test_not_instrumented(self):
+        self.assertNotIn("Server-Timing", self.client.get("/testitems/"))
+
+    def test_server_timing(self):
+        ## Request instrumented, receiving the records:
+        records = []
+
+        def receiver(sender, request, record, **kwargs):
+            records.append(record)
+
+        request_instrumented.connect(receiver)
+        try:
+            with mock.patch.object(TestItem.LDRFMeta.viewset, "instrument", True):
+                with self.assertLogs("lazydrf.instrumentation", "INFO"):
+                    listed = self.client.get("/testitems/")
+                    retrieved = self.client.get("/testitems/{}/".format(self.items[0].pk))
+        finally:
+            request_instrumented.disconnect(receiver)
+
+        ## The phases are reported in the header:
+        for response in [listed, retrieved]:
+            phases = [entry.split(";")[0] for entry in response["Server-Timing"].split(", ")]
+            self.assertEqual(phases, ["db", "query", "serialize", "render", "total"])
+
+        ## The records are sent:
+        self.assertEqual([(record["action"], record["status"]) for record in records], [
+            ("list", 200), ("retrieve", 200),
+        ])
+        self.assertEqual(records[0]["queries"], 1)
+        self.assertEqual(records[0]["size"], len(listed.content))
+
+    def test_header_disabled(self):
+        with mock.patch.multiple(TestItem.LDRFMeta.viewset, instrument=True, instrument_header=False):
+            with self.assertLogs("lazydrf.instrumentation", "INFO") as logs:
+                response = self.client.get("/testitems/")
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(logs.records[0].lazydrf["path"], "/testitems/")
+
+
+class QueryBudgetTestCase(QueryBudgetTestMixin, EndpointTestCase):
+    """
+    Tests query budgets, checking the ones of the test endpoints via the test case mixin.
+    """
+
+    #: Defines the application labels to check.
+    query_budget_apps = ("lazydrf",)
+
+    def setUp(self):
+        super(QueryBudgetTestCase, self).setUp()
+        patcher = mock.patch.object(TestItem.LDRFMeta.viewset, "query_budget", {"list": 1, "retrieve": 1})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_violations_are_logged(self):
+        with mock.patch.object(TestItem.LDRFMeta.viewset, "query_budget", 0):
+            with self.assertLogs("lazydrf.instrumentation", "WARNING") as logs:
+                response = self.client.get("/testitems/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("1 queries over the budget of 0", logs.output[0])
+
+    @override_settings(LAZYDRF_STRICT_QUERY_BUDGETS=True)
+    def test_violations_are_raised_if_strict(self):
+        ## The budgets are checked by action:
+        with mock.patch.object(TestItem.LDRFMeta.viewset, "query_budget", {"retrieve": 0}):
+            self.assertEqual(self.client.get("/testitems/").status_code, 200)
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get("/testitems/{}/".format(self.items[0].pk))
+
+        ## The time budgets, too:
+        with mock.patch.object(TestItem.LDRFMeta.viewset, "query_time_budget", 0):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get("/testitems/")
+
+    def test_check_query_budgets(self):
+        with mock.patch.object(TestItem.LDRFMeta.viewset, "query_budget", 0):
+            violations = check_query_budgets(self.client, ["lazydrf"])
+        self.assertEqual(len(violations), 2)
+        self.assertIn("GET /testitems/ (lazydrf.testitem list)", violations[0])
+        self.assertIn("GET /testitems/{}/ (lazydrf.testitem retrieve)".format(self.items[0].pk), violations[1])
+
+
+class FilterTestCase(EndpointTestCase):
+    """
+    Tests compiled filter plans.
+    """
+
+    #: Defines the filter fields of the views.
+    filter_fields = {"key": ["exact"], "rank": ["exact", "lt"]}
+
+    def filter(self, params):
+        view = mock.Mock(filter_class=None, filter_fields=self.filter_fields)
+        request = Request(APIRequestFactory().get("/", params))
+        return CompiledFilterBackend().filter_queryset(request, TestItem.objects.order_by("rank"), view)
+
+    def test_filters(self):
+        self.assertEqual([item.key for item in self.filter({"rank__lt": 2})], ["k0", "k1"])
+        self.assertEqual([item.key for item in self.filter({"key": "k3", "rank": 3})], ["k3"])
+        with self.assertRaises(ValidationError):
+            self.filter({"key__regex": "k"})
+
+    def test_plans_memoized_on_classes(self):
+        ## Build a FilterSet class and a subclass:
+        class TestItemFilterSet(FilterSet):
+            class Meta:
+                model = TestItem
+                fields = self.filter_fields
+
+        class TestItemFilterSubset(TestItemFilterSet):
+            pass
+
+        filter_class, subclass = TestItemFilterSet, TestItemFilterSubset
+
+        ## Parameters are memoized per class:
+        self.assertIs(get_filter_params(filter_class), get_filter_params(filter_class))
+        self.assertIsNot(get_filter_params(subclass), get_filter_params(filter_class))
+
+        ## Plans are memoized per class up to the cache size:
+        with mock.patch("lazydrf.filters.FILTER_PLANS_CACHE_SIZE", 1):
+            plan = get_filter_plan(filter_class, frozenset(["key"]))
+            self.assertIs(get_filter_plan(filter_class, frozenset(["key"])), plan)
+            get_filter_plan(filter_class, frozenset(["rank"]))
+        self.assertEqual(list(filter_class._ldrf_filter_plans), [frozenset(["key"])])
+        self.assertNotIn("_ldrf_filter_plans", subclass.__dict__)
+
+
+class AggregateTestCase(EndpointTestCase):
+    """
+    Tests aggregations.
+    """
+
+    def aggregate(self, params):
+        aggregating = {"locked": ["group"], "rank": ["group", "sum", "max"]}
+        with mock.patch.object(TestItem.LDRFMeta.viewset, "aggregating", aggregating):
+            return self.client.get("/testitems/aggregate/", params)
+
+    def test_groups(self):
+        TestItem.objects.filter(pk=self.items[4].pk).update(locked=True)
+        with self.assertNumQueries(1):
+            response = self.aggregate({"group": "locked", "sum": "rank"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([dict(row) for row in response.data["results"]], [
+            {"locked": False, "id__count": 4, "rank__sum": 6},
+            {"locked": True, "id__count": 1, "rank__sum": 4},
+        ])
+
+    def test_without_groups(self):
+        response = self.aggregate({"max": "rank"})
+        self.assertEqual(response.data["results"], [{"id__count": 5, "rank__max": 4}])
+
+    def test_invalid_aggregates(self):
+        response = self.aggregate({"group": "key", "avg": "rank"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sorted(response.data.keys()), ["avg", "group"])
+
+
+class ReplicaTestCase(EndpointTestCase):
+    """
+    Tests reading from a replica, an in-memory SQLite database holding other items than the primary.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        ## Add the replica database:
+        cls.replica = mock.patch.dict(connections.databases, {"replica": {
+            "ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:",
+        }})
+        cls.replica.start()
+
+        ## Create the tables and the items of the replica:
+        with connections["replica"].schema_editor() as editor:
+            for model in cls.models:
+                editor.create_model(model)
+        TestItem.objects.using("replica").bulk_create([TestItem(key="r0")])
+        super(ReplicaTestCase, cls).setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super(ReplicaTestCase, cls).tearDownClass()
+        connections["replica"].close()
+        del connections["replica"]
+        cls.replica.stop()
+
+    def setUp(self):
+        super(ReplicaTestCase, self).setUp()
+        patcher = mock.patch.object(TestItem.LDRFMeta.viewset, "read_database", "replica")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_keys(self, **kwargs):
+        """
+        Returns the keys of the listed items.
+        """
+        return [item["key"] for item in self.client.get("/testitems/", **kwargs).data["results"]]
+
+    def test_reads_from_the_replica(self):
+        ## Safe methods read from the replica:
+        self.assertEqual(self.get_keys(), ["r0"])
+        self.assertEqual(self.client.get("/testitems/{}/".format(self.items[1].pk)).status_code, 404)
+
+        ## Unless asked for the primary:
+        self.assertEqual(self.get_keys(HTTP_X_READ_PRIMARY="1"), ["k0", "k1"])
+
+        ## Databases may be picked, too:
+        with mock.patch.object(TestItem.LDRFMeta.viewset, "read_database", ["replica"]):
+            self.assertEqual(self.get_keys(), ["r0"])
+        with mock.patch.object(TestItem.LDRFMeta.viewset, "read_database", lambda self: "default"):
+            self.assertEqual(self.get_keys(), ["k0", "k1"])
+
+    def test_reads_stick_to_the_primary_after_writes(self):
+        ## Write to the primary:
+        response = self.client.post("/testitems/", {"key": "k5", "rank": 5}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(TestItem.objects.using("replica").filter(key="k5").count(), 0)
+
+        ## Read from the primary while sticky:
+        self.assertIn("lazydrf_primary", response.cookies)
+        self.assertEqual(self.get_keys(), ["k0", "k1"])
+
+        ## Read from the replica once expired:
+        self.client.cookies["lazydrf_primary"] = "0"
+        self.assertEqual(self.get_keys(), ["r0"])
+
+    def test_replica_reads_are_not_cached(self):
+        with mock.patch.object(TestItem.LDRFMeta.viewset, "cache_responses", True):
+            ## Read from the replica, then the primary, both are not served from the cache:
+            self.assertEqual(self.get_keys(), ["r0"])
+            self.assertEqual(self.get_keys(HTTP_X_READ_PRIMARY="1"), ["k0", "k1"])
+            self.assertEqual(self.get_keys(), ["r0"])
+
+        ## Replica reads are not tagged:
+        self.assertNotIn("ETag", self.client.get("/testitems/"))
+        self.assertIn("ETag", self.client.get("/testitems/", HTTP_X_READ_PRIMARY="1"))
+
+
+class BatchTestCase(EndpointTestCase):
+    """
+    Tests batch requests.
+    """
+
+    def test_streaming_sub_request(self):
+        response = self.client.post("/batch/", [{"uri": "testitems", "params": {"stream": "json"}}], format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]["status"], 200)
+        self.assertEqual([item["key"] for item in response.data[0]["data"]["results"]], ["k0", "k1"])
+
+    def test_retrieves(self):
+        pks = [self.items[0].pk, self.items[1].pk]
+        response = self.client.post("/batch/", [{"uri": "testitems", "pks": pks}, {"uri": "testitems", "pk": 0}],
+                                    format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item["id"] for item in response.data[0]["data"]], pks)
+        self.assertEqual(response.data[1]["status"], 404)
+
+    def test_invalid_retrieves(self):
+        pk = self.items[0].pk
+        response = self.client.post("/batch/", [{"uri": "testitems", "pks": [pk, "abc"]},
+                                                {"uri": "testitems", "pk": "abc"}], format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item["id"] for item in response.data[0]["data"]], [pk])
+        self.assertEqual(response.data[1]["status"], 404)
+
+    def test_forbidden_retrieves(self):
+        self.items[1].locked = True
+        self.items[1].save()
+        pks = [self.items[0].pk, self.items[1].pk]
+        items = [{"uri": "testitems", "pk": pk} for pk in pks] + [{"uri": "testitems", "pks": pks}]
+        response = self.client.post("/batch/", items, format="json")
+        self.assertEqual([item["status"] for item in response.data], [200, 403, 403])
+        self.assertEqual(response.data[0]["data"]["id"], pks[0])
+
+
+class ChangeFeedTestCase(EndpointTestCase):
+    """
+    Tests change feeds.
+    """
+
+    def test_changes(self):
+        ## Get the cursor:
+        cursor = self.client.get("/testitems/changes/").data["cursor"]
+
+        ## Change, create and delete:
+        self.items[0].save()
+        created = TestItem.objects.create(key="new")
+        deleted = self.items[1].pk
+        self.items[1].delete()
+
+        ## Get the changes:
+        response = self.client.get("/testitems/changes/", {"since": cursor})
+        self.assertEqual([item["id"] for item in response.data["changed"]], [self.items[0].pk, created.pk])
+        self.assertEqual(response.data["deleted"], [deleted])
+        self.assertFalse(response.data["more"])
+
+        ## Nothing changed since:
+        response = self.client.get("/testitems/changes/", {"since": response.data["cursor"]})
+        self.assertEqual((response.data["changed"], response.data["deleted"]), ([], []))
+
+    def test_changes_of_hidden_items(self):
+        cursor = self.client.get("/testitems/changes/").data["cursor"]
+        TestItem.objects.create(key="hidden", hidden=True)
+        self.items[0].hidden = True
+        self.items[0].save()
+        response = self.client.get("/testitems/changes/", {"since": cursor})
+        self.assertEqual(response.data["changed"], [])
+        self.assertEqual(len(response.data["deleted"]), 2)
+
+    def test_unsettled_changes(self):
+        cursor = self.client.get("/testitems/changes/").data["cursor"]
+        self.items[0].save()
+        TestItem.LDRFMeta.viewset.changes_settle_seconds = 60
+        try:
+            response = self.client.get("/testitems/changes/", {"since": cursor})
+        finally:
+            TestItem.LDRFMeta.viewset.changes_settle_seconds = 0
+        self.assertEqual((response.data["cursor"], response.data["changed"]), (cursor, []))
+
+    def test_malformed_cursor(self):
+        self.assertEqual(self.client.get("/testitems/changes/", {"since": "x"}).status_code, 400)
+
+    def test_pruned_changes(self):
+        ## Log a change and get the cursor before and after it:
+        before = self.client.get("/testitems/changes/").data["cursor"]
+        self.items[0].save()
+        after = self.client.get("/testitems/changes/").data["cursor"]
+
+        ## Prune all entries:
+        call_command("lazydrf_prune_changes", days=-1, verbosity=0)
+        self.assertFalse(Change.objects.exists())
+
+        ## Cursors before the pruned entries have expired, the current one is still valid:
+        self.assertEqual(self.client.get("/testitems/changes/", {"since": before}).status_code, 410)
+        self.assertEqual(self.client.get("/testitems/changes/", {"since": after}).status_code, 200)
+        self.assertEqual(self.client.get("/testitems/changes/").data["cursor"], after)
+
+
+class ColumnarTestCase(EndpointTestCase):
+    """
+    Tests the columnar JSON renderer.
+    """
+
+    #: Defines the columns of the test items.
+    columns = ["id", "key", "rank", "locked", "hidden", "owner"]
+
+    def get_rows(self, keys):
+        """
+        Returns the expected rows of the items by key.
+        """
+        return [
+            [item.pk, item.key, item.rank, False, False, self.owner.pk] for item in self.items if item.key in keys
+        ]
+
+    def test_rows(self):
+        ## Render the first page in columns:
+        response = self.client.get("/testitems/", {"format": "columnar"})
+        self.assertEqual(response["Content-Type"], "application/vnd.lazydrf.columnar+json")
+
+        ## The results are columnar, the rest of the page as is:
+        data = json.loads(response.content.decode("utf-8"))
+        self.assertEqual(data["results"], {"columns": self.columns, "rows": self.get_rows(["k0", "k1"])})
+        self.assertIn("format=columnar", data["next"])
+
+    def test_columns(self):
+        ## Render the arrays of the columns, requested via the parameter or the media type:
+        expected = {"columns": self.columns, "arrays": [list(values) for values in zip(*self.get_rows(["k0", "k1"]))]}
+        for response in [
+            self.client.get("/testitems/", {"format": "columnar", "layout": "columns"}),
+            self.client.get("/testitems/", HTTP_ACCEPT="application/vnd.lazydrf.columnar+json; layout=columns"),
+        ]:
+            self.assertEqual(json.loads(response.content.decode("utf-8"))["results"], expected)
+
+        ## Empty lists have empty columns:
+        empty = ColumnarJSONRenderer().get_columnar([], self.columns, "columns")
+        self.assertEqual(empty, {"columns": self.columns, "arrays": [[]] * 6})
+
+    def test_compiled(self):
+        expected = self.client.get("/testitems/", {"format": "columnar"}).content
+        with mock.patch.object(TestItem.LDRFMeta.viewset, "compiled", True):
+            self.assertEqual(self.client.get("/testitems/", {"format": "columnar"}).content, expected)
+
+    def test_lists_only(self):
+        ## Retrieves are not columnar:
+        response = self.client.get("/testitems/{}/".format(self.items[0].pk), {"format": "columnar"})
+        self.assertEqual(response.status_code, 404)
+
+        ## Lists are not columnar if disabled:
+        with mock.patch.object(TestItem.LDRFMeta.viewset, "columnar", False):
+            self.assertEqual(self.client.get("/testitems/", {"format": "columnar"}).status_code, 404)
+
+
+class ExpandTestCase(EndpointTestCase):
+    """
+    Tests expanded relations.
+    """
+
+    def test_expanded_entity_tags(self):
+        path = "/testitems/{}/".format(self.items[0].pk)
+        etag = self.client.get(path, {"expand": "owner"}).get("ETag")
+        self.assertNotEqual(etag, self.client.get(path).get("ETag"))
+        self.assertEqual(self.client.get(path, {"expand": "owner"}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.owner.name = "renamed"
+        self.owner.save()
+        response = self.client.get(path, {"expand": "owner"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["owner"]["name"], "renamed")
@@ -1,16 +1,33 @@
 from django.apps import apps
 
+from lazydrf.queries import get_query_plan
+from lazydrf.registry import registry
+from lazydrf.serializers import get_compiled_serializer
+
 
 def register_app(appname, router):
     """
     Registers all lazydrf models in a Djangoi application with the provided router.
     """
+    ## Check the application:
+    apps.get_app_config(appname)
 
-    ## Iterate over the models for the given application name:
-    for model in apps.get_app_config(appname).get_models():
-        ## If does not have LDRFMeta, skip:
-        if not hasattr(model, "LDRFMeta"):
-            continue
-
-        ## Register the endpoint:
+    ## Iterate over the lazydrf models of the application and register their endpoints:
+    for model in registry.get_models(appname):
         model.LDRFMeta.register(router)
+
+
+def warm_up(*appnames):
+    """
+    Builds the lazily built serializers, viewsets, filter sets and query plans of the lazydrf models
+    in the given Django applications (all if none), such as in the `ready()` of an application config.
+    """
+    ## Iterate over the lazydrf models:
+    for model in registry.get_models(*appnames):
+        ## Build the artifacts:
+        model.LDRFMeta.build()
+
+        ## Build the query plan and the compiled serializer if enabled:
+        get_query_plan(model.LDRFMeta.serializer)
+        if getattr(model.LDRFMeta.viewset, "compiled", False):
+            get_compiled_serializer(model.LDRFMeta.serializer)
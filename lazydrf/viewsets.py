@@ -0,0 +1,1582 @@
+import calendar
+import random
+import re
+import time
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Avg, Count, Max, Min, Sum
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils import timezone
+from django.utils.http import http_date, parse_http_date_safe
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import status
+from rest_framework.decorators import list_route
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound, PermissionDenied, ValidationError
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+from rest_framework.response import Response
+from rest_framework.validators import UniqueValidator
+
+from lazydrf.queries import get_query_plan
+from lazydrf.caching import bump_generations, get_generations, get_params_digest, normalize_params
+from lazydrf.compat import bulk_update, track_queries
+from lazydrf.instrumentation import emit, get_budget, get_server_timing, report_budget_violation
+from lazydrf.indexes import get_model_field
+from lazydrf.renderers import ColumnarJSONRenderer
+from lazydrf.serializers import expand_serializer, get_compiled_serializer, get_readable_fields, narrow_serializer
+from lazydrf.streaming import STREAMING_CONTENT_TYPES, get_keyset_ordering, iterate, stream_response
+
+
+#: Defines the regular expression matching entity tags, weak or strong.
+ETAG_MATCH = re.compile(r'(?:W/)?"([^"]*)"')
+
+#: Defines the aggregate functions by operation, the request parameter listing the fields of each.
+AGGREGATES = OrderedDict([
+    ("sum", Sum),
+    ("avg", Avg),
+    ("min", Min),
+    ("max", Max),
+    ("distinct", lambda field: Count(field, distinct=True)),
+])
+
+
+def _parse_etags(value):
+    """
+    Parses the entity tags of an `If-Match` or `If-None-Match` header into their opaque values.
+    """
+    return ["*"] if value.strip() == "*" else ETAG_MATCH.findall(value)
+
+
+def _get_timestamp(value):
+    """
+    Returns the POSIX timestamp of a date or datetime value, naive datetimes are assumed to be in UTC.
+    """
+    return calendar.timegm(value.utctimetuple() if hasattr(value, "utctimetuple") else value.timetuple())
+
+
+def _split_param(value):
+    """
+    Splits a comma separated request parameter value into a set of non-empty items.
+    """
+    return set([item.strip() for item in (value or "").split(",") if item.strip()])
+
+
+class QueryPlanMixin:
+    """
+    Defines a viewset mixin which joins, prefetches and loads only what the serializer renders.
+    """
+
+    #: Defines the relations to be joined. `None` means planned from the serializer.
+    select_related = None
+
+    #: Defines the relations to be prefetched. `None` means planned from the serializer.
+    prefetch_related = None
+
+    #: Defines the columns to be loaded. `None` means projected from the serializer.
+    only = None
+
+    def get_queryset(self):
+        """
+        Returns the queryset with the query plan applied for safe methods.
+
+        :return: The queryset.
+        """
+        ## Get the queryset:
+        queryset = super(QueryPlanMixin, self).get_queryset()
+
+        ## Writes do not render prefetched relations reliably, skip them:
+        if getattr(self, "request", None) is None or self.request.method not in SAFE_METHODS:
+            return queryset
+
+        ## Get the plan for the serializer and apply:
+        plan = get_query_plan(self.get_serializer_class())
+        return plan.apply(queryset, self.select_related, self.prefetch_related, self.only)
+
+
+class SparseFieldsMixin:
+    """
+    Defines a viewset mixin which lets clients select a subset of the serializer fields.
+    """
+
+    #: Defines the request parameter listing the fields to render.
+    fields_param = "fields"
+
+    #: Defines the request parameter listing the fields to omit.
+    omit_param = "omit"
+
+    def get_serializer_class(self):
+        """
+        Returns the serializer class narrowed down to the requested fields for safe methods.
+
+        :return: The serializer class.
+        """
+        ## Get the serializer class:
+        serializer_class = super(SparseFieldsMixin, self).get_serializer_class()
+
+        ## Writes always use the full serializer:
+        if getattr(self, "request", None) is None or self.request.method not in SAFE_METHODS:
+            return serializer_class
+
+        ## Get the requested and omitted fields:
+        requested = _split_param(self.request.query_params.get(self.fields_param))
+        omitted = _split_param(self.request.query_params.get(self.omit_param))
+
+        ## If nothing is requested, use the full serializer:
+        if not requested and not omitted:
+            return serializer_class
+
+        ## Get the fields of interest preserving the serializer order:
+        available = list(serializer_class.Meta.fields)
+        selected = [field for field in available if (not requested or field in requested) and field not in omitted]
+
+        ## If nothing is narrowed, use the full serializer:
+        if selected == available:
+            return serializer_class
+
+        ## Done, return the narrowed serializer:
+        return narrow_serializer(serializer_class, tuple(selected))
+
+
+class ExpandMixin:
+    """
+    Defines a viewset mixin which lets clients expand the declared relations into the related objects.
+
+    Expanded relations are rendered via the serializers of the related lazydrf models, and joined or
+    prefetched by the query plan of the expanded serializer.
+    """
+
+    #: Defines the relations which can be expanded.
+    expandable = []
+
+    #: Defines the request parameter listing the relations to expand.
+    expand_param = "expand"
+
+    def get_serializer_class(self):
+        """
+        Returns the serializer class with the requested relations expanded for safe methods.
+
+        :return: The serializer class.
+        """
+        ## Get the serializer class:
+        serializer_class = super(ExpandMixin, self).get_serializer_class()
+
+        ## Writes always use the primary keys of the relations:
+        if getattr(self, "request", None) is None or self.request.method not in SAFE_METHODS:
+            return serializer_class
+
+        ## Get the requested relations, nothing to do if none:
+        requested = _split_param(self.request.query_params.get(self.expand_param))
+        if not requested:
+            return serializer_class
+
+        ## Check the relations:
+        invalid = sorted(requested.difference(self.expandable))
+        if invalid:
+            raise ValidationError({self.expand_param: [_("Can not expand: {}.").format(", ".join(invalid))]})
+
+        ## Expand the relations rendered, in the order of the serializer fields:
+        relations = tuple([field for field in serializer_class.Meta.fields if field in requested])
+        return expand_serializer(serializer_class, relations) if relations else serializer_class
+
+
+class CompiledListMixin:
+    """
+    Defines a viewset mixin which lists rows via a compiled serializer when enabled.
+
+    Serializers which can not be compiled (such as the ones with method fields) fall back to
+    the usual serialization.
+    """
+
+    #: Indicates if the list action should use the compiled serializer.
+    compiled = False
+
+    def list(self, request, *args, **kwargs):
+        """
+        Lists the rows via the compiled serializer if enabled and possible.
+        """
+        ## Get the compiled serializer if enabled:
+        compiled = self.compiled and get_compiled_serializer(self.get_serializer_class())
+
+        ## If not compiled, fall back to the usual list:
+        if not compiled:
+            return super(CompiledListMixin, self).list(request, *args, **kwargs)
+
+        ## Get the values queryset, with ordering columns and annotations (such as search ranks) for the pagination:
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = compiled.values(queryset, self.get_ordering_columns() + list(queryset.query.annotations))
+
+        ## Get the transform, rows are transformed into columns directly for the columnar renderer:
+        columnar = isinstance(getattr(request, "accepted_renderer", None), ColumnarJSONRenderer)
+        transform = compiled.transform_columnar if columnar else compiled.transform
+
+        ## Paginate if required:
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(transform(page))
+
+        ## Done, return the response:
+        return Response(transform(queryset))
+
+    def get_ordering_columns(self):
+        """
+        Returns the local columns the list may be ordered by, including the primary key.
+
+        :return: A list of column names.
+        """
+        ## Get the ordering fields:
+        ordering = getattr(self, "ordering", None) or []
+        ordering = [ordering] if isinstance(ordering, str) else list(ordering)
+        ordering = ordering + list(getattr(self, "ordering_fields", None) or [])
+
+        ## Get the model:
+        model = self.get_queryset().model
+
+        ## Done, return the local columns:
+        return [model._meta.pk.name] + [
+            field.lstrip("-") for field in ordering if get_model_field(model, field.lstrip("-"))
+        ]
+
+
+class ColumnarMixin:
+    """
+    Defines a viewset mixin which offers the columnar JSON renderer for lists when enabled.
+
+    The renderer is selected via the `Accept` header or `?format=columnar`, and the columns are
+    the fields of the serializer in order.
+    """
+
+    #: Indicates if lists can be rendered as columnar JSON.
+    columnar = True
+
+    def get_renderers(self):
+        """
+        Returns the renderers, with the columnar JSON renderer for lists if enabled.
+
+        :return: A list of renderers.
+        """
+        ## Get the renderers:
+        renderers = super(ColumnarMixin, self).get_renderers()
+
+        ## Add the columnar renderer for lists:
+        if self.columnar and getattr(self, "action", None) == "list":
+            renderers.append(ColumnarJSONRenderer())
+
+        ## Done, return the renderers:
+        return renderers
+
+    def get_columnar_columns(self):
+        """
+        Returns the columns of the columnar JSON renderer.
+
+        :return: A list of field names.
+        """
+        return get_readable_fields(self.get_serializer_class())
+
+
+class CachedResponseMixin:
+    """
+    Defines a viewset mixin which caches rendered list and retrieve responses when enabled.
+
+    Cache keys include the generation counters of the model and the related models rendered,
+    which are bumped on every save, delete and many relation change. Retrieves resolve the object
+    and check its object permissions on cache hits as well, hence cached objects are served only
+    to the users who may see them. Note that shared (not per-user) caching of lists is correct
+    only if neither the queryset nor the filter backends depend on the user.
+    """
+
+    #: Indicates if the list and retrieve responses should be cached.
+    cache_responses = False
+
+    #: Defines the cache alias to store responses in.
+    cache_alias = "default"
+
+    #: Defines the timeout of cached responses in seconds.
+    cache_timeout = 300
+
+    #: Indicates if responses should be cached per user.
+    cache_per_user = False
+
+    #: Defines the maximum size of a cached response in bytes.
+    cache_max_size = 1024 * 1024
+
+    def list(self, request, *args, **kwargs):
+        """
+        Lists the items, from the cache if possible.
+        """
+        return self.get_cached_response(super(CachedResponseMixin, self).list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Retrieves the item, from the cache if possible.
+        """
+        return self.get_cached_response(super(CachedResponseMixin, self).retrieve, request, *args, **kwargs)
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        """
+        Returns the cached response if any, otherwise the response of the handler, caching it once rendered.
+
+        :param handler: The handler to be called on cache misses.
+        :param request: The request.
+        :return: The response.
+        """
+        ## If not enabled, or reading from a lagging replica which may predate the generations, call the handler:
+        if not self.cache_responses or getattr(self, "is_replica_read", lambda request: False)(request):
+            return handler(request, *args, **kwargs)
+
+        ## Get the cache and the key:
+        cache = caches[self.cache_alias]
+        key = self.get_cache_key(request, kwargs)
+
+        ## Check the cache, the object of a retrieve must still be found and permitted:
+        cached = cache.get(key)
+        if cached is not None:
+            if self.action == "retrieve":
+                self.get_object()
+            return HttpResponse(cached[0], content_type=cached[1])
+
+        ## Call the handler:
+        response = handler(request, *args, **kwargs)
+
+        ## Cache successful responses once they are rendered:
+        if response.status_code == 200 and hasattr(response, "add_post_render_callback"):
+            response.add_post_render_callback(lambda rendered: self.set_cached_response(cache, key, rendered))
+
+        ## Done, return the response:
+        return response
+
+    def set_cached_response(self, cache, key, response):
+        """
+        Caches the rendered response unless it is too large.
+        """
+        if len(response.content) <= self.cache_max_size:
+            cache.set(key, (response.content, response["Content-Type"]), self.cache_timeout)
+
+    def get_cache_key(self, request, kwargs):
+        """
+        Returns the cache key of the request.
+
+        :param request: The request.
+        :param kwargs: The URL keyword arguments.
+        :return: The cache key.
+        """
+        ## Get the model and the models rendered:
+        model = self.get_queryset().model
+        related = get_query_plan(self.get_serializer_class()).models
+        models = [model] + sorted(related, key=lambda m: m._meta.label_lower)
+
+        ## Get the user if per-user:
+        user = getattr(request.user, "pk", None) if self.cache_per_user else None
+
+        ## Get the digest of the request:
+        digest = get_params_digest(
+            self.action, request.path, sorted(kwargs.items()), request.accepted_media_type, user,
+            normalize_params(request.query_params), get_generations(models),
+        )
+
+        ## Done, return the key:
+        return "lazydrf:response:{}:{}".format(model._meta.label_lower, digest)
+
+
+class ConditionalMixin:
+    """
+    Defines a viewset mixin which emits `ETag` and `Last-Modified` validators on list and retrieve
+    responses and answers conditional requests with 304 before the queryset is evaluated.
+
+    List validators are derived from the generation counters of the model and the related models
+    rendered. Object validators are derived from the modified field if declared in `APIFields`, from
+    the object's generation counter otherwise, and the generation counters of the related models.
+    Objects have validators only if visible via the filter backends and permitted to the user, hence
+    preconditions do not reveal the objects which are not.
+
+    Conditional requests are opt-in: the generation counters must be kept in a cache shared by all
+    processes, and writes which do not send signals are not seen until the counters expire.
+    """
+
+    #: Indicates if conditional requests should be supported.
+    conditional = False
+
+    #: Defines the name of the last modification timestamp field if any.
+    modified_field = None
+
+    def list(self, request, *args, **kwargs):
+        """
+        Lists the items unless not modified.
+        """
+        handler = super(ConditionalMixin, self).list
+        return self.get_conditional_response(handler, self.get_list_validators, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Retrieves the item unless not modified.
+        """
+        handler = super(ConditionalMixin, self).retrieve
+        return self.get_conditional_response(handler, self.get_object_validators, request, *args, **kwargs)
+
+    def get_conditional_response(self, handler, validators, request, *args, **kwargs):
+        """
+        Returns a 304 response if the validators match the request preconditions, otherwise the response of
+        the handler.
+
+        :param handler: The handler to be called if modified.
+        :param validators: The function returning the entity tag and the last modification timestamp.
+        :param request: The request.
+        :return: The response.
+        """
+        ## If not enabled, or reading from a lagging replica which may predate the generations, call the handler:
+        if not self.conditional or getattr(self, "is_replica_read", lambda request: False)(request):
+            return handler(request, *args, **kwargs)
+
+        ## Get the validators:
+        etag, last_modified = validators(request, kwargs)
+
+        ## Check if modified:
+        if self.is_not_modified(request, etag, last_modified):
+            response = HttpResponseNotModified()
+        else:
+            response = handler(request, *args, **kwargs)
+
+        ## Done, set the validators and return:
+        return self.set_validators(response, etag, last_modified)
+
+    def get_list_validators(self, request, kwargs):
+        """
+        Returns the entity tag of the list, there is no last modification timestamp as deletions can not be tracked.
+
+        :param request: The request.
+        :param kwargs: The URL keyword arguments.
+        :return: A tuple of the entity tag and `None`.
+        """
+        ## Get the model and the models rendered:
+        model = self.get_queryset().model
+        related = get_query_plan(self.get_serializer_class()).models
+        models = [model] + sorted(related, key=lambda m: m._meta.label_lower)
+
+        ## Get the digest:
+        digest = get_params_digest(
+            get_generations(models), getattr(request.user, "pk", None),
+            request.accepted_media_type, normalize_params(request.query_params),
+        )
+
+        ## Done, return the validators:
+        return 'W/"{}"'.format(digest), None
+
+    def get_object_validators(self, request, kwargs):
+        """
+        Returns the entity tag and the last modification timestamp of the object.
+
+        :param request: The request.
+        :param kwargs: The URL keyword arguments.
+        :return: A tuple of the entity tag and the last modification timestamp, `(None, None)` if the object
+                 does not exist.
+        """
+        ## Get the lookup:
+        lookup = {self.lookup_field: kwargs[self.lookup_url_kwarg or self.lookup_field]}
+
+        ## Get the object among the ones visible, and the related models rendered, such as expanded:
+        queryset = self.filter_queryset(self.get_queryset()).filter(**lookup)
+        model = queryset.model
+        models = sorted(get_query_plan(self.get_serializer_class()).models, key=lambda m: m._meta.label_lower)
+
+        ## Get the primary key and the version, the instance is required to check object permissions:
+        if self.has_object_permissions():
+            instance = queryset.first()
+            if instance is not None and not self.is_object_permitted(request, instance):
+                instance = None
+            row = instance and (instance.pk, getattr(instance, self.modified_field) if self.modified_field else None)
+            self._ldrf_object = instance
+        else:
+            row = queryset.values_list("pk", self.modified_field or "pk").first()
+
+        ## If no such object visible and permitted, there are no validators:
+        if row is None:
+            return None, None
+
+        ## Get the version and the last modification timestamp:
+        pk, modified = row
+        version = modified if self.modified_field else get_generations([model], pk)[0]
+        last_modified = _get_timestamp(modified) if modified is not None and self.modified_field else None
+
+        ## Get the digest, representations differ by the request parameters (such as the fields and expansions):
+        digest = get_params_digest(
+            model._meta.label_lower, str(pk), version,
+            get_generations(models), normalize_params(request.query_params),
+        )
+
+        ## Done, return the validators:
+        return 'W/"{}"'.format(digest), last_modified
+
+    def get_object(self):
+        """
+        Returns the object, the one looked up for the validators if any.
+        """
+        ## Get the object looked up for the validators, only once:
+        instance = self.__dict__.pop("_ldrf_object", None)
+        if instance is None:
+            return super(ConditionalMixin, self).get_object()
+
+        ## Done, check the object permissions as usual and return:
+        self.check_object_permissions(self.request, instance)
+        return instance
+
+    def has_object_permissions(self):
+        """
+        Indicates if any permission of the viewset checks objects.
+
+        :return: `True` if any checks objects, `False` otherwise.
+        """
+        return any([
+            type(permission).has_object_permission is not BasePermission.has_object_permission
+            for permission in self.get_permissions()
+        ])
+
+    def is_object_permitted(self, request, instance):
+        """
+        Indicates if the object is permitted to the user.
+
+        :param request: The request.
+        :param instance: The object.
+        :return: `True` if permitted, `False` otherwise.
+        """
+        try:
+            self.check_object_permissions(request, instance)
+        except (NotAuthenticated, PermissionDenied):
+            return False
+        return True
+
+    def is_not_modified(self, request, etag, last_modified):
+        """
+        Indicates if the representation is not modified with respect to the request preconditions.
+
+        :param request: The request.
+        :param etag: The entity tag if any.
+        :param last_modified: The last modification timestamp if any.
+        :return: `True` if not modified, `False` otherwise.
+        """
+        ## The entity tags take precedence:
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+        if if_none_match is not None:
+            tags = _parse_etags(if_none_match)
+            return etag is not None and ("*" in tags or _parse_etags(etag)[0] in tags)
+
+        ## Check the last modification timestamp:
+        if_modified_since = request.META.get("HTTP_IF_MODIFIED_SINCE")
+        if if_modified_since is not None and last_modified is not None:
+            since = parse_http_date_safe(if_modified_since)
+            return since is not None and last_modified <= since
+
+        ## Done, modified:
+        return False
+
+    def set_validators(self, response, etag, last_modified):
+        """
+        Sets the validators on successful and not modified responses.
+        """
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            if etag is not None:
+                response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+        return response
+
+
+class PreconditionMixin:
+    """
+    Defines a viewset mixin which checks the `If-Match` precondition of writes for optimistic concurrency.
+
+    It relies on the object validators of the ConditionalMixin. The precondition is checked and the
+    write is made in a single transaction with the row of the object locked via `select_for_update()`.
+    """
+
+    def update(self, request, *args, **kwargs):
+        """
+        Updates the item if the precondition holds.
+        """
+        return self.get_preconditioned_response(super(PreconditionMixin, self).update, request, *args, **kwargs)
+
+    def destroy(self, request, *args, **kwargs):
+        """
+        Destroys the item if the precondition holds.
+        """
+        return self.get_preconditioned_response(super(PreconditionMixin, self).destroy, request, *args, **kwargs)
+
+    def get_preconditioned_response(self, handler, request, *args, **kwargs):
+        """
+        Returns a 412 response if the `If-Match` precondition fails, otherwise the response of the handler.
+
+        :param handler: The handler to be called if the precondition holds.
+        :param request: The request.
+        :return: The response.
+        """
+        ## Get the precondition, if none or not enabled call the handler:
+        if_match = request.META.get("HTTP_IF_MATCH")
+        if if_match is None or not self.conditional:
+            return handler(request, *args, **kwargs)
+
+        ## Check the precondition and write in a single transaction, with the object locked:
+        model = self.get_queryset().model
+        with transaction.atomic(using=router.db_for_write(model)):
+            ## Lock the object against concurrent writes:
+            self.lock_object(model, kwargs)
+
+            ## Get the current entity tag, note that missing objects are left to the handler:
+            etag, last_modified = self.get_object_validators(request, kwargs)
+
+            ## Check the precondition:
+            tags = _parse_etags(if_match)
+            if etag is not None and "*" not in tags and _parse_etags(etag)[0] not in tags:
+                return Response({"detail": _("Precondition failed.")}, status=status.HTTP_412_PRECONDITION_FAILED)
+
+            ## Call the handler:
+            response = handler(request, *args, **kwargs)
+
+        ## Done, set the new validators and return:
+        return self.set_validators(response, *self.get_object_validators(request, kwargs))
+
+    def lock_object(self, model, kwargs):
+        """
+        Locks the row of the object until the end of the transaction, so that the precondition holds for the write.
+
+        :param model: The model.
+        :param kwargs: The URL keyword arguments.
+        """
+        lookup = {self.lookup_field: kwargs[self.lookup_url_kwarg or self.lookup_field]}
+        list(model._default_manager.select_for_update().filter(**lookup).values_list("pk"))
+
+
+class StreamingListMixin:
+    """
+    Defines a viewset mixin which streams the list as a JSON array or NDJSON when enabled and requested.
+
+    Streamed lists are not paginated. Rows are fetched in chunks and serialized incrementally.
+    """
+
+    #: Indicates if the list can be streamed.
+    streaming = False
+
+    #: Defines the request parameter selecting the streaming format, "json" or "ndjson".
+    stream_param = "stream"
+
+    #: Defines the number of rows fetched and serialized per chunk.
+    stream_chunk_size = 1000
+
+    def list(self, request, *args, **kwargs):
+        """
+        Streams the list if enabled and requested, lists the usual way otherwise.
+        """
+        ## Get the format, if not streaming list the usual way:
+        format = self.get_stream_format(request)
+        if not self.streaming or format is None:
+            return super(StreamingListMixin, self).list(request, *args, **kwargs)
+
+        ## Get the queryset:
+        queryset = self.filter_queryset(self.get_queryset())
+
+        ## Stream compiled rows if possible:
+        compiled = getattr(self, "compiled", False) and get_compiled_serializer(self.get_serializer_class())
+        if compiled:
+            ordering = [field.lstrip("-") for field in get_keyset_ordering(queryset) or []]
+            rows = iterate(compiled.values(queryset, ordering), self.stream_chunk_size)
+            return stream_response((item for chunk in rows for item in compiled.transform(chunk)), format)
+
+        ## Stream serialized instances:
+        serializer = self.get_serializer()
+        rows = iterate(queryset, self.stream_chunk_size)
+        return stream_response((serializer.to_representation(item) for chunk in rows for item in chunk), format)
+
+    def get_stream_format(self, request):
+        """
+        Returns the requested streaming format if any.
+
+        :param request: The request.
+        :return: The streaming format if requested and supported, `None` otherwise.
+        """
+        format = request.query_params.get(self.stream_param)
+        return format if format in STREAMING_CONTENT_TYPES else None
+
+    def get_streaming_response(self, items):
+        """
+        Returns a streaming response of the items, for use in custom list routes.
+
+        The format is taken from the request, defaulting to a JSON array.
+
+        :param items: A queryset or an iterable of items.
+        :return: A streaming response.
+        """
+        return stream_response(items, self.get_stream_format(self.request) or "json", self.stream_chunk_size)
+
+
+class AggregateMixin:
+    """
+    Defines a viewset mixin which computes group-by counts and aggregates over the filtered items in the database.
+
+    The fields and their operations ("group" or one of the `AGGREGATES`) are declared by the
+    `aggregating` entry of `APIFields`, such as `{"value": ["group"], "amount": ["sum", "max"]}`.
+    Requests such as `aggregate/?group=value&sum=amount&search=foo` respond with a row per group,
+    with the number of items as `<pk>__count` (such as `id__count`) and the aggregates as
+    `<field>__<operation>` (such as `amount__sum`).
+    """
+
+    #: Defines the fields and their allowed operations.
+    aggregating = {}
+
+    #: Defines the request parameter listing the fields to group by.
+    group_param = "group"
+
+    #: Defines the maximum number of groups per response.
+    aggregate_max_groups = 1000
+
+    @list_route()
+    def aggregate(self, request):
+        """
+        Responds with the number of items and the requested aggregates for each group of the filtered items.
+        """
+        ## Cache the response if enabled:
+        if isinstance(self, CachedResponseMixin):
+            return self.get_cached_response(self.get_aggregate_response, request)
+        return self.get_aggregate_response(request)
+
+    def get_aggregate_response(self, request):
+        """
+        Returns the response of the aggregate action.
+
+        :param request: The request.
+        :return: The response.
+        """
+        ## Get the groups and the aggregates:
+        groups, aggregates = self.get_aggregation(request)
+
+        ## Get the filtered queryset, plain as rows are neither ordered nor rendered via the serializer:
+        queryset = self.filter_queryset(self.get_queryset()).select_related(None).prefetch_related(None).order_by()
+
+        ## Check the names of the aggregates against the fields, the annotations and the groups:
+        fields = [(field.name, getattr(field, "attname", field.name)) for field in queryset.model._meta.get_fields()]
+        reserved = set([name for names in fields for name in names] + list(queryset.query.annotations) + groups)
+        conflicts = sorted(reserved.intersection(aggregates))
+        if conflicts:
+            message = _("Aggregates conflict with the fields, the annotations or the groups: {}.")
+            raise ValidationError({"non_field_errors": [message.format(", ".join(conflicts))]})
+
+        ## Without groups, aggregate over all filtered items:
+        if not groups:
+            return Response({"results": [queryset.aggregate(**aggregates)]})
+
+        ## Aggregate per group, checking the number of groups:
+        rows = list(queryset.values(*groups).annotate(**aggregates).order_by(*groups)[:self.aggregate_max_groups + 1])
+        if len(rows) > self.aggregate_max_groups:
+            raise ValidationError({self.group_param: [
+                _("Expected at most {} groups.").format(self.aggregate_max_groups),
+            ]})
+
+        ## Done, return the response:
+        return Response({"results": rows})
+
+    def get_aggregation(self, request):
+        """
+        Returns the fields to group by and the aggregates requested, checked against the aggregating fields.
+
+        :param request: The request.
+        :return: A tuple of the list of fields to group by and a dictionary of aggregates by name.
+        """
+        ## Declare the errors:
+        errors = {}
+
+        ## Get the fields to group by:
+        groups = sorted(_split_param(request.query_params.get(self.group_param)))
+        invalid = [field for field in groups if "group" not in self.aggregating.get(field, [])]
+        if invalid:
+            errors[self.group_param] = [_("Can not group by: {}.").format(", ".join(invalid))]
+
+        ## Get the aggregates, items are always counted, namespaced by the primary key as the aggregates by field:
+        aggregates = {"{}__count".format(self.get_queryset().model._meta.pk.name): Count("pk")}
+        for operation, function in AGGREGATES.items():
+            fields = sorted(_split_param(request.query_params.get(operation)))
+            invalid = [field for field in fields if operation not in self.aggregating.get(field, [])]
+            if invalid:
+                errors[operation] = [_("Can not aggregate: {}.").format(", ".join(invalid))]
+            aggregates.update([("{}__{}".format(field, operation), function(field)) for field in fields])
+
+        ## Check the errors:
+        if errors:
+            raise ValidationError(errors)
+
+        ## Done, return the groups and aggregates:
+        return groups, aggregates
+
+
+class ChangesExpired(APIException):
+    """
+    Defines the error of change cursors before the change log entries pruned.
+    """
+
+    status_code = status.HTTP_410_GONE
+    default_detail = _("The change cursor has expired, download the items again.")
+
+
+class ChangeFeedMixin:
+    """
+    Defines a viewset mixin which serves the changes of the items since a cursor when changes are tracked.
+
+    Changes are logged by the `lazydrf.changefeed` application which must be installed. The `changes`
+    route responds with the items created or updated, and the primary keys of the items deleted (or no
+    longer visible) since the cursor, along with the cursor to request the next changes from.
+
+    Log entries are served once older than `changes_settle_seconds`, since entries may be committed
+    in another order than their identifiers are allocated. No change is skipped as long as the writes
+    commit within that many seconds of logging their changes. Cursors before the entries pruned via
+    the `lazydrf_prune_changes` command have expired and are answered with `410`.
+    """
+
+    #: Indicates if the changes of the items are tracked.
+    track_changes = False
+
+    #: Defines the request parameter of the change cursor.
+    changes_param = "since"
+
+    #: Defines the maximum number of change log entries per response.
+    changes_page_size = 1000
+
+    #: Defines the number of seconds log entries are held back for, until their writes are committed.
+    changes_settle_seconds = 5
+
+    @list_route()
+    def changes(self, request):
+        """
+        Responds with the changes since the cursor, or with the current cursor if none is requested.
+        """
+        ## Check if changes are tracked:
+        if not self.track_changes:
+            raise NotFound()
+
+        ## Get the items visible via the filter backends and the change log of the model, from the same database:
+        from lazydrf.changefeed.models import Change, get_horizon, get_model_label
+        queryset = self.filter_queryset(self.get_queryset())
+        log = Change.objects.using(queryset.db).filter(model=get_model_label(queryset.model))
+
+        ## Get the time entries are settled by, and the latest entry pruned:
+        settled = timezone.now() - timedelta(seconds=self.changes_settle_seconds)
+        horizon = get_horizon(queryset.model, using=queryset.db)
+
+        ## Without a cursor, respond with the current one to start from, such as before a full download:
+        since = self.get_changes_cursor(request)
+        if since is None:
+            cursor = log.filter(created__lte=settled).order_by("-id").values_list("id", flat=True).first()
+            return Response({"cursor": max(cursor or 0, horizon), "more": False, "changed": [], "deleted": []})
+
+        ## Cursors before the entries pruned have expired, clients must download the items again:
+        if since < horizon:
+            raise ChangesExpired()
+
+        ## Get the entries since the cursor up to the first one not settled yet:
+        entries = list(log.filter(id__gt=since).order_by("id").values_list("id", "object_pk", "deleted", "created")[
+            :self.changes_page_size
+        ])
+        more = len(entries) == self.changes_page_size
+        unsettled = [index for index, entry in enumerate(entries) if entry[3] > settled]
+        if unsettled:
+            entries, more = entries[:unsettled[0]], False
+
+        ## The latest change of each object wins:
+        latest = OrderedDict()
+        for entry, pk, deleted, created in entries:
+            latest.pop(pk, None)
+            latest[pk] = deleted
+
+        ## Get the changed items which are visible:
+        pks = [pk for pk, deleted in latest.items() if not deleted]
+        instances = list(queryset.filter(pk__in=pks)) if pks else []
+        found = set([str(instance.pk) for instance in instances])
+
+        ## Done, return the changes, items deleted or not visible are tombstoned:
+        return Response({
+            "cursor": entries[-1][0] if entries else since,
+            "more": more,
+            "changed": self.get_serializer(instances, many=True).data,
+            "deleted": [queryset.model._meta.pk.to_python(pk) for pk in latest if pk not in found],
+        })
+
+    def get_changes_cursor(self, request):
+        """
+        Returns the change cursor of the request.
+
+        :param request: The request.
+        :return: The cursor if any, `None` otherwise.
+        """
+        ## Get the value:
+        value = request.query_params.get(self.changes_param)
+        if value is None:
+            return None
+
+        ## Parse and return:
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({self.changes_param: [_("A valid integer is required.")]})
+
+
+class BulkMixin:
+    """
+    Defines a viewset mixin which creates, updates and deletes items in bulk within a transaction.
+
+    Lists of items posted to the list endpoint or to the `bulk` route are inserted via `bulk_create`,
+    or upserted by `bulk_upsert_field` if declared, updating the instances of the viewset queryset
+    permitted to the user. Lists of items with primary keys patched to the
+    `bulk` route are updated with one query per batch. Lists of primary keys deleted from the `bulk`
+    route are deleted with a single filtered delete. Payloads setting many relations fall back to
+    saving item by item, still in one transaction.
+    """
+
+    #: Defines the unique field to upsert items by, such as "key", if any.
+    bulk_upsert_field = None
+
+    #: Defines the number of items per insert or update query.
+    bulk_batch_size = 1000
+
+    #: Defines the maximum number of items per request.
+    bulk_max_size = 10000
+
+    def create(self, request, *args, **kwargs):
+        """
+        Creates the item, or the items in bulk if a list is posted.
+        """
+        if isinstance(request.data, list):
+            return self.create_bulk(request)
+        return super(BulkMixin, self).create(request, *args, **kwargs)
+
+    @list_route(methods=["post", "patch", "delete"])
+    def bulk(self, request):
+        """
+        Creates, updates or deletes items in bulk.
+        """
+        return {
+            "POST": self.create_bulk,
+            "PATCH": self.update_bulk,
+            "DELETE": self.destroy_bulk,
+        }[request.method](request)
+
+    def create_bulk(self, request):
+        """
+        Creates (or upserts) the items in bulk.
+
+        :param request: The request.
+        :return: A response with the numbers of created and updated items.
+        """
+        ## Get the items and the model, check the items before touching the database:
+        items = self.get_bulk_items(request)
+        model = self.get_queryset().model
+        self.check_bulk_items(model, items, upsert=True)
+
+        ## Validate and save within a transaction, conflicts with concurrent writes are validation errors:
+        with self.get_bulk_transaction():
+            ## Plain creates are validated with a list serializer:
+            if self.bulk_upsert_field is None:
+                serializer = self.get_serializer(data=items, many=True)
+                validators = self.pop_unique_validators(serializer.child)
+                serializer.is_valid(raise_exception=True)
+                self.check_bulk_unique(validators, [None] * len(items), serializer.validated_data)
+                created, updated = self.save_bulk(model, serializer, [None] * len(items), serializer.validated_data)
+            else:
+                ## Get the existing instances to be updated among the ones of the viewset:
+                field = model._meta.get_field(self.bulk_upsert_field)
+                keys = [field.to_python(item.get(self.bulk_upsert_field)) for item in items]
+                queryset = self.filter_queryset(self.get_queryset()).select_for_update()
+                existing = queryset.filter(**{"{}__in".format(self.bulk_upsert_field): keys})
+                existing = dict([(getattr(instance, self.bulk_upsert_field), instance) for instance in existing])
+                instances = [existing.get(key) for key in keys]
+
+                ## Check object permissions:
+                for instance in existing.values():
+                    self.check_object_permissions(request, instance)
+
+                ## Validate and save:
+                serializers = self.validate_bulk(items, instances, partial=False)
+                data = [s.validated_data for s in serializers]
+                created, updated = self.save_bulk(model, serializers, instances, data)
+
+        ## Done, return the response:
+        return Response({"created": created, "updated": updated}, status=status.HTTP_201_CREATED)
+
+    def update_bulk(self, request):
+        """
+        Updates the items identified by their primary keys in bulk.
+
+        :param request: The request.
+        :return: A response with the number of updated items.
+        """
+        ## Get the items, the model and the primary keys:
+        items = self.get_bulk_items(request)
+        model = self.get_queryset().model
+        pks = [self.get_bulk_pk(model, item) for item in items]
+        self.check_bulk_items(model, items)
+
+        ## Validate and save within a transaction, conflicts with concurrent writes are validation errors:
+        with self.get_bulk_transaction():
+            ## Get the instances:
+            queryset = self.filter_queryset(self.get_queryset()).select_for_update()
+            existing = queryset.in_bulk([pk for pk in pks if pk is not None])
+            instances = [existing.get(pk) for pk in pks]
+
+            ## Check missing instances and object permissions:
+            if None in instances:
+                raise ValidationError([{} if instance else {"detail": _("Not found.")} for instance in instances])
+            for instance in instances:
+                self.check_object_permissions(request, instance)
+
+            ## Validate and save:
+            serializers = self.validate_bulk(items, instances, partial=True)
+            created, updated = self.save_bulk(model, serializers, instances, [s.validated_data for s in serializers])
+
+        ## Done, return the response:
+        return Response({"updated": updated})
+
+    def destroy_bulk(self, request):
+        """
+        Deletes the items identified by their primary keys in bulk.
+
+        :param request: The request.
+        :return: A response with the number of deleted items.
+        """
+        ## Get the items, the model and the primary keys:
+        items = self.get_bulk_items(request)
+        model = self.get_queryset().model
+        pks = [self.get_bulk_pk(model, item) for item in items]
+
+        ## Delete within a transaction:
+        with transaction.atomic():
+            ## Get the instances and check object permissions:
+            queryset = self.filter_queryset(self.get_queryset())
+            instances = list(queryset.filter(pk__in=[pk for pk in pks if pk is not None]))
+            for instance in instances:
+                self.check_object_permissions(request, instance)
+
+            ## Delete:
+            model._default_manager.filter(pk__in=[instance.pk for instance in instances]).delete()
+
+        ## Done, return the response:
+        return Response({"deleted": len(instances)})
+
+    def get_bulk_items(self, request):
+        """
+        Returns the list of items of the request.
+
+        :param request: The request.
+        :return: A list of items.
+        """
+        ## Get the items:
+        items = request.data
+
+        ## Check the items:
+        if not isinstance(items, list):
+            raise ValidationError({"non_field_errors": [_("Expected a list of items.")]})
+        if len(items) > self.bulk_max_size:
+            raise ValidationError({"non_field_errors": [_("Expected at most {} items.").format(self.bulk_max_size)]})
+
+        ## Done, return items:
+        return items
+
+    def check_bulk_items(self, model, items, upsert=False):
+        """
+        Checks that the items are dictionaries and that the values of the upsert field and of the unique
+        fields are not repeated within the items, which would fail in the database otherwise.
+
+        Note that a validation error listing the errors of each item is raised if any is invalid.
+
+        :param model: The model.
+        :param items: A list of items.
+        :param upsert: Indicates if the items are upserted, hence require the upsert field.
+        """
+        ## Get the fields to check, the upsert field and the unique fields other than the primary key:
+        fields = [field for field in model._meta.concrete_fields if field.unique and not field.primary_key]
+        upsert = upsert and self.bulk_upsert_field is not None
+        if upsert and self.bulk_upsert_field not in [field.name for field in fields]:
+            fields.insert(0, model._meta.get_field(self.bulk_upsert_field))
+
+        ## Declare the errors and the values seen by field:
+        errors = [{} for item in items]
+        seen = dict([(field.name, set()) for field in fields])
+
+        ## Iterate over the items:
+        for item, error in zip(items, errors):
+            ## Check the type:
+            if not isinstance(item, dict):
+                error["non_field_errors"] = [_("Expected a dictionary.")]
+                continue
+
+            ## Check the values:
+            for field in fields:
+                ## The upsert field is required, others are validated by the serializer if missing:
+                if field.name not in item:
+                    if upsert and field.name == self.bulk_upsert_field:
+                        error[field.name] = [_("This field is required.")]
+                    continue
+
+                ## Convert the value:
+                try:
+                    value = field.to_python(item[field.name])
+                except DjangoValidationError as exc:
+                    error[field.name] = list(exc.messages)
+                    continue
+
+                ## Check if repeated:
+                if value is not None and value in seen[field.name]:
+                    error[field.name] = [_("This value is repeated in the items.")]
+                seen[field.name].add(value)
+
+        ## Raise errors if any:
+        if any(errors):
+            raise ValidationError(errors)
+
+    @contextmanager
+    def get_bulk_transaction(self):
+        """
+        Returns a context manager running the bulk write in a transaction, reporting integrity errors
+        (such as unique values inserted by concurrent writes) as validation errors.
+        """
+        try:
+            with transaction.atomic():
+                yield
+        except IntegrityError:
+            raise ValidationError({"non_field_errors": [_("The items conflict with the existing items.")]})
+
+    def get_bulk_pk(self, model, item):
+        """
+        Returns the primary key of the item which is either a primary key or an object with one.
+
+        :param model: The model.
+        :param item: The item.
+        :return: The primary key if any and valid, `None` otherwise.
+        """
+        ## Get the value:
+        value = item.get(model._meta.pk.name, item.get("pk")) if isinstance(item, dict) else item
+
+        ## Convert and return:
+        try:
+            return None if value is None else model._meta.pk.to_python(value)
+        except DjangoValidationError:
+            return None
+
+    def validate_bulk(self, items, instances, partial):
+        """
+        Validates the items against their instances (if any) and returns the serializers.
+
+        Note that a validation error listing the errors of each item is raised if any is invalid.
+
+        :param items: A list of items.
+        :param instances: A list of instances or `None`s for new items.
+        :param partial: Indicates if updates are partial.
+        :return: A list of valid serializers.
+        """
+        ## Get the serializers, uniqueness is checked for all items at once:
+        serializers = [
+            self.get_serializer(instance, data=item, partial=partial and instance is not None)
+            for item, instance in zip(items, instances)
+        ]
+        validators = [self.pop_unique_validators(serializer) for serializer in serializers]
+
+        ## Validate:
+        valid = [serializer.is_valid() for serializer in serializers]
+
+        ## Raise errors if any:
+        if not all(valid):
+            raise ValidationError([serializer.errors if not ok else {} for serializer, ok in zip(serializers, valid)])
+
+        ## Check uniqueness:
+        if serializers:
+            data = [serializer.validated_data for serializer in serializers]
+            self.check_bulk_unique(validators[0], instances, data)
+
+        ## Done, return serializers:
+        return serializers
+
+    def pop_unique_validators(self, serializer):
+        """
+        Removes the unique validators of the fields of the serializer, which query the database per
+        item, so that the uniqueness of the values of all items is checked at once by `check_bulk_unique`.
+
+        :param serializer: The serializer, the child serializer for list serializers.
+        :return: A list of tuples of the serializer fields and their unique validators.
+        """
+        ## Declare the validators removed:
+        popped = []
+
+        ## Remove the unique validators of the fields:
+        for field in serializer.fields.values():
+            unique = [validator for validator in field.validators if isinstance(validator, UniqueValidator)]
+            if unique:
+                field.validators = [validator for validator in field.validators if validator not in unique]
+                popped.extend([(field, validator) for validator in unique])
+
+        ## Done, return the validators removed:
+        return popped
+
+    def check_bulk_unique(self, validators, instances, validated_data):
+        """
+        Checks that the values of the unique fields of the items are not taken by other instances, with
+        a single query per unique field instead of a query per item and field.
+
+        Note that a validation error listing the errors of each item is raised if any value is taken.
+
+        :param validators: A list of tuples of the serializer fields and their unique validators.
+        :param instances: A list of instances or `None`s for new items.
+        :param validated_data: A list of validated data.
+        """
+        ## Declare the errors:
+        errors = [{} for data in validated_data]
+
+        ## Check by field:
+        for field, validator in validators:
+            ## Get the values of the items by index:
+            name = field.source_attrs[0]
+            values = [(index, data[name]) for index, data in enumerate(validated_data) if data.get(name) is not None]
+            if not values:
+                continue
+
+            ## Get the primary keys of the instances having the values:
+            queryset = validator.queryset.filter(**{"{}__in".format(name): [value for index, value in values]})
+            taken = dict(queryset.values_list(name, "pk"))
+
+            ## Values taken by other instances are errors:
+            for index, value in values:
+                pk = taken.get(value)
+                if pk is not None and (instances[index] is None or instances[index].pk != pk):
+                    errors[index][field.field_name] = [validator.message]
+
+        ## Raise errors if any:
+        if any(errors):
+            raise ValidationError(errors)
+
+    def save_bulk(self, model, serializers, instances, validated_data):
+        """
+        Saves the validated data of new and existing instances in bulk.
+
+        :param model: The model.
+        :param serializers: A list serializer, or a list of serializers, to fall back to if many relations are set.
+        :param instances: A list of instances or `None`s for new items.
+        :param validated_data: A list of validated data.
+        :return: A tuple of the numbers of created and updated items.
+        """
+        ## Get the counts:
+        created = len([instance for instance in instances if instance is None])
+        updated = len(instances) - created
+
+        ## Many relations can not be set in bulk, nor are the primary keys of the inserted items of change
+        ## tracked models known to log their changes, save item by item:
+        many = set([field.name for field in model._meta.many_to_many])
+        tracked = getattr(self, "track_changes", False)
+        if any(many.intersection(data) for data in validated_data) or (tracked and created):
+            for serializer in (serializers if isinstance(serializers, list) else [serializers]):
+                serializer.save()
+            return created, updated
+
+        ## Insert new instances:
+        model._default_manager.bulk_create(
+            [model(**data) for instance, data in zip(instances, validated_data) if instance is None],
+            batch_size=self.bulk_batch_size,
+        )
+
+        ## Set the fields of existing instances:
+        changed = [instance for instance in instances if instance is not None]
+        fields = set()
+        for instance, data in zip(instances, validated_data):
+            if instance is not None:
+                for name, value in data.items():
+                    setattr(instance, name, value)
+                fields.update(data.keys())
+
+        ## Set the automatic timestamps, too:
+        auto_now = [field for field in model._meta.concrete_fields if getattr(field, "auto_now", False)]
+        for field in auto_now:
+            for instance in changed:
+                field.pre_save(instance, False)
+            fields.add(field.name)
+
+        ## Update existing instances:
+        if changed and fields:
+            bulk_update(model._default_manager.all(), changed, sorted(fields), self.bulk_batch_size)
+
+        ## Bulk operations do not send signals, invalidate caches and log the changes if tracked:
+        bump_generations(model, [instance.pk for instance in changed])
+        if tracked:
+            from lazydrf.changefeed.models import record_changes
+            record_changes(model, [instance.pk for instance in changed])
+
+        ## Done, return counts:
+        return created, updated
+
+
+class InstrumentationMixin:
+    """
+    Defines a viewset mixin which instruments requests when enabled.
+
+    The number of queries and the time spent in the database, evaluating the queryset, in the rest
+    of the view (mostly serialization) and rendering as well as the response size are reported via
+    the `Server-Timing` header, the "lazydrf.instrumentation" logger and the `request_instrumented`
+    signal.
+
+    Requests are also checked against the query budgets if declared, logging violations as warnings,
+    or raising `QueryBudgetExceeded` if the `LAZYDRF_STRICT_QUERY_BUDGETS` setting is enabled (such
+    as in tests).
+    """
+
+    #: Indicates if requests should be instrumented.
+    instrument = False
+
+    #: Indicates if the `Server-Timing` header should be set on instrumented responses.
+    instrument_header = True
+
+    #: Defines the maximum number of queries per request, for all actions or by action such as `{"list": 2}`.
+    query_budget = None
+
+    #: Defines the maximum time in seconds spent in the database per request, for all actions or by action.
+    query_time_budget = None
+
+    def dispatch(self, request, *args, **kwargs):
+        """
+        Dispatches the request, instrumented if enabled or if query budgets are declared.
+        """
+        ## If not enabled, dispatch:
+        if not self.instrument and self.query_budget is None and self.query_time_budget is None:
+            return super(InstrumentationMixin, self).dispatch(request, *args, **kwargs)
+
+        ## Start the instrumentation:
+        self.instrumentation = {"start": time.perf_counter(), "query": 0.0}
+
+        ## Dispatch tracking the queries on all databases:
+        with ExitStack() as stack:
+            trackers = [stack.enter_context(track_queries(connections[alias])) for alias in connections]
+            response = super(InstrumentationMixin, self).dispatch(request, *args, **kwargs)
+        self.instrumentation["view"] = time.perf_counter() - self.instrumentation["start"]
+        self.instrumentation["queries"] = sum(tracker["queries"] for tracker in trackers)
+        self.instrumentation["db"] = sum(tracker["time"] for tracker in trackers)
+
+        ## Check the query budgets:
+        self.check_query_budgets(request)
+
+        ## Done if not instrumented:
+        if not self.instrument:
+            return response
+
+        ## If the response is to be rendered, finish once rendered:
+        if hasattr(response, "render") and not getattr(response, "is_rendered", True):
+            render = response.render
+
+            def instrumented_render():
+                start = time.perf_counter()
+                rendered = render()
+                self.instrumentation["render"] = time.perf_counter() - start
+                self.finish_instrumentation(request, response)
+                return rendered
+
+            response.render = instrumented_render
+        else:
+            self.finish_instrumentation(request, response)
+
+        ## Done, return the response:
+        return response
+
+    def paginate_queryset(self, queryset):
+        """
+        Paginates the queryset, timing the evaluation if instrumented.
+        """
+        return self.time_phase("query", super(InstrumentationMixin, self).paginate_queryset, queryset)
+
+    def get_object(self):
+        """
+        Returns the object, timing the query if instrumented.
+        """
+        return self.time_phase("query", super(InstrumentationMixin, self).get_object)
+
+    def time_phase(self, phase, function, *args, **kwargs):
+        """
+        Calls the function, adding the time spent to the phase if instrumented.
+
+        :param phase: The name of the phase.
+        :param function: The function.
+        :return: The return value of the function.
+        """
+        ## If not instrumented, call the function:
+        instrumentation = getattr(self, "instrumentation", None)
+        if instrumentation is None:
+            return function(*args, **kwargs)
+
+        ## Call the function and add the time spent:
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            instrumentation[phase] = instrumentation.get(phase, 0.0) + time.perf_counter() - start
+
+    def check_query_budgets(self, request):
+        """
+        Checks the queries of the request against the query budgets of the action.
+
+        Note that `QueryBudgetExceeded` is raised on violations if the budgets are strict.
+
+        :param request: The request.
+        """
+        ## Get the budgets of the action:
+        action = getattr(self, "action", None)
+        budget = get_budget(self.query_budget, action)
+        time_budget = get_budget(self.query_time_budget, action)
+
+        ## Get the queries and the time spent:
+        queries, spent = self.instrumentation["queries"], self.instrumentation["db"]
+
+        ## Get the violations:
+        violations = []
+        if budget is not None and queries > budget:
+            violations.append("{} queries over the budget of {}".format(queries, budget))
+        if time_budget is not None and spent > time_budget:
+            violations.append("{:.2f}ms in the database over the budget of {:.2f}ms".format(
+                spent * 1000, time_budget * 1000,
+            ))
+
+        ## Report violations if any:
+        if violations:
+            report_budget_violation("{} {} ({} {}): {}".format(
+                request.method, request.path, self.get_queryset().model._meta.label_lower, action,
+                ", ".join(violations),
+            ))
+
+    def get_instrumentation_record(self, request, response):
+        """
+        Returns the instrumentation record of the request.
+
+        :param request: The request.
+        :param response: The response.
+        :return: A dictionary with durations in seconds and the response size in bytes if known.
+        """
+        instrumentation = self.instrumentation
+        return {
+            "viewset": self.__class__.__name__,
+            "model": self.get_queryset().model._meta.label_lower,
+            "action": getattr(self, "action", None),
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "queries": instrumentation["queries"],
+            "db": instrumentation["db"],
+            "query": instrumentation["query"],
+            "serialize": max(instrumentation["view"] - instrumentation["query"], 0.0),
+            "render": instrumentation.get("render"),
+            "total": time.perf_counter() - instrumentation["start"],
+            "size": None if getattr(response, "streaming", False) else len(response.content),
+        }
+
+    def finish_instrumentation(self, request, response):
+        """
+        Reports the instrumentation of the request.
+
+        :param request: The request.
+        :param response: The response.
+        """
+        ## Get the record:
+        record = self.get_instrumentation_record(request, response)
+
+        ## Set the header if required:
+        if self.instrument_header:
+            response["Server-Timing"] = get_server_timing(record)
+
+        ## Emit the record:
+        emit(self.__class__, request, record)
+
+
+class ReplicaMixin:
+    """
+    Defines a viewset mixin which reads from a replica database for safe methods when declared.
+
+    Writes go to the primary database, and set a cookie which sends the reads of the client to the
+    primary database, too, for a while so that clients read their writes despite the replication lag.
+    Clients may request reads from the primary database via a header, too.
+
+    Reads from the replica are neither cached, nor answered conditionally, nor are their counts cached,
+    since the generation counters are bumped by the writes before the replica has them.
+    """
+
+    #: Defines the database alias to read from, a list of aliases to pick from randomly, or a viewset
+    #: method returning the alias. `None` means the default routing.
+    read_database = None
+
+    #: Defines the number of seconds reads stick to the primary database after a write.
+    read_sticky_seconds = 5
+
+    #: Defines the name of the cookie marking the end of the stickiness after a write.
+    read_sticky_cookie = "lazydrf_primary"
+
+    #: Defines the request header requesting reads from the primary database.
+    read_primary_header = "X-Read-Primary"
+
+    def get_queryset(self):
+        """
+        Returns the queryset, using the read database for safe methods unless reads stick to the primary.
+
+        :return: The queryset.
+        """
+        ## Get the queryset:
+        queryset = super(ReplicaMixin, self).get_queryset()
+
+        ## Writes and reads sticking to the primary use the default routing:
+        request = getattr(self, "request", None)
+        if request is None or request.method not in SAFE_METHODS or self.is_read_sticky(request):
+            return queryset
+
+        ## Get the read database and use it if any:
+        database = self.get_read_database()
+        return queryset if database is None else queryset.using(database)
+
+    def is_replica_read(self, request):
+        """
+        Indicates if the request reads from the read database.
+
+        :param request: The request.
+        :return: `True` if reading from the read database, `False` otherwise.
+        """
+        return self.read_database is not None and request.method in SAFE_METHODS and not self.is_read_sticky(request)
+
+    def get_read_database(self):
+        """
+        Returns the database alias to read from.
+
+        :return: The database alias if any, `None` otherwise.
+        """
+        if callable(self.read_database):
+            return self.read_database()
+        elif isinstance(self.read_database, (list, tuple)):
+            return random.choice(self.read_database)
+        return self.read_database
+
+    def is_read_sticky(self, request):
+        """
+        Indicates if the reads of the request should go to the primary database.
+
+        :param request: The request.
+        :return: `True` if sticky, `False` otherwise.
+        """
+        ## Check the header:
+        if request.META.get("HTTP_{}".format(self.read_primary_header.upper().replace("-", "_"))):
+            return True
+
+        ## Check the cookie, holding the timestamp the stickiness ends:
+        try:
+            return float(request.COOKIES.get(self.read_sticky_cookie, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """
+        Finalizes the response, setting the stickiness cookie after successful writes to replicated models.
+        """
+        ## Finalize the response:
+        response = super(ReplicaMixin, self).finalize_response(request, response, *args, **kwargs)
+
+        ## Set the cookie after successful writes:
+        if self.read_database is not None and self.read_sticky_seconds and request.method not in SAFE_METHODS \
+                and response.status_code < 400:
+            response.set_cookie(self.read_sticky_cookie, "{:.3f}".format(time.time() + self.read_sticky_seconds),
+                                max_age=self.read_sticky_seconds, httponly=True)
+
+        ## Done, return the response:
+        return response